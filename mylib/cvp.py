@@ -17,6 +17,12 @@ import re
 import base64
 import io
 import zipfile
+from collections import OrderedDict
+
+try:
+   import yaml
+except ImportError:
+   yaml = None
 
 # Compliance codes for devices and containers
 DEVICE_IN_COMPLIANCE = 0
@@ -50,6 +56,10 @@ complianceCodes = {
 # AAA settings notation
 AAA_SETTINGS = [ 'Local', 'RADIUS', 'TACACS' ]
 
+# Task monitoring backoff, in seconds
+TASK_POLL_MIN_INTERVAL = 0.5
+TASK_POLL_MAX_INTERVAL = 8
+
 class EncryptionAlgorithm( object ):
    rsa = 'RSA'
 
@@ -63,9 +73,49 @@ def encoder( obj ):
    else:
       raise TypeError
 
+def internString( value ):
+   '''Returns the shared copy of a repeated string such as a container name, a
+   model or a status, so that many objects hold a single copy of it. Strings
+   are interned with the built-in intern(), which only takes byte strings, so
+   ASCII unicode values from Cvp responses are returned as interned byte
+   strings, which compare equal to them. Other unicode strings and values
+   other than strings are returned as they are.'''
+   if isinstance( value, str ):
+      return intern( value )
+   if isinstance( value, unicode ):
+      try:
+         return intern( value.encode( 'ascii' ) )
+      except UnicodeEncodeError:
+         return value
+   return value
+
+def _containerTreeName( name ):
+   '''Returns a container name of a tree as a string, keeping unicode names'''
+   return name if isinstance( name, basestring ) else str( name )
+
+def _containerTreeChildren( tree ):
+   '''Returns the ( name, subtree ) of the top containers of a container tree,
+   see Cvp.addContainerTree. The containers of a dict are sorted by name, those
+   of an OrderedDict or a list keep their order'''
+   if not tree:
+      return []
+   if isinstance( tree, dict ):
+      children = [ ( _containerTreeName( name ), subtree )
+                   for name, subtree in tree.items() ]
+      if not isinstance( tree, OrderedDict ):
+         children.sort( key=lambda child: child[ 0 ] )
+      return children
+   if isinstance( tree, list ):
+      children = []
+      for item in tree:
+         children.extend( _containerTreeChildren( item ) )
+      return children
+   return [ ( _containerTreeName( tree ), None ) ]
+
 class Jsonable( object ):
    '''This class represents a JSON-serializable object. The default serialization
    is to just return the class' __dict__.'''
+   __slots__ = ()
 
    def __init__( self ):
       pass
@@ -74,6 +124,54 @@ class Jsonable( object ):
       ''' Returns modules namespace as dictionary'''
       return self.__dict__
 
+class SlottedJsonable( Jsonable ):
+   '''JSON-serializable object keeping its attributes in __slots__ instead of a
+   per-instance __dict__, for the models held in large numbers. jsonable()
+   returns the attributes named by the __slots__ of the class and its bases,
+   listed once per class.'''
+   __slots__ = ()
+   # class to ( attribute names, builder of their dict, has a __dict__ )
+   _fields = {}
+
+   @classmethod
+   def _fieldInfo( cls ):
+      info = SlottedJsonable._fields.get( cls )
+      if info is None:
+         fields = []
+         for klass in reversed( cls.__mro__ ):
+            slots = klass.__dict__.get( '__slots__', () )
+            fields.extend( field for field in slots if field not in fields and
+                           field not in ( '__dict__', '__weakref__' ) )
+         # subclasses without __slots__ have a __dict__ with more attributes
+         hasDict = any( '__slots__' not in klass.__dict__
+                        for klass in cls.__mro__ if klass is not object )
+         # a dict display reading every slot, as json.dumps encodes many
+         # objects: it is several times faster than dict( zip( ... ) )
+         toDict = eval( 'lambda obj: { %s }' % ', '.join(
+                           '%r : obj.%s' % ( field, field ) for field in fields ) )
+         info = SlottedJsonable._fields[ cls ] = ( tuple( fields ), toDict, hasDict )
+      return info
+
+   @classmethod
+   def jsonFields( cls ):
+      '''Returns the names of the attributes of the class'''
+      return cls._fieldInfo()[ 0 ]
+
+   def jsonable( self ):
+      ''' Returns the attributes as dictionary'''
+      _, toDict, hasDict = self._fieldInfo()
+      attrs = toDict( self )
+      if hasDict:
+         attrs.update( self.__dict__ )
+      return attrs
+
+   def __getstate__( self ):
+      return self.jsonable()
+
+   def __setstate__( self, state ):
+      for field, value in state.iteritems():
+         setattr( self, field, value )
+
 class Image( Jsonable ):
    '''Image class, stores all required information about
    an image.
@@ -107,7 +205,7 @@ class Theme( Jsonable ):
    def __repr__( self ):
       return 'Theme "%s"' % self.name
 
-class Container( Jsonable ):
+class Container( SlottedJsonable ):
    '''Container class, stores all required information about
    a container
 
@@ -118,17 +216,19 @@ class Container( Jsonable ):
       parentName -- Name of the parent container
    '''
 
+   __slots__ = ( 'name', 'configlets', 'imageBundle', 'parentName' )
+
    def __init__( self, name, parentName, configlets='', imageBundle=''):
       super( Container, self ).__init__( )
       self.name = name
       self.configlets = configlets
-      self.imageBundle = imageBundle
-      self.parentName = parentName
+      self.imageBundle = internString( imageBundle )
+      self.parentName = internString( parentName )
 
    def __repr__( self ):
       return 'Container "%s"' % self.name
 
-class Task( Jsonable ):
+class Task( SlottedJsonable ):
    ''' Task class, Stores information about a Task
 
    State variables:
@@ -142,11 +242,15 @@ class Task( Jsonable ):
    CONFIG_PUSH_IN_PROGRESS = 'Configlet Push In Progress'
    IMAGE_PUSH_IN_PROGRESS = 'Image Push In Progress'
    DEVICE_REBOOT_IN_PROGRESS = 'Device Reboot In Progress'
+   # states of the tasks that are not done yet
+   ACTIVE_STATES = ( PENDING, CONFIG_PUSH_IN_PROGRESS, IMAGE_PUSH_IN_PROGRESS,
+                     DEVICE_REBOOT_IN_PROGRESS )
+   __slots__ = ( 'taskId', 'status', 'description' )
 
    def __init__( self, taskId, status, description='' ):
       super( Task, self ).__init__( )
       self.taskId = int( taskId )
-      self.status = status
+      self.status = internString( status )
       self.description = description
 
    def __repr__( self ):
@@ -158,6 +262,7 @@ class CCTask( Task ):
    State variables:
       taskOrder -- Order of the task executed in a Change control
    '''
+   __slots__ = ( 'taskOrder', 'parentCCId' )
 
    def __init__( self, taskId, status, description, taskOrder = 1,
                 cloneId = None ):
@@ -240,7 +345,7 @@ class NetworkRollback( Jsonable ):
       self.rollbackType = rollbackType
       self.cc = None
 
-class Device( Jsonable ):
+class Device( SlottedJsonable ):
    ''' Device class helps store all the information about a particular device
 
    state variables:
@@ -261,6 +366,9 @@ class Device( Jsonable ):
    AUTO_UPGRADE_FAILED = 'Auto image upgrade failed'
    DCA_INSTALLATION_IN_PROGRESS = 'Certificate installation in-progress'
    DCA_INSTALLATION_FAILED = 'Certificate installation failed'
+   __slots__ = ( 'ipAddress', 'fqdn', 'macAddress', 'containerName', 'imageBundle',
+                 'configlets', 'status', 'model', 'sn', 'cc' )
+
    def __init__( self, ipAddress, fqdn, macAddress, containerName, imageBundle=None,
                  configlets=None, status=UNKNOWN, model=None, sn=None,
                  complianceCode=None ):
@@ -268,18 +376,18 @@ class Device( Jsonable ):
       self.ipAddress = ipAddress
       self.fqdn = fqdn
       self.macAddress = macAddress
-      self.containerName = containerName
-      self.imageBundle = imageBundle
+      self.containerName = internString( containerName )
+      self.imageBundle = internString( imageBundle )
       self.configlets = configlets
-      self.status = status
-      self.model = model
+      self.status = internString( status )
+      self.model = internString( model )
       self.sn = sn
       self.cc = complianceCode
 
    def __repr__( self ):
       return 'Device "%s"' % self.fqdn or self.ipAddress or self.macAddress
 
-class Configlet( Jsonable ):
+class Configlet( SlottedJsonable ):
    '''Configlet class stores all the information necessary about the
    configlet
 
@@ -292,13 +400,15 @@ class Configlet( Jsonable ):
       sslConfig -- A Boolean indicating if this is a system pre-loaded special ssl configlet for
                    secure device communication.
    '''
+   __slots__ = ( 'name', 'config', 'configletType', 'user', 'sslConfig' )
+
    def __init__( self, name, config, configletType='Static', user=None,
                  sslConfig=False ):
       super( Configlet, self ).__init__( )
       self.name = name
       self.config = config
-      self.configletType = configletType
-      self.user = user
+      self.configletType = internString( configletType )
+      self.user = internString( user )
       self.sslConfig = sslConfig
 
    def __repr__( self ):
@@ -313,6 +423,8 @@ class ConfigletBuilder( Configlet ):
       formList -- list of forms part of configlet builder
       mainScript -- the configlet builder mainscript
    '''
+   __slots__ = ( 'formList', 'mainScript' )
+
    def __init__( self, name, formList, mainScript, **kwargs ):
       super( ConfigletBuilder, self ).__init__( name, '', **kwargs )
       self.formList = formList
@@ -328,11 +440,12 @@ class GeneratedConfiglet( Configlet ):
       ContainerName -- Name of the container to which the builder was assigned
       deviceMac -- Mac address of the device to which this configlet is assigned
    '''
+   __slots__ = ( 'builderName', 'containerName', 'deviceMac' )
 
    def __init__( self, name, config, builderName, containerName, deviceMac, **kwargs ):
       super( GeneratedConfiglet, self ).__init__( name, config, **kwargs )
-      self.builderName = builderName
-      self.containerName = containerName
+      self.builderName = internString( builderName )
+      self.containerName = internString( containerName )
       self.deviceMac = deviceMac
       self.configletType = 'Generated'
 
@@ -341,6 +454,8 @@ class ReconciledConfiglet( Configlet ):
    State variables:
       deviceMac -- Mac address of the devices
    '''
+   __slots__ = ( 'deviceMac', )
+
    def __init__( self, name, config, deviceMac, **kwargs ):
       super( ReconciledConfiglet, self ).__init__( name, config, **kwargs )
       self.deviceMac = deviceMac
@@ -470,7 +585,7 @@ class AaaSettings( Jsonable ):
       self.authenticationServerType = authenticationServerType
       self.authorizationServerType = authorizationServerType
 
-class Event( Jsonable ):
+class Event( SlottedJsonable ):
    '''
    Event class that represents events such as compliance check, reconcile.
    '''
@@ -478,6 +593,8 @@ class Event( Jsonable ):
    IN_PROGRESS = 'IN_PROGRESS'
    COMPLETED = 'COMPLETED'
    CANCELED = 'CANCELLED'
+   __slots__ = ( 'eventId', 'parentEventId', 'objectId', 'eventType', 'status',
+                 'complianceCode', 'message', 'errors', 'warnings', 'addlData' )
 
    def __init__( self, eventId, parentEventId, objectId, eventType, status,
                  complianceCode, message, errors, warnings, addlData ):
@@ -485,8 +602,8 @@ class Event( Jsonable ):
       self.eventId = eventId
       self.parentEventId = parentEventId
       self.objectId = objectId
-      self.eventType = eventType
-      self.status = status
+      self.eventType = internString( eventType )
+      self.status = internString( status )
       self.complianceCode = complianceCode
       self.message = message
       self.errors = errors
@@ -600,9 +717,22 @@ class Cvp( Jsonable ):
    '''Class Cvp represents an instance of CVP. It provides high level python
    APIs to retrieve and modify CVP state.'''
 
-   def __init__( self, host, ssl=True, port=443, tmpDir='' ):
+   def __init__( self, host, ssl=True, port=443, tmpDir='',
+                 poolConnections=cvpServices.DEFAULT_POOL_CONNECTIONS,
+                 poolMaxSize=cvpServices.DEFAULT_POOL_MAXSIZE, poolBlock=False,
+                 keepAlive=True, maxInFlight=cvpServices.DEFAULT_MAX_IN_FLIGHT,
+                 cacheSize=0, cacheTtls=None, instruments=None ):
       super( Cvp, self ).__init__( )
-      self.cvpService = cvpServices.CvpService( host, ssl, port, tmpDir )
+      self.cvpService = cvpServices.CvpService( host, ssl, port, tmpDir,
+                                                poolConnections=poolConnections,
+                                                poolMaxSize=poolMaxSize,
+                                                poolBlock=poolBlock,
+                                                keepAlive=keepAlive,
+                                                cacheSize=cacheSize,
+                                                cacheTtls=cacheTtls,
+                                                instruments=instruments )
+      # independent per-object requests are spread over maxInFlight threads
+      self.executor = cvpServices.FanOutExecutor( maxInFlight )
 
    def __repr__( self ):
       return 'Cvp "%s"' % self.url()
@@ -639,11 +769,37 @@ class Cvp( Jsonable ):
       '''
       self.cvpService.logout()
 
+   def connectionStats( self ):
+      '''Returns counters of new versus reused HTTP connections'''
+      return self.cvpService.connectionStats()
+
+   def transaction( self, batchSize=cvpServices.TEMP_ACTION_BATCH_SIZE ):
+      '''Returns a CvpTransaction collecting the topology changes made in a with
+      block, e.g. by addContainer, renameContainer, mapConfigletToDevice,
+      mapImageBundleToDevice or deployDevice, and committing them with a single
+      topology save at the end of the block:
+
+         with cvpInstance.transaction() as transaction:
+            ...
+         taskIds = transaction.taskIds
+
+      The changes return no tasks while the transaction is open, and nothing is
+      saved if the block raises.
+      Arguments:
+         batchSize -- temp actions per addTempAction request ( type : Int )
+      Returns:
+         transaction -- context manager ( type : cvpServices.CvpTransaction )
+      '''
+      return cvpServices.CvpTransaction( self.cvpService, batchSize )
+
    def _getContainerConfigletMap( self, configletNameList ):
       '''Finds which configlets are  mapped to which containers'''
       configletMap = {}
-      for configletName in configletNameList:
-         containersInfo = self.cvpService.configletAppliedContainers( configletName )
+      containersInfoList = self.executor.map(
+                              self.cvpService.configletAppliedContainers,
+                              configletNameList )
+      for configletName, containersInfo in zip( configletNameList,
+                                                containersInfoList ):
          for containerInfo in containersInfo:
             configletNameList = []
             key = containerInfo[ 'containerName' ]
@@ -659,9 +815,11 @@ class Cvp( Jsonable ):
    def _getContainerImageBundleMap( self, imageBundleNameList ):
       '''Finds which image bundle is mapped to which containers.'''
       imageBundleMap = {}
-      for imageBundleName in imageBundleNameList:
-         containersInfo = self.cvpService.imageBundleAppliedContainers(
-                                                                    imageBundleName )
+      containersInfoList = self.executor.map(
+                              self.cvpService.imageBundleAppliedContainers,
+                              imageBundleNameList )
+      for imageBundleName, containersInfo in zip( imageBundleNameList,
+                                                  containersInfoList ):
          for containerInfo in containersInfo:
             imageBundleMap[ containerInfo[ 'containerName' ] ] = imageBundleName
       return imageBundleMap
@@ -669,8 +827,11 @@ class Cvp( Jsonable ):
    def _getDeviceImageBundleMap( self, imageBundleNameList ):
       '''Finds which image bundle is mapped to which devices.'''
       imageBundleMap = {}
-      for imageBundleName in imageBundleNameList:
-         devicesInfo = self.cvpService.imageBundleAppliedDevices( imageBundleName )
+      devicesInfoList = self.executor.map(
+                              self.cvpService.imageBundleAppliedDevices,
+                              imageBundleNameList )
+      for imageBundleName, devicesInfo in zip( imageBundleNameList,
+                                               devicesInfoList ):
          for deviceInfo in devicesInfo:
             imageBundleMap[ deviceInfo [ 'ipAddress' ] ] = imageBundleName
       return imageBundleMap
@@ -686,20 +847,25 @@ class Cvp( Jsonable ):
    def _getConfigletNameList( self ):
       '''finds the list of configlets present in the cvp instance'''
       configletNameList = []
-      configletsInfo = self.cvpService.getConfigletsInfo()
-      for configletInfo in configletsInfo:
+      # only the names are kept, the configs are dropped as they are parsed
+      for configletInfo in self.cvpService.iterConfigletsInfo( pageSize=0 ):
          configletNameList.append( configletInfo[ 'name' ] )
       return configletNameList
 
-   def getDevices( self, provisioned=True ):
+   def getDevices( self, provisioned=True, snapshot=False ):
       '''Collect information of all the devices. Information of device consist
       of the device specifications like ip address, mac address( key ), configlets
       and image bundle applied to device.
       Arguments:
          provisioned- False would get all onboarded devices,True would get only the provisioned ones
+         snapshot -- if True, load the inventory with bulk requests, plus one
+                     request per image bundle, instead of querying every
+                     device separately
       Returns:
          deviceList -- List of device ( type : List of Device ( class ) )
       '''
+      if snapshot:
+         return self._getDevicesSnapshot( provisioned )
       imageBundleNameList = self._getImageBundleNameList()
       imageBundleMap = self._getDeviceImageBundleMap( imageBundleNameList )
       devicesInfo, containersInfo = self.cvpService.getInventory( provisioned=provisioned)
@@ -733,55 +899,144 @@ class Cvp( Jsonable ):
                                     complianceCode=cc ) )
       return deviceList
 
+   def _getDevicesSnapshot( self, provisioned=True ):
+      '''Builds the same device list as getDevices() from one download each of
+      the inventory, the container tree, the configlet mappers and the image
+      bundle list, plus one imageBundleAppliedDevices request per image bundle,
+      as Cvp has no bulk mapping of image bundles to devices. The requests are
+      4 plus the number of image bundles, whatever the number of devices; the
+      per-bundle requests run concurrently on the executor.'''
+      imageBundleNameList = self._getImageBundleNameList()
+      imageBundleMap = self._getDeviceImageBundleMap( imageBundleNameList )
+      devicesInfo, _ = self.cvpService.getInventory(
+                          populateParentContainerKeyMap=False,
+                          provisioned=provisioned )
+      self.cvpService.containerIndex( refresh=True )
+      deviceConfigletMap = self._getDeviceConfigletNameMap()
+      deviceList = []
+      for deviceInfo in devicesInfo:
+         deviceMacAddress = deviceInfo[ 'systemMacAddress' ]
+         containerKey = deviceInfo[ 'parentContainerKey' ]
+         if containerKey == '':
+            if provisioned:
+               raise cvpServices.CvpError( errorCodes.INVALID_CONTAINER_NAME )
+            parentContainerName = ""
+            configletNames = None
+         else:
+            parentContainerName = self.cvpService.containerName( containerKey )
+            configletNames = deviceConfigletMap.get( deviceMacAddress, [] )
+         appliedImageBundle = []
+         if deviceInfo[ 'ipAddress' ] in imageBundleMap:
+            appliedImageBundle = imageBundleMap[ deviceInfo[ 'ipAddress' ] ]
+         cc = DEVICE_IN_COMPLIANCE if not deviceInfo[ 'complianceCode' ] else \
+                        int( deviceInfo[ 'complianceCode'] )
+         deviceList.append( Device( ipAddress=deviceInfo[ 'ipAddress' ],
+                                    fqdn=deviceInfo[ 'fqdn' ],
+                                    macAddress=deviceMacAddress,
+                                    containerName=parentContainerName,
+                                    imageBundle=appliedImageBundle,
+                                    configlets=configletNames,
+                                    status=deviceInfo[ 'status' ],
+                                    model=deviceInfo[ 'modelName' ],
+                                    sn=deviceInfo[ 'serialNumber' ],
+                                    complianceCode=cc ) )
+      return deviceList
+
+   def _getDeviceConfigletNameMap( self ):
+      '''Returns device mac address to the list of names of configlets applied
+      to the device, built from a single configlet mapper download'''
+      mapperInfo = self.cvpService.getConfigletMapper()
+      configletsInfo = mapperInfo.get( 'configlets' )
+      if configletsInfo is None:
+         configletsInfo = self.cvpService.getConfigletsInfo()
+      configletNameMap = dict( ( configletInfo[ 'key' ], configletInfo[ 'name' ] )
+                               for configletInfo in configletsInfo )
+      deviceMappers = {}
+      for mapper in mapperInfo[ 'configletMappers' ]:
+         if mapper.get( 'type' ) != 'netelement':
+            continue
+         if mapper[ 'configletId' ] not in configletNameMap:
+            continue
+         deviceMappers.setdefault( mapper[ 'objectId' ], [] ).append( mapper )
+      deviceConfigletMap = {}
+      for deviceMacAddress, mappers in deviceMappers.iteritems():
+         mappers.sort( key=lambda mapper: mapper.get( 'order', 0 ) )
+         deviceConfigletMap[ deviceMacAddress ] = [
+               configletNameMap[ mapper[ 'configletId' ] ] for mapper in mappers ]
+      return deviceConfigletMap
+
    def _getContainerInfo( self, containerName ):
-      '''Returns container information for given container name'''
-      containersInfo = self.cvpService.searchTopology(
-                       containerName )[ 'containerList' ]
-      if not containersInfo:
+      '''Returns container information ( key and name ) for given container
+      name, resolved case-insensitively from the container index'''
+      containerKey = self.cvpService.containerKey( containerName )
+      if containerKey is None:
          raise cvpServices.CvpError( errorCodes.INVALID_CONTAINER_NAME )
-      for containerInfo in containersInfo:
-         # Container names are not case sensitive
-         if containerInfo[ 'name' ].lower() == containerName.lower():
-            return containerInfo
-      return None
+      return { 'key' : containerKey,
+               'name' : self.cvpService.containerName( containerKey ) }
 
    def getDevice( self, deviceMacAddress, provisioned=True ):
       '''Retrieve information about device like ip address, mac address( key ),
-      configlets and image bundle applied to device.
+      configlets and image bundle applied to device. Only the requests about
+      this device are made, whatever the size of the inventory.
       Arguments:
          provisioned- False would get all onboarded devices,True would get only the provisioned ones
       Returns:
-         device -- Information about the device ( type : Device ( class ) )
+         device -- Information about the device ( type : Device ( class ) ), None
+                   if there is no such device
       '''
-      imageBundleNameList = self._getImageBundleNameList()
-      imageBundleMap = self._getDeviceImageBundleMap( imageBundleNameList )
-      devicesInfo, containersInfo = self.cvpService.getInventory( provisioned=provisioned )
-      for deviceInfo in devicesInfo:
-         if deviceInfo[ "systemMacAddress" ] != deviceMacAddress:
-            continue
-         if deviceMacAddress not in containersInfo:
-            raise cvpServices.CvpError( errorCodes.INVALID_CONTAINER_NAME )
-         parentContainerName = containersInfo[ deviceMacAddress ]
-         configletsInfo = self.cvpService.getDeviceConfiglets(
-                 deviceInfo[ "systemMacAddress"] )
-         configletNames = [ configlet[ 'name' ] for configlet in configletsInfo ]
-         appliedImageBundle = []
-         if deviceInfo[ 'ipAddress' ] in imageBundleMap:
-            appliedImageBundle = imageBundleMap[ deviceInfo[ 'ipAddress' ] ]
-         cc = DEVICE_IN_COMPLIANCE if not deviceInfo[ 'complianceCode' ] else \
-                        int( deviceInfo[ 'complianceCode'] )
-         device = Device( ipAddress=deviceInfo[ 'ipAddress' ],
-                          fqdn=deviceInfo[ 'fqdn' ],
-                          macAddress=deviceMacAddress,
-                          containerName=parentContainerName,
-                          imageBundle=appliedImageBundle,
-                          configlets=configletNames,
-                          status=deviceInfo[ 'status' ],
-                          model=deviceInfo[ 'modelName' ],
-                          sn=deviceInfo[ 'serialNumber' ],
-                          complianceCode=cc )
-         return device
-      return None
+      try:
+         deviceInfo = self.cvpService.getNetElementById( deviceMacAddress )
+      except cvpServices.CvpError as e:
+         if e.errorCode in ( errorCodes.NETELEMENT_ENTITY_DOES_NOT_EXIST,
+                             errorCodes.ENTITY_DOES_NOT_EXIST ):
+            return None
+         raise
+      containerKey = deviceInfo.get( 'parentContainerKey' ) or \
+                     deviceInfo.get( 'parentContainerId' )
+      if not containerKey:
+         raise cvpServices.CvpError( errorCodes.INVALID_CONTAINER_NAME )
+      # devices of the undefined container are onboarded, not provisioned
+      if provisioned and containerKey == cvpServices.UNDEF_CONTAINER_KEY:
+         return None
+      parentContainerName = self.cvpService.getContainerInfoByKey(
+                                                         containerKey )[ 'name' ]
+      configletsInfo = self.cvpService.getDeviceConfiglets( deviceMacAddress )
+      configletNames = [ configlet[ 'name' ] for configlet in configletsInfo ]
+      appliedImageBundle = self._appliedImageBundleName(
+                  self.cvpService.getDeviceImageBundles( deviceMacAddress ),
+                  deviceMacAddress ) or []
+      cc = DEVICE_IN_COMPLIANCE if not deviceInfo.get( 'complianceCode' ) else \
+                     int( deviceInfo[ 'complianceCode'] )
+      return Device( ipAddress=deviceInfo[ 'ipAddress' ],
+                     fqdn=deviceInfo[ 'fqdn' ],
+                     macAddress=deviceMacAddress,
+                     containerName=parentContainerName,
+                     imageBundle=appliedImageBundle,
+                     configlets=configletNames,
+                     status=deviceInfo.get( 'status' ),
+                     model=deviceInfo.get( 'modelName' ),
+                     sn=deviceInfo.get( 'serialNumber' ),
+                     complianceCode=cc )
+
+   def _appliedImageBundleName( self, imageBundles, objectId ):
+      '''Returns the name of the image bundle applied to the device or
+      container objectId, from the response of getDeviceImageBundles or
+      getContainerImageBundles. A bundle applied to objectId itself is preferred
+      to one inherited from a parent container. None if no image bundle
+      applies to it.'''
+      imageBundleList = imageBundles.get( 'imageBundleList' ) or []
+      imageBundleNames = dict( ( imageBundleInfo[ 'key' ], imageBundleInfo[ 'name' ] )
+                               for imageBundleInfo in imageBundleList )
+      inherited = None
+      for imageBundleKey, mappers in sorted( ( imageBundles.get(
+                                    'imageBundleMapper' ) or {} ).iteritems() ):
+         for mapper in mappers:
+            if mapper.get( 'objectId' ) == objectId:
+               return imageBundleNames.get( imageBundleKey )
+            inherited = inherited or imageBundleNames.get( imageBundleKey )
+      if inherited is None and imageBundleList:
+         inherited = imageBundleList[ 0 ][ 'name' ]
+      return inherited
 
    def getConfiglets( self, configletNames='' ):
       '''Retrieve the full set of Configlets
@@ -789,20 +1044,68 @@ class Cvp( Jsonable ):
          configletList -- information of all configlets
             ( type : List of Configlet ( class ) )
       '''
-      configletList = []
-      configlets = []
       configletsInfo = self.cvpService.getConfigletsInfo()
+      # Configlet builders are part of the configlet list, which gives the
+      # builder names of generated configlets without a request per builder
+      builderNames = dict( ( configletInfo[ 'key' ], configletInfo[ 'name' ] )
+                           for configletInfo in configletsInfo
+                           if configletInfo[ 'type' ] == 'Builder' )
+      if configletNames:
+         configletsInfo = [ configletInfo for configletInfo in configletsInfo if
+                            str( configletInfo[ 'name' ] ).lower() in configletNames ]
+      mapperIndex = None
+      if any( configletInfo[ 'type' ] in ( 'Static', 'Generated' )
+              for configletInfo in configletsInfo ):
+         mapperIndex = self._getConfigletMapperIndex()
+      configletList = []
       for configletInfo in configletsInfo:
-         # getConfiglet returns unused configlets as None
-         configlet = self.getConfiglet( configletInfo[ 'name' ] )
+         if 'config' not in configletInfo:
+            configletInfo = self.cvpService.getConfigletByName(
+                                                         configletInfo[ 'name' ] )
+         # unused reconciled and generated configlets are returned as None
+         configlet = self._configletFromInfo( configletInfo, mapperIndex,
+                                              builderNames )
          if configlet:
             configletList.append( configlet )
-      if configletNames:
-         configlets = [ configlet for configlet in configletList if
-                        str( configlet.name ).lower() in configletNames ]
-      else:
-         configlets = configletList
-      return configlets
+      return configletList
+
+   def iterConfiglets( self, pageSize=cvpServices.DEFAULT_PAGE_SIZE ):
+      '''Yields the Configlets as they are received. The configlet mappers are
+      only downloaded once a reconciled or generated configlet is met.
+      Arguments:
+         pageSize -- configlets per request, 0 for a single request
+      Returns:
+         configlets -- iterator of configlets
+            ( type : Iterator of Configlet ( class ) )
+      '''
+      mapperIndex = None
+      builderNames = {}
+      for configletInfo in self.cvpService.iterConfigletsInfo( pageSize ):
+         if 'config' not in configletInfo:
+            configletInfo = self.cvpService.getConfigletByName(
+                                                         configletInfo[ 'name' ] )
+         if mapperIndex is None and ( configletInfo[ 'type' ] == 'Generated' or
+                                      configletInfo.get( 'reconciled' ) ):
+            mapperIndex = self._getConfigletMapperIndex()
+         configlet = self._configletFromInfo( configletInfo, mapperIndex,
+                                              builderNames )
+         if configlet:
+            yield configlet
+
+   def _getConfigletMapperIndex( self ):
+      '''Downloads the configlet mappers once and indexes them by configlet key.
+      Returns:
+         ( configletMappers, generatedConfigletMappers ) -- configlet key to the
+         first matching mapper of each kind ( type : Tuple of Dict )
+      '''
+      mapperInfo = self.cvpService.getConfigletMapper()
+      configletMappers = {}
+      for mapper in mapperInfo[ 'configletMappers' ]:
+         configletMappers.setdefault( mapper[ 'configletId' ], mapper )
+      generatedConfigletMappers = {}
+      for mapper in mapperInfo[ 'generatedConfigletMappers' ]:
+         generatedConfigletMappers.setdefault( mapper[ 'configletId' ], mapper )
+      return configletMappers, generatedConfigletMappers
 
    def getContainers( self ):
       '''Retrieve the hierarchy of the containers and store information on all
@@ -826,15 +1129,18 @@ class Cvp( Jsonable ):
                         imageBundleMap, parentContainerName):
       ''' internal function for recursive depth first search to obtain container
       information from the container hierarchy. It handles different cases
-      like the configlet applied or not, image bundle applied or not to containers'''
-      for containerInfo in childContainerInfoList:
-         if containerInfo[ 'childContainerList' ]:
-            containers = self._recursiveParse( containers,
-                                 containerInfo[ 'childContainerList' ],
-                                 imageBundleMap, containerInfo[ 'name' ] )
+      like the configlet applied or not, image bundle applied or not to containers.
+      The hierarchy is walked first and the configlets of all containers are
+      then fetched concurrently'''
+      parsedContainers = self._flattenContainerTree( childContainerInfoList,
+                                                     parentContainerName )
+      configletsInfoList = self.executor.map(
+                              self.cvpService.getContainerConfiglets,
+                              [ containerInfo[ 'key' ]
+                                for containerInfo, _ in parsedContainers ] )
+      for ( containerInfo, parentContainerName ), configletsInfo in zip(
+            parsedContainers, configletsInfoList ):
          containerName = containerInfo[ 'name' ]
-         containerKey = containerInfo[ 'key' ]
-         configletsInfo = self.cvpService.getContainerConfiglets( containerKey )
          configletNames = [ configlet[ 'name' ] for configlet in configletsInfo ]
          appliedImageBundle = None
          if containerName in imageBundleMap:
@@ -843,6 +1149,18 @@ class Cvp( Jsonable ):
                                        configletNames, appliedImageBundle ) )
       return containers
 
+   def _flattenContainerTree( self, childContainerInfoList, parentContainerName ):
+      '''Lists ( containerInfo, parentContainerName ) of the container hierarchy
+      in depth first order, children before their parent'''
+      parsedContainers = []
+      for containerInfo in childContainerInfoList:
+         if containerInfo[ 'childContainerList' ]:
+            parsedContainers.extend( self._flattenContainerTree(
+                                       containerInfo[ 'childContainerList' ],
+                                       containerInfo[ 'name' ] ) )
+         parsedContainers.append( ( containerInfo, parentContainerName ) )
+      return parsedContainers
+
    def getContainer( self, containerName ):
       '''Retrieve container Information like container name, configlets and
       image bundle applied to the container
@@ -854,21 +1172,25 @@ class Cvp( Jsonable ):
          containerInfo -- Information about the container
          ( type : Container( class ) )
       '''
-      containerInfo = self._getContainerInfo( containerName )
-      imageBundleNameList = self._getImageBundleNameList()
-      imageBundleMap = self._getContainerImageBundleMap( imageBundleNameList )
+      # a single lookup does not justify downloading the container index
+      containerKey = self.cvpService.containerKey( containerName, download=False )
+      if containerKey is None:
+         raise cvpServices.CvpError( errorCodes.INVALID_CONTAINER_NAME )
+      return self._getContainerByKey( containerKey )
+
+   def _getContainerByKey( self, containerKey ):
+      '''Returns the Container with given key, with the requests about this
+      container only'''
+      containerInfo = self.cvpService.getContainerInfoByKey( containerKey )
       parentName = ''
-      containerName = containerInfo[ 'name' ]
-      containerKey = containerInfo[ 'key' ]
-      if containerInfo[ 'key' ] != 'root':
-         parentName = self.cvpService.getContainerInfoByKey(
-                           containerKey )[ 'parentName' ]
+      if containerKey != cvpServices.ROOT_CONTAINER_KEY:
+         parentName = containerInfo[ 'parentName' ]
       configletsInfo = self.cvpService.getContainerConfiglets( containerKey )
       configletNames = [ configlet[ 'name' ] for configlet in configletsInfo ]
-      appliedImageBundle = None
-      if containerName in imageBundleMap:
-         appliedImageBundle = imageBundleMap[ containerName ]
-      return Container( containerName, parentName, configletNames,
+      appliedImageBundle = self._appliedImageBundleName(
+                  self.cvpService.getContainerImageBundles( containerKey ),
+                  containerKey )
+      return Container( containerInfo[ 'name' ], parentName, configletNames,
                         appliedImageBundle )
 
    def getUndefContainerInfo( self ):
@@ -877,20 +1199,22 @@ class Cvp( Jsonable ):
          containerInfo -- Information about the undefined container
          ( type : Container( class ) )
       '''
-      containerInfo = self.cvpService.getContainerInfoByKey(
-                                                    cvpServices.UNDEF_CONTAINER_KEY )
-      return self.getContainer( containerInfo[ 'name' ] )
+      return self._getContainerByKey( cvpServices.UNDEF_CONTAINER_KEY )
 
-   def getThemes( self, storageDirPath='' ):
+   def getThemes( self, storageDirPath='', activeOnly=False ):
       '''Themes are downloaded and saved to the directory given by "storageDirPath"
+      Theme files that did not change since the last download are not rewritten.
       Argument:
          storageDirPath -- path to directory for storing theme files ( optional )
             ( type : String )
+         activeOnly -- only save the active theme of each type; the other
+            themes are still received from Cvp ( optional ) ( type : Boolean )
       Returns:
          themeList -- List of themes downloaded
             ( type : List of Theme ( class ) )'''
       themeList = []
-      themeFilenamesByType = self.cvpService.getThemes( storageDirPath )
+      themeFilenamesByType = self.cvpService.getThemes( storageDirPath,
+                                                        activeOnly )
       for themeType in themeFilenamesByType.keys():
          themeFilenames = themeFilenamesByType[ themeType ]
          for i in range( len( themeFilenames ) ):
@@ -900,11 +1224,16 @@ class Cvp( Jsonable ):
                               isActive=( i == 0 ) ) )
       return themeList
 
-   def getImages( self , storageDirPath='', download=False ):
+   def getImages( self , storageDirPath='', download=False,
+                  bytesPerSecond=None ):
       '''Images are downloaded and saved in directory path given by "storageDirPath"
+      Several images are downloaded concurrently, interrupted downloads are
+      resumed and images already present with the right checksum are skipped.
       Argument:
          storageDirPath -- path to directory for storing image files ( optional )
             ( type : String )
+         bytesPerSecond -- cap of the combined download rate ( optional )
+            ( type : Int )
       Returns:
          imageNameList -- List of inforamtion of images downloaded
             ( type : List of Image ( class ) )'''
@@ -913,12 +1242,30 @@ class Cvp( Jsonable ):
       for imageInfo in imagesInfo:
          rebootRequired = ( imageInfo[ 'isRebootRequired' ] == 'true' )
          imageList.append( Image( imageInfo[ 'name' ], rebootRequired ) )
-         if download:
-            self.cvpService.downloadImage( imageInfo[ 'name' ],
-                                           imageInfo[ 'imageId' ],
-                                           storageDirPath )
+      if download:
+         limiter = None
+         if bytesPerSecond:
+            limiter = cvpServices.BandwidthLimiter( bytesPerSecond )
+         self.executor.map( lambda imageInfo: self.cvpService.downloadImage(
+                                                   imageInfo[ 'name' ],
+                                                   imageInfo[ 'imageId' ],
+                                                   storageDirPath,
+                                                   md5=imageInfo.get( 'md5' ),
+                                                   limiter=limiter ),
+                            imagesInfo )
       return imageList
 
+   def iterImages( self, pageSize=cvpServices.DEFAULT_PAGE_SIZE ):
+      '''Yields the images as they are received, without downloading them
+      Argument:
+         pageSize -- images per request, 0 for a single request
+      Returns:
+         images -- iterator of images ( type : Iterator of Image ( class ) )
+      '''
+      for imageInfo in self.cvpService.iterImagesInfo( pageSize ):
+         yield Image( imageInfo[ 'name' ],
+                      imageInfo[ 'isRebootRequired' ] == 'true' )
+
    def reconcileDeviceConfig( self, device, configlets ):
       '''
       Validate the given "configlets", and reconcile against "device".
@@ -976,39 +1323,35 @@ class Cvp( Jsonable ):
 
       eventId = self.cvpService.reconcileContainer( containerId )[ 'data' ]
       if wait:
-         # wait for the event to complete
-         end = time.time() + timeout
-         while True:
-            if timeout != 0 and time.time() >= end:
-               break
-            parentEventData = self.cvpService.getEvent( eventId )[ 'data' ]
-            if parentEventData[ 'status' ] == 'COMPLETED':
-               childEventData = self.cvpService.getChildEventData( eventId )
-               assert parentEventData[ 'total' ] == childEventData[ 'total' ]
-               events = []
-               for subEvent in childEventData[ 'data' ]:
-                  assert eventId == subEvent[ 'parentKey' ]
-                  assert subEvent[ 'status' ] == 'COMPLETED'
-                  events.append( Event( subEvent[ 'key' ],
-                                        subEvent[ 'parentKey' ],
-                                        subEvent[ 'objectId' ],
-                                        subEvent[ 'eventType' ],
-                                        subEvent[ 'status' ],
-                                        int( subEvent[ 'data' ][ 'complianceCode' ] ),
-                                        subEvent[ 'message' ],
-                                        subEvent[ 'errors' ],
-                                        subEvent[ 'warning' ],
-                                        subEvent[ 'data' ] ) )
-               return events
-            else:
-               time.sleep( 1 )
-
-         if timeout != 0 and time.time() >= end:
-            # raise timeout error
-            raise cvpServices.CvpError( errorCodes.TIMEOUT )
+         return self._waitForChildEvents( eventId, timeout )
       else:
          return eventId
 
+   def _waitForChildEvents( self, eventId, timeout ):
+      '''Waits for the event to complete and returns its sub events. timeout is
+      the number of seconds to wait for, or indefinitely if 0.
+      Raises: CvpError on timeout.'''
+      parentEventData = cvpServices.Poller( timeout ).wait(
+                           lambda: self.cvpService.getEvent( eventId )[ 'data' ],
+                           lambda eventData: eventData[ 'status' ] == 'COMPLETED' )
+      childEventData = self.cvpService.getChildEventData( eventId )
+      assert parentEventData[ 'total' ] == childEventData[ 'total' ]
+      events = []
+      for subEvent in childEventData[ 'data' ]:
+         assert eventId == subEvent[ 'parentKey' ]
+         assert subEvent[ 'status' ] == 'COMPLETED'
+         events.append( Event( subEvent[ 'key' ],
+                               subEvent[ 'parentKey' ],
+                               subEvent[ 'objectId' ],
+                               subEvent[ 'eventType' ],
+                               subEvent[ 'status' ],
+                               int( subEvent[ 'data' ][ 'complianceCode' ] ),
+                               subEvent[ 'message' ],
+                               subEvent[ 'errors' ],
+                               subEvent[ 'warning' ],
+                               subEvent[ 'data' ] ) )
+      return events
+
    def getImage( self, imageName , storageDirPath='', download=False ):
       ''' Image is downloaded and saved in directory path given by "storageDirPath"
       Argument :
@@ -1028,7 +1371,8 @@ class Cvp( Jsonable ):
             if download:
                self.cvpService.downloadImage( imageInfo[ 'name' ],
                                               imageInfo[ 'imageId' ],
-                                              storageDirPath )
+                                              storageDirPath,
+                                              md5=imageInfo.get( 'md5' ) )
             break
       if imagePresentFlag == False:
          raise cvpServices.CvpError( errorCodes.INVALID_IMAGE_NAME )
@@ -1044,7 +1388,23 @@ class Cvp( Jsonable ):
          Configlet -- information of the configlet ( type : Configlet ( class ) )
       '''
       configletInfo = self.cvpService.getConfigletByName( configletName )
-      genConfigMapInfo = self.cvpService.getConfigletMapper()
+      mapperIndex = None
+      if configletInfo[ 'type' ] in ( 'Static', 'Generated' ):
+         mapperIndex = self._getConfigletMapperIndex()
+      return self._configletFromInfo( configletInfo, mapperIndex, {} )
+
+   def _configletFromInfo( self, configletInfo, mapperIndex, builderNames ):
+      '''Builds the Configlet object for the configlet information returned by
+      Cvp. Reconciled and generated configlets without a mapper are returned
+      as None.
+      Arguments:
+         configletInfo -- configlet information ( type : Dict )
+         mapperIndex -- result of _getConfigletMapperIndex()
+         builderNames -- memo of configlet builder key to name, filled in
+                         as builders are looked up ( type : Dict )
+      Returns:
+         Configlet -- information of the configlet ( type : Configlet ( class ) )
+      '''
       if ( configletInfo[ 'type' ] == 'Static' and
            configletInfo[ 'reconciled' ] == False ):
          return Configlet( configletInfo[ 'name' ], configletInfo[ 'config' ],
@@ -1053,24 +1413,25 @@ class Cvp( Jsonable ):
                            sslConfig=configletInfo[ 'sslConfig' ] )
       elif ( configletInfo[ 'type' ] == 'Static' and
              configletInfo[ 'reconciled' ] == True ):
-         for configlet in genConfigMapInfo[ 'configletMappers' ]:
-            if configlet[ 'configletId' ] == configletInfo[ 'key' ]:
-               return ReconciledConfiglet( configletInfo[ 'name' ],
+         configlet = mapperIndex[ 0 ].get( configletInfo[ 'key' ] )
+         if configlet:
+            return ReconciledConfiglet( configletInfo[ 'name' ],
                                  configletInfo[ 'config' ], configlet[ 'objectId' ],
                                  user=configletInfo[ 'user' ] )
       elif configletInfo[ 'type' ] == 'Generated':
-         for genConfiglet in genConfigMapInfo[ 'generatedConfigletMappers' ]:
-            if configletInfo[ 'key' ] == genConfiglet[ 'configletId' ]:
-               builderInfo = self.cvpService.getConfigletBuilder(
-                                    genConfiglet[ 'configletBuilderId' ] )
-               containerInfo = self.cvpService.getContainerInfoByKey(
-                                    genConfiglet[ 'containerId' ] )
-               containerName = containerInfo[ 'name' ]
-               return GeneratedConfiglet( configletInfo[ 'name' ],
-                                    configletInfo[ 'config' ], builderInfo[ 'name' ],
-                                    containerName, genConfiglet[ 'netElementId' ],
-                                    user=configletInfo[ 'user' ],
-                                    sslConfig=configletInfo[ 'sslConfig' ] )
+         genConfiglet = mapperIndex[ 1 ].get( configletInfo[ 'key' ] )
+         if genConfiglet:
+            builderId = genConfiglet[ 'configletBuilderId' ]
+            if builderId not in builderNames:
+               builderNames[ builderId ] = self.cvpService.getConfigletBuilder(
+                                                                builderId )[ 'name' ]
+            containerName = self.cvpService.containerName(
+                                                     genConfiglet[ 'containerId' ] )
+            return GeneratedConfiglet( configletInfo[ 'name' ],
+                                 configletInfo[ 'config' ], builderNames[ builderId ],
+                                 containerName, genConfiglet[ 'netElementId' ],
+                                 user=configletInfo[ 'user' ],
+                                 sslConfig=configletInfo[ 'sslConfig' ] )
       elif configletInfo[ 'type' ] == 'Builder':
          configletBuilderInfo = self.cvpService.getConfigletBuilder(
                                   configletInfo[ 'key' ] )
@@ -1124,8 +1485,7 @@ class Cvp( Jsonable ):
       '''Adds the mapping be the generated configlets, devices and containers'''
       containerInfo = self._getContainerInfo( configlet.containerName )
       containerId = containerInfo[ 'key' ]
-      builderInfo = self.cvpService.getConfigletByName( configlet.builderName )
-      builderId = builderInfo[ 'key' ]
+      builderId = self._getConfigletKeys( [ configlet.builderName ] )[ 0 ]
       self.cvpService.addGeneratedConfiglet( configlet.name, configlet.config,
                                              containerId, configlet.deviceMac,
                                              builderId )
@@ -1145,8 +1505,7 @@ class Cvp( Jsonable ):
          CvpError -- If configlet name is invalid
       '''
       assert isinstance( configlet, Configlet )
-      configletInfo = self.cvpService.getConfigletByName( configlet.name )
-      configletKey = configletInfo[ 'key' ]
+      configletKey = self._getConfigletKeys( [ configlet.name ] )[ 0 ]
       listOfTasks = []
       listOfTaskIds = []
       if isinstance( configlet, ConfigletBuilder ):
@@ -1189,8 +1548,7 @@ class Cvp( Jsonable ):
          CvpError -- If configlet name is invalid
       '''
       assert isinstance( configlet, Configlet )
-      configletInfo = self.cvpService.getConfigletByName( configlet.name )
-      configletKey = configletInfo[ 'key' ]
+      configletKey = self._getConfigletKeys( [ configlet.name ] )[ 0 ]
       self.cvpService.deleteConfiglet( configlet.name, configletKey )
 
    def updateImageBundle( self, imageBundle, imageList ):
@@ -1206,36 +1564,26 @@ class Cvp( Jsonable ):
       assert all ( isinstance( image, Image ) for image in imageList )
       currImageBundle = self.cvpService.getImageBundleByName( imageBundle.name )
       imageBundleKey = currImageBundle[ 'key' ]
-      imageDataList = []
-      for image in imageList:
-         imageData = self._addImage( str( image.name ) )
-         if image.rebootRequired == True:
-            imageData[ 'isRebootRequired' ] = 'true'
-         else:
-            imageData[ 'isRebootRequired' ] = 'false'
-         imageDataList.append( imageData )
+      imageDataList = self._addImages( imageList )
       self.cvpService.updateImageBundle( imageBundle.name, imageBundle.certified,
                                          imageDataList, imageBundleKey )
 
-   def addImageBundle( self, imageBundle, imageList, imagesSrcDir='' ):
-      ''' Add an image bundle with an image.
+   def addImageBundle( self, imageBundle, imageList, imagesSrcDir='',
+                       progress=None ):
+      ''' Add an image bundle with an image. Missing images are uploaded
+      concurrently.
       Arguments:
          imageBundle -- image bundle inforamtion object ( type: ImageBundle class )
          imageList -- image objects list ( type : List Image Class )
          imagesSrcDir -- path to the image source directory ( type : str )
+         progress -- called as progress( imageName, bytesSent, totalBytes )
+                     while images are uploaded ( optional )
       Raises:
          CvpError -- If image bundle with same name already exists
       '''
       assert isinstance( imageBundle, ImageBundle )
       assert all ( isinstance( image, Image ) for image in imageList )
-      imageInfoList = []
-      for image in imageList:
-         imageData = self._addImage( str( image.name ), imagesSrcDir )
-         if image.rebootRequired == True:
-            imageData[ 'isRebootRequired' ] = 'true'
-         else:
-            imageData[ 'isRebootRequired' ] = 'false'
-         imageInfoList.append( imageData )
+      imageInfoList = self._addImages( imageList, imagesSrcDir, progress )
       self.cvpService.saveImageBundle( imageBundle.name, imageBundle.certified,
                                        imageInfoList )
 
@@ -1253,23 +1601,44 @@ class Cvp( Jsonable ):
                     'swiVarient' : imageInfo[ 'swiVarient' ] }
       return imageData
 
-   def _addImage( self, imageName, imagesSrcDir='' ):
+   def _addImages( self, imageList, imagesSrcDir='', progress=None ):
+      '''Adds the images of a bundle, uploading the missing ones concurrently
+      Returns:
+         imageDataList -- information of the images, in the order of imageList
+      '''
+      imagesInfo = self.cvpService.getImagesInfo()
+      def addImage( image ):
+         imageData = self._addImage( str( image.name ), imagesSrcDir, imagesInfo,
+                                     progress )
+         if image.rebootRequired == True:
+            imageData[ 'isRebootRequired' ] = 'true'
+         else:
+            imageData[ 'isRebootRequired' ] = 'false'
+         return imageData
+      return self.executor.map( addImage, imageList )
+
+   def _addImage( self, imageName, imagesSrcDir='', imagesInfo=None,
+                  progress=None ):
       '''Check if image is already present in CVP instance or not.
       If not then add the image to the CVP in instance.
       Arguments:
          imageName -- Name of the image to add ( type : str )
          imagesSrcDir -- path to the image source directory ( type : str )
+         imagesInfo -- result of getImagesInfo(), fetched if not given
+         progress -- upload progress callback of CvpService.addImage
       Returns:
          imageData -- information of the added image
       '''
       imageAddFlag = False
-      imagesInfo = self.cvpService.getImagesInfo()
+      if imagesInfo is None:
+         imagesInfo = self.cvpService.getImagesInfo()
       for imageInfo in imagesInfo:
          if imageInfo[ 'name' ] == os.path.basename( imageName ):
             imageAddFlag = True
             break
       if imageAddFlag == False:
-         imageInfo = self.cvpService.addImage( imageName, imagesSrcDir )
+         imageInfo = self.cvpService.addImage( imageName, imagesSrcDir, progress,
+                                               imagesInfo )
          imageData = self._convertToImageData( imageInfo )
          return imageData
       else:
@@ -1370,17 +1739,13 @@ class Cvp( Jsonable ):
 
    def _getConfigletKeys( self, configletNameList ):
       '''Returns keys for corresponding configlet names in the
-      configletNameList'''
+      configletNameList, resolved case-insensitively from the configlet catalog'''
       configletKeyList = []
-      configletNum = len( configletNameList )
-      configletsInfo = self.cvpService.getConfigletsInfo()
-      configletsInfoDict = {}
-      for configletInfo in configletsInfo:
-         configletsInfoDict[ configletInfo [ 'name' ] ] = configletInfo[ 'key' ]
-      configletKeyList = [ configletsInfoDict [ name ] for name
-                           in configletNameList if name in configletsInfoDict ]
-      if len( configletKeyList ) < configletNum:
-         raise cvpServices.CvpError( errorCodes.INVALID_CONFIGLET_NAME )
+      for configletName in configletNameList:
+         configletInfo = self.cvpService.lookupConfiglet( configletName )
+         if not configletInfo:
+            raise cvpServices.CvpError( errorCodes.INVALID_CONFIGLET_NAME )
+         configletKeyList.append( configletInfo[ 'key' ] )
       return configletKeyList
 
    def mapConfigletToContainer( self, container, configletList ):
@@ -1412,10 +1777,17 @@ class Cvp( Jsonable ):
       ''' Checks whether the new configlets to be applied to CVP objects ( Device,
       Container ) are already applied or not. Returns actionRegd ( flag ), final cnl,
       cknl, cbnl, cbkl'''
+      actionReqd, cnl, cbnl = self._newConfigMapping( appliedConfigs,
+                                                      newConfigletList )
+      ckl = self._getConfigletKeys( cnl )
+      cbkl = self._getConfigletKeys( cbnl )
+      return actionReqd, cnl, ckl, cbnl, cbkl
+
+   def _newConfigMapping( self, appliedConfigs, newConfigletList ):
+      '''Returns actionReqd ( flag ) and the final cnl and cbnl of a CVP object
+      once the new configlets are applied to it'''
       cnl = []
-      ckl = []
       cbnl = []
-      cbkl = []
       appliedConfigNames = []
       appliedCBNames = []
       actionReqd = False
@@ -1443,9 +1815,7 @@ class Cvp( Jsonable ):
       cbnl = appliedCBNames + cbnl
       if cnl != appliedConfigNames or cbnl != appliedCBNames:
          actionReqd = True
-      ckl = self._getConfigletKeys( cnl )
-      cbkl = self._getConfigletKeys( cbnl )
-      return actionReqd, cnl, ckl, cbnl, cbkl
+      return actionReqd, cnl, cbnl
 
 
    def _checkRemoveConfigMapping( self, appliedConfigs, rmConfigletList ):
@@ -1569,6 +1939,97 @@ class Cvp( Jsonable ):
       return self.cvpService.addContainer( container.name,
                                     container.parentName, parentContainerId )
 
+   def addContainerTree( self, tree, parentName=None,
+                         batchSize=cvpServices.TEMP_ACTION_BATCH_SIZE ):
+      '''Adds the containers of a tree missing from the inventory, with a single
+      topology save. The tree is compared with the container hierarchy of one
+      filterTopology request, and only the missing containers are added, parents
+      first. New parents are referred to by their temporary ids until the save,
+      so nothing is queried between the additions. The container index is
+      refreshed after the save, which makes the keys of the added containers
+      available through cvpService.containerKey; inside a transaction this
+      happens when the transaction commits.
+
+      The tree maps container names to their children, given as a dict of the
+      same form, as a list of names and such dicts, or as None. Siblings are
+      added in name order, or in their order for an OrderedDict or a list. The
+      tree may also be a YAML document, when PyYAML is installed:
+
+         dc1:
+           pod1: [ leaf1, leaf2 ]
+           pod2:
+
+      Arguments:
+         tree -- containers to be added ( type : Dict or YAML String )
+         parentName -- container the top containers of the tree are added to,
+                       the root container by default. The tree may also start
+                       with this container ( type : String )
+         batchSize -- temp actions per addTempAction request ( type : Int )
+      Raises:
+         CvpError -- If parentName is invalid
+         CvpError -- If a container of the tree exists under another parent or
+                     appears twice in the tree
+         CvpError -- If an added container is missing after the save
+      Returns:
+         containers -- the added containers, parents first
+                       ( type : List of Container( class ) )
+      '''
+      if isinstance( tree, basestring ):
+         if yaml is None:
+            raise cvpServices.CvpError( errorCodes.INVALID_ARGUMENT,
+                                        'PyYAML is required to parse %r' % tree )
+         tree = yaml.safe_load( tree )
+      index = self.cvpService.containerIndex( refresh=True )
+      if parentName is None:
+         parentKey = cvpServices.ROOT_CONTAINER_KEY
+      else:
+         parentKey = index.key( parentName )
+         if parentKey is None:
+            raise cvpServices.CvpError( errorCodes.INVALID_CONTAINER_NAME )
+      parentName = index.name( parentKey )
+      children = _containerTreeChildren( tree )
+      if len( children ) == 1 and children[ 0 ][ 0 ].lower() == parentName.lower():
+         children = _containerTreeChildren( children[ 0 ][ 1 ] )
+
+      containerList = []
+      containers = []
+      seen = set()
+      pending = [ ( name, subtree, parentName, parentKey )
+                  for name, subtree in children ]
+      while pending:
+         name, subtree, containerParentName, containerParentKey = pending.pop( 0 )
+         if name.lower() in seen:
+            raise cvpServices.CvpError( errorCodes.INVALID_CONTAINER_NAME,
+                  'Container %s appears twice in the tree' % name )
+         seen.add( name.lower() )
+         key = index.key( name )
+         if key is None:
+            key = 'New_container%d' % ( len( containerList ) + 1 )
+            containerList.append( ( name, containerParentName, containerParentKey,
+                                    key ) )
+            containers.append( Container( name, containerParentName ) )
+         elif index.parent( key ) != containerParentKey:
+            raise cvpServices.CvpError( errorCodes.INVALID_CONTAINER_NAME,
+                  'Container %s exists under %s' % ( name,
+                                             index.name( index.parent( key ) ) ) )
+         else:
+            name = index.name( key )
+         pending.extend( ( childName, childTree, name, key )
+                         for childName, childTree in
+                         _containerTreeChildren( subtree ) )
+      self.cvpService.addContainers( containerList, batchSize )
+      if containerList and self.cvpService.transaction is None:
+         # the save only returns task ids, the keys are read back by name
+         index = self.cvpService.containerIndex( refresh=True )
+         for name, containerParentName, _, _ in containerList:
+            key = index.key( name )
+            if key is None or ( index.name( index.parent( key ) ) or '' ).lower() \
+                              != containerParentName.lower():
+               raise cvpServices.CvpError( errorCodes.INVALID_CONTAINER_NAME,
+                     'Container %s was not added under %s' % ( name,
+                                                      containerParentName ) )
+      return containers
+
    def isDevicePresent( self, device ):
       '''Check if device is present in inventory or not.
       This calls getNetElementById() for checking the device info. getNetElmentById() returns
@@ -1687,9 +2148,8 @@ class Cvp( Jsonable ):
 
    def _getDevicesFromInventory(self, ipAddressOrNameList):
       ipAddressOrNameSet = set( ipAddressOrNameList )
-      devices, _ = self.cvpService.getInventory(populateParentContainerKeyMap=False)
       connectedDevices = {}
-      for deviceInfo in devices:
+      for deviceInfo in self.cvpService.iterInventory():
          deviceName = ""
          if deviceInfo[ 'ipAddress' ] in ipAddressOrNameSet:
             deviceName = deviceInfo[ 'ipAddress' ]
@@ -1703,8 +2163,7 @@ class Cvp( Jsonable ):
          if containerKey == "":
             containerName = ""
          else:
-            containerName = self.cvpService.getContainerInfoByKey(
-               containerKey )['name']
+            containerName = self.cvpService.containerName( containerKey )
          connectedDevices[ deviceName ] = Device(
                            ipAddress=deviceInfo[ 'ipAddress' ],
                            fqdn=deviceInfo[ 'fqdn' ],
@@ -1800,16 +2259,16 @@ class Cvp( Jsonable ):
       return connectedDevice, taskId
 
    def _checkDCAInstallStatus( self, macAddress, timeout=300 ):
-      timeout *= 2
-      status =  self.cvpService.getNetElementById( macAddress )[ 'status' ]
-      while status == Device.DCA_INSTALLATION_IN_PROGRESS and timeout > 0:
-         time.sleep( 0.5 )
-         status =  self.cvpService.getNetElementById( macAddress )[ 'status' ]
-         timeout -= 1
+      try:
+         status = cvpServices.Poller( timeout ).wait(
+            lambda: self.cvpService.getNetElementById( macAddress )[ 'status' ],
+            lambda status: status != Device.DCA_INSTALLATION_IN_PROGRESS )
+      except cvpServices.CvpError as e:
+         if e.errorCode != errorCodes.TIMEOUT:
+            raise
+         raise cvpServices.CvpError( errorCodes.DCA_INSTALLATION_IN_PROGRESS )
       if status == Device.DCA_INSTALLATION_FAILED:
          raise cvpServices.CvpError( errorCodes.DCA_INSTALLATION_FAILED )
-      elif status == Device.DCA_INSTALLATION_IN_PROGRESS:
-         raise cvpServices.CvpError( errorCodes.DCA_INSTALLATION_IN_PROGRESS )
       return status
 
    def _getTempDeviceStatus( self, device ):
@@ -1843,18 +2302,12 @@ class Cvp( Jsonable ):
       assert all( isinstance( device, Device ) for device in deviceList )
       connectedDeviceList = []
       for device in deviceList:
-         end = time.time() + timeout
-         while time.time() < end:
-            status = self._getTempDeviceStatus( device )
-            s = Device.REG_IN_PROGRESS if status[ 'status' ] == 'Upgrade required' \
-                  else Device.REGISTERED if status[ 'status' ] == 'Connected' \
-                  else Device.UNKNOWN
-            if status[ 'status' ] != 'Connecting':
-               break
-            time.sleep( 0.4 )
-         if time.time() >= end:
-            # raise timeout error
-            raise cvpServices.CvpError( errorCodes.TIMEOUT )
+         status = cvpServices.Poller( timeout ).wait(
+                     lambda: self._getTempDeviceStatus( device ),
+                     lambda status: status[ 'status' ] != 'Connecting' )
+         s = Device.REG_IN_PROGRESS if status[ 'status' ] == 'Upgrade required' \
+               else Device.REGISTERED if status[ 'status' ] == 'Connected' \
+               else Device.UNKNOWN
          if status[ 'status' ] == 'Connected':
             device = Device( ipAddress=status[ 'ipAddress' ],
                              fqdn=status[ 'fqdn' ],
@@ -2033,7 +2486,6 @@ class Cvp( Jsonable ):
       assert isinstance( device, Device )
       assert all ( isinstance( configlet, Configlet ) for configlet in
                                                                       configletList )
-      self.cvpService.saveInventory()
       configletsInfo = self.cvpService.getDeviceConfiglets( device.macAddress )
       actionReqd, cnl, ckl, cbnl, cbkl = self._checkNewConfigMapping( configletsInfo,
                                                    configletList, device )
@@ -2042,6 +2494,71 @@ class Cvp( Jsonable ):
                                                  device.fqdn, device.macAddress, cnl,
                                                  ckl, cbnl, cbkl )
 
+   def mapConfigletsToDevices( self, deviceConfigletMap,
+                               batchSize=cvpServices.TEMP_ACTION_BATCH_SIZE ):
+      '''Applies configlets to many devices with a single topology save. The
+      configlets applied to the devices are fetched concurrently, the configlet
+      keys are resolved once for all devices and the temp actions are sent
+      batchSize devices at a time.
+      Arguments:
+         deviceConfigletMap -- configlets to be applied to every device
+               ( type : Dict of Device to List of Configlet Objects )
+         batchSize -- devices per addTempAction request ( type : Int )
+      Raises:
+         CvpError -- If device information is incorrect
+         CvpError -- If the configlet lists contain invalid configlet names
+      Returns:
+         deviceTaskMap -- task ids created for every device that needed a new
+               mapping ( type : Dict of Device to List of task ids )
+      '''
+      devices = list( deviceConfigletMap )
+      assert all( isinstance( device, Device ) for device in devices )
+      assert all( isinstance( configlet, Configlet ) for configletList in
+                  deviceConfigletMap.values() for configlet in configletList )
+      configletsInfoList = self.executor.map(
+            lambda device: self.cvpService.getDeviceConfiglets( device.macAddress ),
+            devices )
+      mappings = []
+      for device, configletsInfo in zip( devices, configletsInfoList ):
+         actionReqd, cnl, cbnl = self._newConfigMapping( configletsInfo,
+                                                   deviceConfigletMap[ device ] )
+         if actionReqd:
+            mappings.append( ( device, cnl, cbnl ) )
+      names = list( set( name for _, cnl, cbnl in mappings for name in cnl + cbnl ) )
+      keys = dict( zip( names, self._getConfigletKeys( names ) ) )
+      taskIds = self.cvpService.applyConfigletsToDevices(
+            [ ( device.ipAddress, device.fqdn, device.macAddress,
+                cnl, [ keys[ name ] for name in cnl ],
+                cbnl, [ keys[ name ] for name in cbnl ] )
+              for device, cnl, cbnl in mappings ], batchSize )
+      deviceTaskMap = self._getDeviceTasksInfo(
+                              [ device for device, _, _ in mappings ], taskIds )
+      return dict( ( device, [ taskId for taskId, _ in tasks ] )
+                   for device, tasks in deviceTaskMap.iteritems() )
+
+   def _getDeviceTasksInfo( self, devices, taskIds ):
+      '''Returns the ( taskId, taskInfo ) of the new tasks of every device, found
+      with one listing of the pending tasks. Tasks no longer pending are
+      retrieved one by one.'''
+      deviceTaskMap = dict( ( device, [] ) for device in devices )
+      deviceByMac = dict( ( device.macAddress, device ) for device in devices )
+      taskIdMap = dict( ( str( taskId ), taskId ) for taskId in taskIds )
+      if not taskIdMap:
+         return deviceTaskMap
+      tasksInfo = [ taskInfo for taskInfo in
+                    self.cvpService.iterTasks( Task.PENDING, pageSize=0 )
+                    if str( taskInfo[ 'workOrderId' ] ) in taskIdMap ]
+      tasksInfo += self.executor.map( self.cvpService.getTaskById,
+            [ int( taskId ) for taskId in set( taskIdMap ).difference(
+               str( taskInfo[ 'workOrderId' ] ) for taskInfo in tasksInfo ) ] )
+      for taskInfo in tasksInfo:
+         mac = taskInfo.get( 'workOrderDetails', {} ).get( 'netElementId' ) or \
+               taskInfo.get( 'netElementId' )
+         if mac in deviceByMac:
+            deviceTaskMap[ deviceByMac[ mac ] ].append(
+                  ( taskIdMap[ str( taskInfo[ 'workOrderId' ] ) ], taskInfo ) )
+      return deviceTaskMap
+
    def executeAllPendingTask( self ):
       '''Executes all the pending tasks.
       '''
@@ -2078,29 +2595,86 @@ class Cvp( Jsonable ):
       '''Finds all the pending tasks from the Cvp instance '''
       return self.getTasks( Task.PENDING )
 
-   def monitorTaskStatus( self, taskList, status=Task.COMPLETED, timeout=600 ):
-      '''Poll for tasks to be in the state described by status
+   def monitorTaskStatus( self, taskList, status=Task.COMPLETED, timeout=600,
+                          raiseOnError=True ):
+      '''Poll for tasks to be in the state described by status. Each round reads
+      the short listings of the tasks that are not done yet ( Task.ACTIVE_STATES )
+      and looks up only the outstanding tasks missing from them, so the size of
+      the task history does not matter. The delay between rounds grows while no
+      task changes state. The tasks in taskList are not modified.
+      Arguments:
+         taskList -- tasks to monitor ( type : List of Task ( class ) )
+         status -- state the tasks are expected to reach ( type : String )
+         timeout -- seconds to wait for all the tasks ( type : Int )
+         raiseOnError -- raise once all tasks are done if any of them failed or
+                         was cancelled ( type : Boolean )
       Returns:
-         nothing on success
+         results -- final state of every task and the seconds it took to reach
+                    it, { taskId : { 'status' : ..., 'elapsed' : ... } }
+                    ( type : Dict )
       Raises:
-         CvpError -- on timeout
+         CvpError -- on timeout, or if a task failed or was cancelled and
+                     raiseOnError is set. The results are in the response of
+                     the error
       '''
       assert all ( isinstance( task, Task ) for task in taskList )
-      end = time.time() + timeout
-      while time.time() < end and taskList:
-         task = self.cvpService.getTaskById( taskList[ -1 ].taskId )
-         taskStatus = task[ 'workOrderUserDefinedStatus' ]
-         if taskStatus == status:
-            taskList = taskList[ :-1 ]
-         elif taskStatus in [ Task.FAILED, Task.CANCELED ]:
-            raise cvpServices.CvpError( errorCodes.TASK_EXECUTION_ERROR,
-                                        'Task %d %s' %
-                                        ( taskList[ -1 ].taskId, taskStatus ) )
-         else:
-            time.sleep( 1 )
-      if time.time() >= end:
-         # raise timeout error
-         raise cvpServices.CvpError( errorCodes.TIMEOUT )
+      tasks = dict( ( task.taskId, task ) for task in taskList )
+      results = {}
+      start = time.time()
+      def collectFinished():
+         finished = self._pollTaskStatus( tasks, status ) if tasks else {}
+         now = time.time()
+         for taskId, taskStatus in finished.iteritems():
+            del tasks[ taskId ]
+            results[ taskId ] = { 'status' : taskStatus, 'elapsed' : now - start }
+         return finished
+      try:
+         # poll quickly while tasks are finishing, back off while they are not
+         cvpServices.Poller( timeout, interval=TASK_POLL_MIN_INTERVAL,
+                             maxInterval=TASK_POLL_MAX_INTERVAL ).wait(
+            collectFinished, lambda finished: not tasks, progress=bool )
+      except cvpServices.CvpError as e:
+         if e.errorCode == errorCodes.TIMEOUT:
+            e.response = results
+         raise
+      failed = [ taskId for taskId in sorted( results )
+                 if results[ taskId ][ 'status' ] != status ]
+      if failed and raiseOnError:
+         raise cvpServices.CvpError( errorCodes.TASK_EXECUTION_ERROR,
+                                     ', '.join( 'Task %d %s' % ( taskId,
+                                                results[ taskId ][ 'status' ] )
+                                                for taskId in failed ),
+                                     response=results )
+      return results
+
+   def _pollTaskStatus( self, tasks, status ):
+      '''Finds which of the outstanding tasks reached status, failed or were
+      cancelled. Tasks found in the listings of the active states are still
+      running, unless status is one of these states; the final state of the
+      others is looked up one task at a time.
+      Returns:
+         finished -- task id to final task status ( type : Dict )
+      '''
+      finalStates = ( status, Task.FAILED, Task.CANCELED )
+      finished = {}
+      running = set()
+      for activeStatus in Task.ACTIVE_STATES:
+         for taskInfo in self.cvpService.iterTasks( activeStatus ):
+            taskId = int( taskInfo[ 'workOrderId' ] )
+            if taskId in tasks:
+               if activeStatus in finalStates:
+                  finished[ taskId ] = activeStatus
+               else:
+                  running.add( taskId )
+      # tasks that left the active listings since the last round
+      leftIds = [ taskId for taskId in tasks
+                  if taskId not in running and taskId not in finished ]
+      for taskId, taskInfo in zip( leftIds, self.executor.map(
+                                      self.cvpService.getTaskById, leftIds ) ):
+         taskStatus = taskInfo[ 'workOrderUserDefinedStatus' ]
+         if taskStatus in finalStates:
+            finished[ taskId ] = taskStatus
+      return finished
 
    def monitorEventStatus( self, eventList, status=Event.COMPLETED, timeout=600 ):
       '''Poll for events to be in the state described by status
@@ -2111,22 +2685,18 @@ class Cvp( Jsonable ):
       '''
       assert all( isinstance( event, Event ) for event in eventList )
 
+      def cancelled( event, eventStatus ):
+         if eventStatus == Event.CANCELED:
+            return cvpServices.CvpError( errorCodes.EVENT_COMPLETION_ERROR,
+                                         'Event %s %s' %
+                                         ( event.eventId, eventStatus ) )
+
       for event in eventList:
-         end = time.time() + timeout
-         while time.time() < end:
-            eventStatus = self.getEvent( event.eventId ).status
+         cvpServices.Poller( timeout ).wait(
+            lambda: self.getEvent( event.eventId ).status,
             # eventStatus can be 'COMPLETED' or 'Completed' for completed events
-            if eventStatus.lower() == status.lower():
-               break
-            elif eventStatus == Event.CANCELED:
-               raise cvpServices.CvpError( errorCodes.EVENT_COMPLETION_ERROR,
-                                            'Event %s %s' %
-                                           ( event.eventId, eventStatus ) )
-            # Try again
-            time.sleep( 1 )
-         if time.time() >= end:
-            # Raise timeout error
-            raise cvpServices.CvpError( errorCodes.TIMEOUT )
+            lambda eventStatus: eventStatus.lower() == status.lower(),
+            lambda eventStatus: cancelled( event, eventStatus ) )
 
    def _getImageNameList( self, imageBundleInfo ):
       '''Return list of images present in image bundle'''
@@ -2146,9 +2716,11 @@ class Cvp( Jsonable ):
       '''
       imageBundlesInfo = self.cvpService.getImageBundles()
       imageBundleList = []
-      for bundleInfo in imageBundlesInfo:
-         imageBundleInfo = self.cvpService.getImageBundleByName(
-                                                               bundleInfo[ 'name' ] )
+      bundleNames = [ bundleInfo[ 'name' ] for bundleInfo in imageBundlesInfo ]
+      imageBundleInfoList = self.executor.map(
+                                 self.cvpService.getImageBundleByName, bundleNames )
+      for bundleInfo, imageBundleInfo in zip( imageBundlesInfo,
+                                              imageBundleInfoList ):
          imageNameList = self._getImageNameList( imageBundleInfo )
          certified = ( imageBundleInfo[ 'isCertifiedImageBundle' ] == 'true' )
          user = imageBundleInfo[ 'uploadedBy' ]
@@ -2225,36 +2797,7 @@ class Cvp( Jsonable ):
 
       eventId = self.cvpService.complianceCheck( 'container', containerId )[ 'data' ]
       if wait:
-         # wait for the event to complete
-         end = time.time() + timeout
-         while True:
-            if timeout != 0 and time.time() >= end:
-               break
-            parentEventData = self.cvpService.getEvent( eventId )[ 'data' ]
-            if parentEventData[ 'status' ] == 'COMPLETED':
-               childEventData = self.cvpService.getChildEventData( eventId )
-               assert parentEventData[ 'total' ] == childEventData[ 'total' ]
-               events = []
-               for subEvent in childEventData[ 'data' ]:
-                  assert eventId == subEvent[ 'parentKey' ]
-                  assert subEvent[ 'status' ] == 'COMPLETED'
-                  events.append( Event( subEvent[ 'key' ],
-                                        subEvent[ 'parentKey' ],
-                                        subEvent[ 'objectId' ],
-                                        subEvent[ 'eventType' ],
-                                        subEvent[ 'status' ],
-                                        int( subEvent[ 'data' ][ 'complianceCode' ] ),
-                                        subEvent[ 'message' ],
-                                        subEvent[ 'errors' ],
-                                        subEvent[ 'warning' ],
-                                        subEvent[ 'data' ] ) )
-               return events
-            else:
-               time.sleep( 1 )
-
-         if timeout != 0 and time.time() >= end:
-            # raise timeout error
-            raise cvpServices.CvpError( errorCodes.TIMEOUT )
+         return self._waitForChildEvents( eventId, timeout )
       else:
          return eventId
 
@@ -2278,19 +2821,7 @@ class Cvp( Jsonable ):
       Returns:
          container -- Container object containing information about root container
       '''
-      containerKey = cvpServices.ROOT_CONTAINER_KEY
-      containerInfo = self.cvpService.getContainerInfoByKey(containerKey)
-      imageBundleNameList = self._getImageBundleNameList()
-      imageBundleMap = self._getContainerImageBundleMap( imageBundleNameList )
-      parentName = ''
-      containerName = containerInfo[ 'name' ]
-      configletsInfo = self.cvpService.getContainerConfiglets( containerKey )
-      configletNames = [ configlet[ 'name' ] for configlet in configletsInfo ]
-      appliedImageBundle = None
-      if containerName in imageBundleMap:
-         appliedImageBundle = imageBundleMap[ containerName ]
-      return Container( containerName, parentName, configletNames,
-                        appliedImageBundle )
+      return self._getContainerByKey( cvpServices.ROOT_CONTAINER_KEY )
 
    def deleteContainer( self, container ):
       '''delete the container from the Cvp inventory
@@ -2344,14 +2875,13 @@ class Cvp( Jsonable ):
       assert all( isinstance( device, Device ) for device in devices )
       resp = self.cvpService.deleteDevices( [ dev.macAddress for dev in devices ] )
       if wait:
-         end = time.time() + timeout
          pendingDevices = devices[ : ]
-         while pendingDevices and time.time() < end:
-            pendingDevices[ : ] = [ dev for dev in pendingDevices if self.isDevicePresent( dev ) ]
-            if pendingDevices:
-               time.sleep( 1 )
-         if time.time() >= end:
-            raise cvpServices.CvpError( errorCodes.TIMEOUT )
+         def removePending():
+            pendingDevices[ : ] = [ dev for dev in pendingDevices
+                                    if self.isDevicePresent( dev ) ]
+            return pendingDevices
+         cvpServices.Poller( timeout ).wait( removePending,
+                                             lambda pending: not pending )
       return resp
 
    def deployDevice( self, device, deviceTargetIp, container,
@@ -2370,7 +2900,8 @@ class Cvp( Jsonable ):
          configletBuilderList -- Optional, a list of configlet builders to be used to
                                  generate device specific configlets
          image -- Optional, an image to apply to the device
-      Returns: A list of Tasks that can be executed to complete the action
+      Returns: A list of Tasks that can be executed to complete the action, None
+               within a CvpTransaction
       '''
       assert isinstance( device, Device )
       assert isinstance( container, Container )
@@ -2410,12 +2941,87 @@ class Cvp( Jsonable ):
                                        cbnl, imageBundleKey, imageBundleName )
 
       tids = [ int(t) for t in response[ 'taskIds' ] ]
+      if not tids:
+         # saved when the open CvpTransaction is committed
+         return None
       assert len( tids ) == 1, "Only one task expected"
       tid = tids[ 0 ]
       info = self.cvpService.getTaskById( tid )
       task = Task( tid, info[ 'workOrderUserDefinedStatus' ], info[ 'description' ] )
       return task
 
+   def deployDevices( self, container, deployments,
+                      batchSize=cvpServices.TEMP_ACTION_BATCH_SIZE ):
+      ''' Move many devices from the undefined container to a target container,
+      with a single topology save. Optionally, apply device-specific configlets
+      and an image to every device. The configlet builders and configlets of the
+      container are fetched once for all the devices, and all the temp actions
+      are deleted if the deployment of any device fails.
+      Arguments:
+         container -- The container to move the devices to
+         deployments -- ( device, deviceTargetIp, configletList, imageBundle ) of
+                        every device. configletList and imageBundle may be None.
+                        The configlet builders in configletList are used to
+                        generate device specific configlets, as the
+                        configletBuilderList of deployDevice
+                        ( type : List of Tuples )
+         batchSize -- devices per addTempAction and autoConfigletGenerator
+                      request ( type : Int )
+      Returns: The Task completing the deployment of every device, empty within
+               a CvpTransaction ( type : Dict of Device to Task )
+      '''
+      assert isinstance( container, Container )
+      deployments = list( deployments )
+      names = set()
+      imageBundleNames = set()
+      for device, _, configletList, imageBundle in deployments:
+         assert isinstance( device, Device )
+         assert imageBundle is None or isinstance( imageBundle, ImageBundle )
+         assert all( isinstance( configlet, Configlet ) for configlet in
+                     configletList or [] )
+         names.update( configlet.name for configlet in configletList or [] )
+         if imageBundle:
+            imageBundleNames.add( imageBundle.name )
+      names = list( names )
+      keys = dict( zip( names, self._getConfigletKeys( names ) ) )
+      imageBundleNames = list( imageBundleNames )
+      imageBundleKeys = dict( zip( imageBundleNames, [ imageBundleInfo[ 'key' ]
+            for imageBundleInfo in self.executor.map(
+               self.cvpService.getImageBundleByName, imageBundleNames ) ] ) )
+      containerInfo = self._getContainerInfo( container.name )
+
+      deploymentList = []
+      for device, deviceTargetIp, configletList, imageBundle in deployments:
+         cnl = [ configlet.name for configlet in configletList or []
+                 if not isinstance( configlet, ConfigletBuilder ) ]
+         cbnl = [ configlet.name for configlet in configletList or []
+                  if isinstance( configlet, ConfigletBuilder ) ]
+         imageBundleName = imageBundle.name if imageBundle else None
+         deploymentList.append( ( device.macAddress, device.fqdn,
+                                  device.ipAddress, deviceTargetIp,
+                                  [ keys[ name ] for name in cnl ], cnl,
+                                  [ keys[ name ] for name in cbnl ], cbnl,
+                                  imageBundleKeys.get( imageBundleName ),
+                                  imageBundleName ) )
+      response = self.cvpService.deployDevices( deploymentList,
+                                                containerInfo[ 'key' ],
+                                                container.name, batchSize,
+                                                self.executor )
+      deviceTasks = self._getDeviceTasksInfo(
+                                    [ device for device, _, _, _ in deployments ],
+                                    response[ 'taskIds' ] )
+      deviceTaskMap = {}
+      for device, tasks in deviceTasks.iteritems():
+         if not tasks:
+            # saved when the open CvpTransaction is committed
+            continue
+         assert len( tasks ) == 1, "Only one task expected"
+         tid, info = tasks[ 0 ]
+         deviceTaskMap[ device ] = Task( int( tid ),
+                                         info[ 'workOrderUserDefinedStatus' ],
+                                         info[ 'description' ] )
+      return deviceTaskMap
+
    def getAllEvents( self, isCompleted=True ):
       '''Get all the events from CVP
       Arguments:
@@ -2423,11 +3029,22 @@ class Cvp( Jsonable ):
       Returns:
          events -- A list of events
       '''
-      events = self.cvpService.getAllEvents( isCompleted )
-      return [ Event( event[ 'key' ], event[ 'parentKey' ], event[ 'objectId' ],
-                    event[ 'eventType' ], event[ 'status' ], 0,
-                    event[ 'message' ], event[ 'errors' ], event[ 'warning' ],
-                    event[ 'data' ] ) for event in events ]
+      return list( self.iterAllEvents( isCompleted, pageSize=0 ) )
+
+   def iterAllEvents( self, isCompleted=True,
+                      pageSize=cvpServices.DEFAULT_PAGE_SIZE ):
+      '''Yields the events from CVP as they are received
+      Arguments:
+         isCompleted -- Flag representing complete/pending events
+         pageSize -- events per request, 0 for a single request
+      Returns:
+         events -- iterator of events ( type : Iterator of Event ( class ) )
+      '''
+      for event in self.cvpService.iterAllEvents( isCompleted, pageSize ):
+         yield Event( event[ 'key' ], event[ 'parentKey' ], event[ 'objectId' ],
+                      event[ 'eventType' ], event[ 'status' ], 0,
+                      event[ 'message' ], event[ 'errors' ], event[ 'warning' ],
+                      event[ 'data' ] )
 
    def getEvent( self, eventId ):
       '''Return the event associated with the event id
@@ -2463,13 +3080,24 @@ class Cvp( Jsonable ):
                     Task.DEVICE_REBOOT_IN_PROGRESS
       Returns: A list of tasks
       '''
+      return list( self.iterTasks( status, pageSize=0 ) )
+
+   def iterTasks( self, status=None, pageSize=cvpServices.DEFAULT_PAGE_SIZE ):
+      ''' Yields the tasks filtered by status as they are received, so the
+      first tasks can be used before the whole list is downloaded.
+      Arguments:
+         status -- same as for getTasks
+         pageSize -- tasks per request, 0 for a single request
+      Returns:
+         tasks -- iterator of tasks ( type : Iterator of Task ( class ) )
+      '''
       assert status in ( None, Task.COMPLETED, Task.PENDING, Task.CANCELED,
                          Task.FAILED, Task.CONFIG_PUSH_IN_PROGRESS,
                          Task.IMAGE_PUSH_IN_PROGRESS,
                          Task.DEVICE_REBOOT_IN_PROGRESS )
-      tasks = self.cvpService.getTasks( status )
-      return [ Task( t[ 'workOrderId'], t[ 'workOrderUserDefinedStatus' ],
-                     t[ 'description' ] ) for t in  tasks ]
+      for t in self.cvpService.iterTasks( status, pageSize ):
+         yield Task( t[ 'workOrderId'], t[ 'workOrderUserDefinedStatus' ],
+                     t[ 'description' ] )
 
    def cancelTask( self, task ):
       ''' Cancel a pending task
@@ -2612,22 +3240,16 @@ class Cvp( Jsonable ):
       '''
       assert isinstance( cc, ChangeControl )
 
-      end = time.time() + timeout
-      while time.time() < end:
-         ccStatus = self.getCCStatus( cc )
-         if ccStatus == status:
-            break
-         elif ccStatus in [ ChangeControl.FAILED, ChangeControl.CANCELLED,
-                              ChangeControl.ABORTED ]:
-            raise cvpServices.CvpError( errorCodes.CCM_EXECUTION_ERROR,
-                                           'Change Control  %d %s' %
-                                           ( cc.Id, ccStatus ) )
-         # back off and try again
-         time.sleep( 1 )
+      def failed( ccStatus ):
+         if ccStatus in [ ChangeControl.FAILED, ChangeControl.CANCELLED,
+                          ChangeControl.ABORTED ]:
+            return cvpServices.CvpError( errorCodes.CCM_EXECUTION_ERROR,
+                                         'Change Control  %d %s' %
+                                         ( cc.Id, ccStatus ) )
 
-         if time.time() >= end:
-            # raise timeout error
-            raise cvpServices.CvpError( errorCodes.TIMEOUT )
+      cvpServices.Poller( timeout ).wait( lambda: self.getCCStatus( cc ),
+                                          lambda ccStatus: ccStatus == status,
+                                          failed )
 
 
    def cloneCC( self, cc ):
@@ -2684,16 +3306,21 @@ class Cvp( Jsonable ):
       Returns:
          changeControlList: List of ChangeControl
       '''
-      changeControlInfo = self.cvpService.getChangeControls()
-      changeControlList = []
-      for changeControl in changeControlInfo[ 'data' ]:
-         changeControlList.append( ChangeControl( ccName=changeControl[ 'ccName' ],
-                                                  ccTaskList=None,
-                                                  scheduleTime=
-                                                  changeControl[ 'scheduledTimestamp' ],
-                                                  ccId=int( changeControl[ 'ccId' ] ),
-                                                  status=changeControl[ 'status' ] ) )
-      return changeControlList
+      return list( self.iterChangeControls( pageSize=0 ) )
+
+   def iterChangeControls( self, pageSize=cvpServices.DEFAULT_PAGE_SIZE ):
+      ''' Yields the ChangeControls in Cvp as they are received
+      Arguments:
+         pageSize -- change controls per request, 0 for a single request
+      Returns:
+         changeControls -- iterator of ChangeControl
+      '''
+      for changeControl in self.cvpService.iterChangeControls( pageSize ):
+         yield ChangeControl( ccName=changeControl[ 'ccName' ],
+                              ccTaskList=None,
+                              scheduleTime=changeControl[ 'scheduledTimestamp' ],
+                              ccId=int( changeControl[ 'ccId' ] ),
+                              status=changeControl[ 'status' ] )
 
    def createRollback( self, rollbackType, rollbackTime, device ):
       ''' Creates an instance of rollback. This rollback object will be used to
@@ -2885,16 +3512,18 @@ class Cvp( Jsonable ):
 
    def getUsers( self ):
       ''' retrieves all the users from the cvp instance'''
-      usersInfo = self.cvpService.getUsers()
-      rolesMap = usersInfo[ 'roles' ]
-      userList = []
-      for uInfo in usersInfo[ 'users' ]:
-         userList.append( User( uInfo[ 'userId' ], uInfo[ 'email' ],
-                                rolesMap[ uInfo[ 'userId' ] ],
-                                uInfo[ 'userStatus' ], uInfo[ 'firstName' ],
-                                uInfo[ 'lastName' ], uInfo[ 'contactNumber' ],
-                                uInfo[ 'userType' ] ) )
-      return userList
+      return list( self.iterUsers( pageSize=0 ) )
+
+   def iterUsers( self, pageSize=cvpServices.DEFAULT_PAGE_SIZE ):
+      ''' yields the users of the cvp instance as they are received
+      Arguments:
+         pageSize -- users per request, 0 for a single request
+      '''
+      for uInfo, roles in self.cvpService.iterUsers( pageSize ):
+         yield User( uInfo[ 'userId' ], uInfo[ 'email' ], roles,
+                     uInfo[ 'userStatus' ], uInfo[ 'firstName' ],
+                     uInfo[ 'lastName' ], uInfo[ 'contactNumber' ],
+                     uInfo[ 'userType' ] )
 
    def getUser( self, userId ):
       ''' retrieves user with particular userid from the cvp instance'''
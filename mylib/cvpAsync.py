@@ -0,0 +1,181 @@
+# Copyright (c) 2015 Arista Networks, Inc.  All rights reserved.
+# Arista Networks, Inc. Confidential and Proprietary.
+'''
+@Copyright: 2015-2016 Arista Networks, Inc.
+Arista Networks, Inc. Confidential and Proprietary.
+
+cvpAsync provides non-blocking clients for driving several Cvp instances at
+once. Every method of AsyncCvpService and AsyncCvp has the signature of its
+CvpService and Cvp counterpart, but it returns a concurrent.futures.Future
+instead of blocking ( the futures backport on Python 2 ). The value of a
+future, or the CvpError raised by the request, is obtained with
+future.result() or with gather() for a list of futures; an event loop can
+await the futures once wrapped, e.g. with asyncio.wrap_future.
+
+The calls are run by the blocking clients on a FanOutExecutor, so URL
+building, authentication and the errorCodes mapping are those of CvpService.
+The async clients share one executor by default, which bounds the calls in
+flight across all of them to its maxInFlight; a client created with its own
+maxInFlight, or with its own executor, gets a separate bound. Methods returning
+iterators ( iterTasks, iterItems, ... ) are run to completion in the worker,
+and their future holds the list of items.
+
+Every call in flight occupies one OS thread of the executor until it returns,
+so at most maxInFlight calls ( DEFAULT_MAX_IN_FLIGHT, 64, by default ) are sent
+at once and the others wait in its queue. The clients suit tens of concurrent
+calls, not thousands. Calls changing the topology of one Cvp ( applying
+configlets, adding containers, deploying devices, ... ) are run one at a time,
+since Cvp keeps the temp actions they build per session.
+
+It contains 2 classes
+   AsyncCvpService -- Non-blocking CvpService
+   AsyncCvp -- Non-blocking Cvp
+'''
+import threading
+import types
+from concurrent.futures import Future, wait
+import cvp
+import cvpServices
+import errorCodes
+
+DEFAULT_MAX_IN_FLIGHT = 64     # concurrent calls of the shared executor
+GATHER_POLL_INTERVAL = 1       # seconds, keeps gather() interruptible
+
+_executor = None
+_executorLock = threading.Lock()
+
+def sharedExecutor( maxInFlight=DEFAULT_MAX_IN_FLIGHT ):
+   '''Returns the FanOutExecutor shared by the async clients. maxInFlight is
+   only used when the executor is first created.'''
+   global _executor
+   with _executorLock:
+      if _executor is None:
+         _executor = cvpServices.FanOutExecutor( maxInFlight )
+      return _executor
+
+def gather( futures ):
+   '''Waits for all futures and returns their values in order
+   Arguments:
+      futures -- futures returned by the async clients ( type : List )
+   Raises:
+      CvpError -- the first error raised by any of the calls, in order. Errors
+                  other than CvpError are reported as UNKNOWN_ERROR_CODE
+   Returns:
+      results -- value of every future ( type : List )
+   '''
+   futures = list( futures )
+   pending = futures
+   while pending:
+      pending = wait( pending, GATHER_POLL_INTERVAL ).not_done
+   results = []
+   for future in futures:
+      try:
+         results.append( future.result() )
+      except cvpServices.CvpError:
+         raise
+      except Exception as e:
+         raise cvpServices.CvpError( errorCodes.UNKNOWN_ERROR_CODE, str( e ) )
+   return results
+
+def _clientExecutor( executor, maxInFlight ):
+   '''Returns the executor of an async client: the given one, a new one
+   allowing maxInFlight concurrent calls, or the shared one'''
+   if executor is not None:
+      return executor
+   if maxInFlight is not None:
+      return cvpServices.FanOutExecutor( maxInFlight )
+   return sharedExecutor()
+
+def _submit( executor, func, *args, **kwargs ):
+   '''Schedules func( *args, **kwargs ) on executor and returns the Future of
+   its result'''
+   future = Future()
+   def run():
+      if not future.set_running_or_notify_cancel():
+         return
+      try:
+         future.set_result( func( *args, **kwargs ) )
+      except Exception as e:
+         future.set_exception( e )
+   executor.submit( run )
+   return future
+
+def _materialized( func ):
+   '''Wraps func so that a generator it returns is consumed by the caller, in
+   the worker thread, rather than by whoever reads the future'''
+   def call( *args, **kwargs ):
+      result = func( *args, **kwargs )
+      if isinstance( result, types.GeneratorType ):
+         return list( result )
+      return result
+   return call
+
+class _AsyncProxy( object ):
+   '''Schedules the public methods of a blocking client on an executor'''
+   def __init__( self, client, executor ):
+      self.client = client
+      self.executor = executor
+
+   def __getattr__( self, name ):
+      attr = getattr( self.client, name )
+      if name.startswith( '_' ) or not callable( attr ):
+         return attr
+      call = _materialized( attr )
+      def submit( *args, **kwargs ):
+         return _submit( self.executor, call, *args, **kwargs )
+      submit.__name__ = name
+      submit.__doc__ = attr.__doc__
+      return submit
+
+class AsyncCvpService( _AsyncProxy ):
+   '''AsyncCvpService has the methods of CvpService ( getInventory, getTasks,
+   getTaskById, executeTasks, getConfigletByName, ... ), each returning a
+   future of the result instead of the result.
+
+   Arguments:
+      executor -- FanOutExecutor to run the requests on ( optional )
+      maxInFlight -- without executor, run the requests on a new executor
+                     allowing this many concurrent calls instead of the shared
+                     one ( optional ) ( type : Int )
+
+   Instance variables:
+      client -- the CvpService doing the requests
+      executor -- FanOutExecutor running the requests; close it when done if
+                  it was created for maxInFlight
+   '''
+   def __init__( self, host, ssl, port, tmpDir='', executor=None,
+                 maxInFlight=None, **kwargs ):
+      super( AsyncCvpService, self ).__init__(
+            cvpServices.CvpService( host, ssl, port, tmpDir, **kwargs ),
+            _clientExecutor( executor, maxInFlight ) )
+
+   def __repr__( self ):
+      return 'AsyncCvpService "%s"' % self.client.url()
+
+class AsyncCvp( _AsyncProxy ):
+   '''AsyncCvp has the methods of Cvp ( getDevices, getConfiglets,
+   monitorTaskStatus, ... ), each returning a future of the result instead of
+   the result.
+
+   Arguments:
+      executor -- FanOutExecutor to run the requests on ( optional )
+      maxInFlight -- without executor, run the requests on a new executor
+                     allowing this many concurrent calls instead of the shared
+                     one ( optional ) ( type : Int )
+
+   Instance variables:
+      client -- the Cvp doing the requests
+      executor -- FanOutExecutor running the requests; close it when done if
+                  it was created for maxInFlight
+      cvpService -- non-blocking CvpService of the Cvp
+   '''
+   def __init__( self, host, ssl=True, port=443, tmpDir='', executor=None,
+                 maxInFlight=None, **kwargs ):
+      super( AsyncCvp, self ).__init__(
+            cvp.Cvp( host, ssl, port, tmpDir, **kwargs ),
+            _clientExecutor( executor, maxInFlight ) )
+      # non-blocking access to the requests of the wrapped Cvp
+      self.cvpService = _AsyncProxy( self.client.cvpService, self.executor )
+
+   def __repr__( self ):
+      return 'AsyncCvp "%s"' % self.client.url()
@@ -0,0 +1,239 @@
+# Copyright (c) 2015 Arista Networks, Inc.  All rights reserved.
+# Arista Networks, Inc. Confidential and Proprietary.
+'''
+@Copyright: 2015-2016 Arista Networks, Inc.
+Arista Networks, Inc. Confidential and Proprietary.
+
+cvpBenchmark times the bulk operations of the cvp library against a
+MockCvpServer, for topologies of increasing size. For every topology size
+and operation it reports the median and 99th percentile duration of the runs
+and the number of requests one run makes to Cvp.
+
+   python cvpBenchmark.py --devices 100,1000,10000 --latency 0.002
+
+Every run uses a freshly authenticated Cvp client, so client side caches
+( container index, configlet catalog ) start cold as they would for a script.
+
+The getInventory/iterInventory and getConfigletsInfo/iterConfigletsInfo pairs
+compare decoding whole list responses with parsing their items while they are
+received, and --codec compares the JSON codecs:
+
+   python cvpBenchmark.py --codec json --operations getInventory,iterInventory
+
+encodeDevices and encodeConfiglets time the JSON serialization of the model
+objects, and --memory reports the memory held by them. getDevice and
+getContainer time the lookup of a single object.
+
+getDevicesSnapshot reads the devices of every image bundle with a request of
+its own, and --bundles sets the image bundles of the topologies:
+
+   python cvpBenchmark.py --operations getDevicesSnapshot --bundles 2,100,1000
+'''
+import argparse
+import json
+import math
+import sys
+import time
+import cvp
+import cvpMock
+import cvpServices
+
+OPERATIONS = ( 'getDevices', 'getDevicesSnapshot', 'getContainers',
+               'getConfiglets', 'bulkImportDevice', 'monitorTaskStatus',
+               'getInventory', 'iterInventory', 'getConfigletsInfo',
+               'iterConfigletsInfo', 'encodeDevices', 'encodeConfiglets',
+               'getDevice', 'getContainer' )
+# operations calling the CvpService of the client directly
+SERVICE_OPERATIONS = ( 'getInventory', 'iterInventory', 'getConfigletsInfo',
+                       'iterConfigletsInfo' )
+CODECS = ( 'auto', 'json', 'simplejson', 'ujson' )
+IMPORT_CONTAINER = 'leaf0'
+
+def modelBytes( objects ):
+   '''Returns the memory held by model objects: the objects, their attribute
+   dicts, and the strings and lists they refer to, each counted once'''
+   seen = set()
+   total = 0
+   def add( value ):
+      if id( value ) in seen:
+         return 0
+      seen.add( id( value ) )
+      size = sys.getsizeof( value )
+      if isinstance( value, list ):
+         size += sum( add( item ) for item in value )
+      return size
+   for obj in objects:
+      total += sys.getsizeof( obj )
+      if hasattr( obj, '__dict__' ):
+         total += sys.getsizeof( obj.__dict__ )
+      for value in obj.jsonable().values():
+         if isinstance( value, ( basestring, list ) ):
+            total += add( value )
+   return total
+
+def percentile( samples, pct ):
+   '''Returns the nearest-rank percentile of samples'''
+   ordered = sorted( samples )
+   rank = int( math.ceil( pct / 100.0 * len( ordered ) ) ) - 1
+   return ordered[ min( max( rank, 0 ), len( ordered ) - 1 ) ]
+
+class Benchmark( object ):
+   '''Runs the operations against one MockCvpServer
+
+   Public methods:
+      run( operation, repeat )
+   '''
+   def __init__( self, server, importCount=10, taskCount=100 ):
+      self.server = server
+      self.importCount = importCount
+      self.taskCount = taskCount
+      self.imported_ = 0
+
+   def _client( self ):
+      client = cvp.Cvp( self.server.host, ssl=False, port=self.server.port )
+      client.authenticate( 'cvpadmin', 'cvpadmin' )
+      return client
+
+   def _importHosts( self ):
+      '''Returns addresses of devices not in the fake Cvp yet'''
+      hosts = []
+      for _ in range( self.importCount ):
+         index = self.imported_
+         self.imported_ += 1
+         hosts.append( '172.%d.%d.%d' % ( 16 + ( index >> 16 & 15 ),
+                                          index >> 8 & 255, index & 255 ) )
+      return hosts
+
+   def prepare( self, operation ):
+      '''Returns the arguments of one run of operation'''
+      if operation == 'bulkImportDevice':
+         return ( self._importHosts(), IMPORT_CONTAINER, True )
+      if operation == 'encodeDevices':
+         return ( self._client().getDevices( snapshot=True ), )
+      if operation == 'encodeConfiglets':
+         return ( self._client().getConfiglets(), )
+      if operation == 'getDevice':
+         return ( min( self.server.fakeCvp.devices ), )
+      if operation == 'getContainer':
+         return ( IMPORT_CONTAINER, )
+      if operation == 'monitorTaskStatus':
+         fakeCvp = self.server.fakeCvp
+         taskIds = fakeCvp.addTasks( self.taskCount )
+         fakeCvp.execute( taskIds )
+         return ( [ cvp.Task( taskId, cvp.Task.PENDING ) for taskId in taskIds ],
+                  cvp.Task.COMPLETED )
+      return ()
+
+   def call( self, client, operation, args ):
+      if operation == 'getDevicesSnapshot':
+         return client.getDevices( snapshot=True )
+      if operation in ( 'encodeDevices', 'encodeConfiglets' ):
+         return json.dumps( args[ 0 ], default=cvp.encoder )
+      if operation == 'getInventory':
+         return client.cvpService.getInventory(
+                                          populateParentContainerKeyMap=False )
+      if operation in SERVICE_OPERATIONS:
+         # iterators are drained so that every item is parsed
+         return list( getattr( client.cvpService, operation )( *args ) )
+      return getattr( client, operation )( *args )
+
+   def run( self, operation, repeat ):
+      '''Runs operation repeat times
+      Returns:
+         durations -- seconds taken by every run ( type : List of Float )
+         requests -- requests made by every run ( type : List of Int )
+      '''
+      durations = []
+      requests = []
+      for _ in range( repeat ):
+         client = self._client()
+         args = self.prepare( operation )
+         self.server.resetCounters()
+         start = time.time()
+         self.call( client, operation, args )
+         durations.append( time.time() - start )
+         requests.append( self.server.requestCount() )
+      return durations, requests
+
+def main():
+   parser = argparse.ArgumentParser(
+         description='Time cvp library operations against a mock Cvp' )
+   parser.add_argument( '--devices', default='100,1000,10000',
+                        help='comma separated topology sizes, in devices' )
+   parser.add_argument( '--operations', default=','.join( OPERATIONS ),
+                        help='comma separated operations to time' )
+   parser.add_argument( '--bundles', default='2',
+                        help='comma separated image bundle counts of the '
+                             'topologies' )
+   parser.add_argument( '--repeat', type=int, default=5,
+                        help='runs of every operation' )
+   parser.add_argument( '--latency', type=float, default=0.0,
+                        help='seconds added by the mock to every request' )
+   parser.add_argument( '--import-count', type=int, default=10,
+                        help='devices imported by one bulkImportDevice run' )
+   parser.add_argument( '--task-count', type=int, default=100,
+                        help='tasks watched by one monitorTaskStatus run' )
+   parser.add_argument( '--codec', choices=CODECS, default='auto',
+                        help='JSON codec of the requests and responses' )
+   parser.add_argument( '--memory', action='store_true',
+                        help='report the memory held by Device and Configlet '
+                             'objects' )
+   parser.add_argument( '--json', action='store_true',
+                        help='print the results as JSON' )
+   options = parser.parse_args()
+
+   operations = options.operations.split( ',' )
+   for operation in operations:
+      if operation not in OPERATIONS:
+         parser.error( 'unknown operation %s' % operation )
+   if options.codec != 'auto':
+      try:
+         cvpServices.setJsonCodec( __import__( options.codec ) )
+      except ImportError:
+         parser.error( 'codec %s is not installed' % options.codec )
+   results = []
+   if not options.json:
+      print '%8s %8s  %-20s %10s %10s %10s' % ( 'devices', 'bundles',
+                                                'operation', 'p50 (ms)',
+                                                'p99 (ms)', 'requests' )
+   topologies = [ ( int( size ), int( bundles ) )
+                  for size in options.devices.split( ',' )
+                  for bundles in options.bundles.split( ',' ) ]
+   for deviceCount, bundleCount in topologies:
+      server = cvpMock.MockCvpServer( cvpMock.FakeCvp( deviceCount, bundleCount ),
+                                      latency=options.latency )
+      server.start()
+      try:
+         benchmark = Benchmark( server, options.import_count, options.task_count )
+         for operation in operations:
+            durations, requests = benchmark.run( operation, options.repeat )
+            result = { 'devices' : deviceCount,
+                       'bundles' : bundleCount,
+                       'operation' : operation,
+                       'p50' : percentile( durations, 50 ) * 1000,
+                       'p99' : percentile( durations, 99 ) * 1000,
+                       'requests' : percentile( requests, 50 ) }
+            results.append( result )
+            if not options.json:
+               print '%(devices)8d %(bundles)8d  %(operation)-20s %(p50)10.1f ' \
+                     '%(p99)10.1f %(requests)10d' % result
+         if options.memory:
+            client = benchmark._client()
+            for name, objects in (
+                  ( 'Device', client.getDevices( snapshot=True ) ),
+                  ( 'Configlet', client.getConfiglets() ) ):
+               result = { 'devices' : deviceCount,
+                          'bundles' : bundleCount,
+                          'model' : name,
+                          'bytes' : modelBytes( objects ) / len( objects ) }
+               results.append( result )
+               if not options.json:
+                  print '%(devices)8d %(bundles)8d  %(model)-20s %(bytes)10d ' \
+                        'bytes per object' % result
+      finally:
+         server.stop()
+   if options.json:
+      print json.dumps( results, indent=2 )
+
+if __name__ == '__main__':
+   main()
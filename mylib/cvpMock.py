@@ -0,0 +1,767 @@
+# Copyright (c) 2015 Arista Networks, Inc.  All rights reserved.
+# Arista Networks, Inc. Confidential and Proprietary.
+'''
+@Copyright: 2015-2016 Arista Networks, Inc.
+Arista Networks, Inc. Confidential and Proprietary.
+
+cvpMock is a fake Cvp web-server for exercising and benchmarking the cvp
+library without a Cvp instance. It serves the endpoints CvpService uses for
+inventory, provisioning, configlets, image bundles, image files, themes, tasks,
+events and change controls from a synthetic topology of any size, with a
+tunable latency added to every request.
+
+   fakeCvp = FakeCvp( deviceCount=1000 )
+   server = MockCvpServer( fakeCvp, latency=0.002 )
+   server.start()
+   cvpInstance = cvp.Cvp( 'localhost', ssl=False, port=server.port )
+   ...
+   server.stop()
+
+It contains 2 classes
+   FakeCvp -- Synthetic Cvp state
+   MockCvpServer -- Threaded HTTP server answering requests from a FakeCvp
+'''
+import BaseHTTPServer
+import base64
+import hashlib
+import SocketServer
+import json
+import threading
+import time
+import urlparse
+import uuid
+from collections import Counter
+
+UNDEF_CONTAINER_KEY = 'undefined_container'
+ROOT_CONTAINER_KEY = 'root'
+DEVICES_PER_CONTAINER = 20   # devices in each generated leaf container
+CONTAINERS_PER_POD = 10      # leaf containers under each generated pod
+IMAGE_DOWNLOAD_PATH = '/web/services/image/getImagebyId/'
+
+class FakeCvp( object ):
+   '''FakeCvp holds the state served by MockCvpServer. The generated topology
+   has pods under the root container, leaf containers under the pods and
+   devices in the leaf containers. Every container and every device has one
+   static configlet, and the first image bundle is applied to every other
+   device.
+
+   Public methods:
+      onboard( hosts )
+      addTasks( count, status )
+      addTheme( themeType, content, isActive )
+
+   Instance variables:
+      containers -- container key to container information
+      devices -- device mac address to device information
+      configlets -- configlet key to configlet information
+      configletMappers -- configlet to container and device mappings
+      imageBundles -- image bundle name to image bundle information
+      imageFiles -- image id to content of the image file
+      tasks -- task id to task information
+      themes -- theme type to list of theme information
+      taskDuration -- seconds between executing a task and its completion
+   '''
+   def __init__( self, deviceCount=100, imageBundleCount=2, taskDuration=0 ):
+      self.lock = threading.RLock()
+      self.containers = {}
+      self.devices = {}
+      self.configlets = {}
+      self.configletMappers = []
+      self.imageBundles = {}
+      self.imageFiles = {}
+      self.tasks = {}
+      self.themes = { 'logo' : [], 'backgroundImage' : [] }
+      self.taskDuration = taskDuration
+      self.nextTaskId_ = 1
+      self.nextDeviceId_ = 0
+      self._addContainer( ROOT_CONTAINER_KEY, 'Tenant', None )
+      self._addContainer( UNDEF_CONTAINER_KEY, 'Undefined', ROOT_CONTAINER_KEY )
+      leafCount = max( 1, ( deviceCount + DEVICES_PER_CONTAINER - 1 ) //
+                          DEVICES_PER_CONTAINER )
+      leafKeys = []
+      for leaf in range( leafCount ):
+         podKey = 'container_pod%d' % ( leaf // CONTAINERS_PER_POD )
+         if podKey not in self.containers:
+            self._addContainer( podKey, 'pod%d' % ( leaf // CONTAINERS_PER_POD ),
+                                ROOT_CONTAINER_KEY )
+         leafKey = 'container_leaf%d' % leaf
+         self._addContainer( leafKey, 'leaf%d' % leaf, podKey )
+         leafKeys.append( leafKey )
+      for containerKey, containerInfo in self.containers.items():
+         configletKey = self._addConfiglet( 'cfg_%s' % containerInfo[ 'name' ] )
+         self._addMapper( configletKey, containerKey, 'container' )
+      for index in range( deviceCount ):
+         self._addDevice( leafKeys[ index % leafCount ] )
+      for index in range( imageBundleCount ):
+         name = 'bundle%d' % index
+         imageId = 'image_%d' % index
+         self.imageFiles[ imageId ] = ''.join( '%s block %d\n' % ( imageId, block )
+                                               for block in range( 4096 ) )
+         self.imageBundles[ name ] = {
+               'key' : 'imagebundle_%d' % index,
+               'name' : name,
+               'isCertifiedImageBundle' : 'false',
+               'uploadedBy' : 'cvpadmin',
+               'images' : [ { 'name' : 'EOS-4.%d.0F.swi' % index,
+                              'imageId' : imageId,
+                              'md5' : hashlib.md5(
+                                         self.imageFiles[ imageId ] ).hexdigest(),
+                              'imageSize' : '512 MB',
+                              'isRebootRequired' : 'true' } ],
+               'appliedDevices' : [],
+               'appliedContainers' : [] }
+      if self.imageBundles:
+         bundle = self.imageBundles[ 'bundle0' ]
+         bundle[ 'appliedDevices' ] = [ device[ 'ipAddress' ] for device in
+                                        sorted( self.devices.values(),
+                                                key=lambda d: d[ 'ipAddress' ] )
+                                        ][ ::2 ]
+
+   def _addContainer( self, containerKey, containerName, parentKey ):
+      self.containers[ containerKey ] = { 'key' : containerKey,
+                                          'name' : containerName,
+                                          'parentKey' : parentKey }
+
+   def _addConfiglet( self, configletName, configletType='Static' ):
+      configletKey = 'configlet_%s' % uuid.uuid4().hex[ : 12 ]
+      self.configlets[ configletKey ] = {
+            'key' : configletKey,
+            'name' : configletName,
+            'type' : configletType,
+            'config' : '! %s\nhostname %s\n' % ( configletName, configletName ),
+            'reconciled' : False,
+            'user' : 'cvpadmin',
+            'sslConfig' : False }
+      return configletKey
+
+   def _addMapper( self, configletKey, objectId, objectType ):
+      self.configletMappers.append( {
+            'key' : 'mapper_%d' % len( self.configletMappers ),
+            'configletId' : configletKey,
+            'objectId' : objectId,
+            'containerId' : objectId if objectType == 'container' else None,
+            'type' : objectType,
+            'configletType' : 'Static',
+            'order' : 0 } )
+
+   def _addDevice( self, containerKey, host=None, configlet=True ):
+      index = self.nextDeviceId_
+      self.nextDeviceId_ += 1
+      ipAddress = host or '10.%d.%d.%d' % ( index >> 16 & 255, index >> 8 & 255,
+                                            index & 255 )
+      macAddress = '00:1c:73:%02x:%02x:%02x' % ( index >> 16 & 255,
+                                                 index >> 8 & 255, index & 255 )
+      hostname = 'switch%d' % index
+      device = { 'ipAddress' : ipAddress,
+                 'hostname' : hostname,
+                 'fqdn' : '%s.example.com' % hostname,
+                 'systemMacAddress' : macAddress,
+                 'serialNumber' : 'SN%08d' % index,
+                 'modelName' : 'DCS-7050SX-64',
+                 'version' : '4.20.1F',
+                 'status' : 'Registered',
+                 'complianceCode' : '0000',
+                 'parentContainerKey' : containerKey,
+                 'type' : 'netelement',
+                 'key' : macAddress }
+      self.devices[ macAddress ] = device
+      if configlet:
+         configletKey = self._addConfiglet( 'cfg_%s' % hostname )
+         self._addMapper( configletKey, macAddress, 'netelement' )
+      return device
+
+   def onboard( self, hosts ):
+      '''Adds devices to the undefined container, as Cvp does once it has
+      connected to them'''
+      with self.lock:
+         return [ self._addDevice( UNDEF_CONTAINER_KEY, host, configlet=False )
+                  for host in hosts ]
+
+   def addTasks( self, count, status='Pending', netElementIds=None ):
+      '''Creates tasks and returns their ids'''
+      with self.lock:
+         taskIds = []
+         for index in range( count ):
+            taskId = str( self.nextTaskId_ )
+            self.nextTaskId_ += 1
+            netElementId = netElementIds[ index ] if netElementIds else ''
+            self.tasks[ taskId ] = {
+                  'workOrderId' : taskId,
+                  'workOrderUserDefinedStatus' : status,
+                  'workOrderState' : 'ACTIVE',
+                  'description' : 'Task %s' % taskId,
+                  'netElementId' : netElementId,
+                  'workOrderDetails' : { 'netElementId' : netElementId },
+                  'completeAt' : None }
+            taskIds.append( taskId )
+         return taskIds
+
+   def addTheme( self, themeType, content, isActive=False ):
+      '''Adds a theme image, making it the active one of its type if isActive
+      is set'''
+      with self.lock:
+         themes = self.themes[ themeType ]
+         if isActive:
+            for theme in themes:
+               theme[ 'isActive' ] = False
+         themes.append( { 'key' : 'theme_%s' % uuid.uuid4().hex[ : 12 ],
+                          'isActive' : isActive,
+                          'data' : base64.b64encode( content ) } )
+
+   def execute( self, taskIds ):
+      '''Starts tasks, which complete taskDuration seconds later'''
+      with self.lock:
+         for taskId in taskIds:
+            task = self.tasks.get( str( taskId ) )
+            if task and task[ 'workOrderUserDefinedStatus' ] == 'Pending':
+               task[ 'workOrderUserDefinedStatus' ] = 'Configlet Push In Progress'
+               task[ 'completeAt' ] = time.time() + self.taskDuration
+
+   def task( self, taskId ):
+      '''Returns the task information as Cvp reports it, None if unknown'''
+      task = self.tasks.get( str( taskId ) )
+      if task is None:
+         return None
+      if task[ 'completeAt' ] is not None and task[ 'completeAt' ] <= time.time():
+         task[ 'workOrderUserDefinedStatus' ] = 'Completed'
+         task[ 'workOrderState' ] = 'COMPLETED'
+      info = dict( task )
+      del info[ 'completeAt' ]
+      return info
+
+   def topology( self, containerKey=ROOT_CONTAINER_KEY ):
+      '''Returns the container hierarchy under containerKey'''
+      childrenByKey = {}
+      for containerInfo in self.containers.values():
+         childrenByKey.setdefault( containerInfo[ 'parentKey' ], [] ).append(
+                                                                     containerInfo )
+      devicesByKey = {}
+      for device in self.devices.values():
+         devicesByKey.setdefault( device[ 'parentContainerKey' ], [] ).append(
+                                                                           device )
+      def node( containerInfo ):
+         children = sorted( childrenByKey.get( containerInfo[ 'key' ], [] ),
+                            key=lambda c: c[ 'name' ] )
+         return { 'key' : containerInfo[ 'key' ],
+                  'name' : containerInfo[ 'name' ],
+                  'type' : 'container',
+                  'childContainerList' : [ node( child ) for child in children ],
+                  'childNetElementList' : devicesByKey.get( containerInfo[ 'key' ],
+                                                            [] ) }
+      return node( self.containers[ containerKey ] )
+
+   def configletsOf( self, objectId ):
+      '''Returns the configlets mapped to a container or device'''
+      return [ self.configlets[ mapper[ 'configletId' ] ]
+               for mapper in self.configletMappers
+               if mapper[ 'objectId' ] == objectId and
+                  mapper[ 'configletId' ] in self.configlets ]
+
+class _RequestHandler( BaseHTTPServer.BaseHTTPRequestHandler ):
+   '''Dispatches requests to the handlers of the MockCvpServer'''
+   protocol_version = 'HTTP/1.1'
+   disable_nagle_algorithm = True
+
+   def _handle( self, method ):
+      server = self.server.mockServer
+      url = urlparse.urlparse( self.path )
+      query = dict( ( key, values[ 0 ] ) for key, values in
+                    urlparse.parse_qs( url.query, keep_blank_values=True ).items() )
+      length = int( self.headers.get( 'Content-Length' ) or 0 )
+      body = self.rfile.read( length ) if length else ''
+      server.count( url.path )
+      if server.latency:
+         time.sleep( server.latency )
+      handler = server.handlers.get( ( method, url.path ) )
+      status = 200
+      cookies = {}
+      if method == 'GET' and url.path.startswith( IMAGE_DOWNLOAD_PATH ):
+         status, headers, data = server.imageFile(
+               url.path[ len( IMAGE_DOWNLOAD_PATH ) : ], self.headers.get( 'Range' ) )
+         self.send_response( status )
+         for name, value in headers:
+            self.send_header( name, value )
+         self.send_header( 'Content-Length', str( len( data ) ) )
+         self.end_headers()
+         self.wfile.write( data )
+         return
+      if handler is None:
+         status = 404
+         result = { 'errorCode' : '404', 'errorMessage' : 'Not found: %s' % url.path }
+      else:
+         try:
+            payload = json.loads( body ) if body.strip() else None
+         except ValueError:
+            payload = None
+         with server.fakeCvp.lock:
+            result = handler( query, payload )
+         if isinstance( result, tuple ):
+            result, cookies = result
+      data = json.dumps( result )
+      self.send_response( status )
+      self.send_header( 'Content-Type', 'application/json' )
+      self.send_header( 'Content-Length', str( len( data ) ) )
+      for name, value in cookies.items():
+         self.send_header( 'Set-Cookie', '%s=%s; Path=/' % ( name, value ) )
+      self.end_headers()
+      self.wfile.write( data )
+
+   def do_GET( self ):
+      self._handle( 'GET' )
+
+   def do_POST( self ):
+      self._handle( 'POST' )
+
+   def do_PUT( self ):
+      self._handle( 'PUT' )
+
+   def do_DELETE( self ):
+      self._handle( 'DELETE' )
+
+   def log_message( self, *args ):
+      pass
+
+class _ThreadedHTTPServer( SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer ):
+   daemon_threads = True
+   allow_reuse_address = True
+   request_queue_size = 128
+
+class MockCvpServer( object ):
+   '''MockCvpServer serves a FakeCvp over HTTP on a background thread and
+   counts the requests made to every endpoint.
+
+   Public methods:
+      start()
+      stop()
+      count( path )
+      requestCount()
+      resetCounters()
+
+   Instance variables:
+      fakeCvp -- the served state
+      latency -- seconds added to every request
+      port -- port the server listens on, known once started
+      requestCounts -- number of requests by endpoint path
+      tempActions -- temp actions added since the last topology save
+   '''
+   def __init__( self, fakeCvp, latency=0, host='127.0.0.1', port=0 ):
+      self.fakeCvp = fakeCvp
+      self.latency = latency
+      self.host = host
+      self.port = port
+      self.requestCounts = Counter()
+      self.countLock_ = threading.Lock()
+      self.tempActions = []
+      self.server_ = None
+      self.thread_ = None
+      self.handlers = {
+         ( 'POST', '/web/login/authenticate.do' ) : self.authenticate,
+         ( 'POST', '/web/login/logout.do' ) : self.success,
+         ( 'GET', '/web/cvpInfo/getCvpInfo.do' ) : self.cvpInfo,
+         ( 'GET', '/cvpservice/inventory/devices' ) : self.inventory,
+         ( 'POST', '/cvpservice/inventory/devices' ) : self.onboard,
+         ( 'PUT', '/cvpservice/inventory/devices/mapToContainer' ) :
+            self.mapToContainer,
+         ( 'GET', '/cvpservice/inventory/containers' ) : self.searchContainer,
+         ( 'GET', '/cvpservice/provisioning/filterTopology.do' ) :
+            self.filterTopology,
+         ( 'GET', '/cvpservice/provisioning/searchTopology.do' ) :
+            self.searchTopology,
+         ( 'GET', '/cvpservice/ztp/getNetElementById.do' ) : self.netElement,
+         ( 'GET', '/web/provisioning/getContainerInfoById.do' ) :
+            self.containerInfo,
+         ( 'GET', '/web/provisioning/getConfigletsByContainerId.do' ) :
+            self.containerConfiglets,
+         ( 'GET', '/web/provisioning/getConfigletsByNetElementId.do' ) :
+            self.deviceConfiglets,
+         ( 'GET', '/web/provisioning/getImageBundleByNetElementId.do' ) :
+            self.deviceImageBundle,
+         ( 'GET', '/web/provisioning/getImageBundleByContainerId.do' ) :
+            self.containerImageBundle,
+         ( 'GET', '/web/configlet/getConfiglets.do' ) : self.configletList,
+         ( 'GET', '/web/configlet/getConfigletByName.do' ) : self.configletByName,
+         ( 'GET', '/web/configlet/getConfigletsAndAssociatedMappers.do' ) :
+            self.configletMappers,
+         ( 'GET', '/web/configlet/getConfigletBuilder.do' ) :
+            self.configletBuilder,
+         ( 'GET', '/web/configlet/getAppliedContainers.do' ) :
+            self.configletContainers,
+         ( 'GET', '/web/configlet/getAppliedDevices.do' ) : self.configletDevices,
+         ( 'GET', '/web/image/getImages.do' ) : self.images,
+         ( 'GET', '/web/image/v2/getImageBundles.do' ) : self.imageBundleList,
+         ( 'GET', '/web/image/v2/getImageBundleByName.do' ) : self.imageBundle,
+         ( 'GET', '/web/image/getImageBundleAppliedDevices.do' ) :
+            self.imageBundleDevices,
+         ( 'GET', '/web/image/getImageBundleAppliedContainers.do' ) :
+            self.imageBundleContainers,
+         ( 'GET', '/web/configlet/getHierarchicalConfigletBuilders.do' ) :
+            self.hierarchicalBuilders,
+         ( 'POST', '/web/configlet/autoConfigletGenerator.do' ) :
+            self.generateConfiglets,
+         ( 'GET', '/web/ztp/getTempConfigsByNetElementId.do' ) :
+            self.tempConfiglets,
+         ( 'POST', '/web/ztp/addTempAction.do' ) : self.addTempAction,
+         ( 'POST', '/web/ztp/v2/saveTopology.do' ) : self.saveTopology,
+         ( 'DELETE', '/web/ztp/deleteAllTempAction.do' ) :
+            self.deleteTempActions,
+         ( 'GET', '/web/cvpTheme/getAllCvpThemes.do' ) : self.themeList,
+         ( 'GET', '/web/workflow/getTasks.do' ) : self.taskList,
+         ( 'POST', '/web/workflow/executeTask.do' ) : self.executeTasks,
+         ( 'GET', '/web/task/getTaskById.do' ) : self.taskById,
+         ( 'GET', '/web/event/getEventById.do' ) : self.event,
+         ( 'GET', '/web/event/getEventDataById.do' ) : self.childEvents,
+         ( 'GET', '/web/changeControl/getChangeControls.do' ) : self.emptyList,
+         ( 'GET', '/web/changeControl/getTasksByStatus.do' ) : self.emptyList,
+      }
+
+   def start( self ):
+      '''Starts serving on a background thread'''
+      self.server_ = _ThreadedHTTPServer( ( self.host, self.port ), _RequestHandler )
+      self.server_.mockServer = self
+      self.port = self.server_.server_address[ 1 ]
+      self.thread_ = threading.Thread( target=self.server_.serve_forever )
+      self.thread_.daemon = True
+      self.thread_.start()
+
+   def stop( self ):
+      '''Stops serving'''
+      if self.server_:
+         self.server_.shutdown()
+         self.server_.server_close()
+         self.server_ = None
+
+   def count( self, path ):
+      with self.countLock_:
+         self.requestCounts[ path ] += 1
+
+   def requestCount( self ):
+      '''Returns the total number of requests served'''
+      with self.countLock_:
+         return sum( self.requestCounts.values() )
+
+   def resetCounters( self ):
+      with self.countLock_:
+         self.requestCounts.clear()
+
+   @staticmethod
+   def _page( items, query ):
+      '''Applies the startIndex/endIndex paging of the list endpoints'''
+      start = int( query.get( 'startIndex' ) or 0 )
+      end = int( query.get( 'endIndex' ) or 0 )
+      if end:
+         items = items[ start : end ]
+      return items
+
+   def imageFile( self, imageId, rangeHeader ):
+      '''Returns the status, headers and body of an image download, honouring
+      a "bytes=<start>-" Range header'''
+      data = self.fakeCvp.imageFiles.get( imageId )
+      if data is None:
+         return 404, [], ''
+      if not rangeHeader:
+         return 200, [ ( 'Content-Type', 'application/octet-stream' ) ], data
+      start = int( rangeHeader.split( '=' )[ 1 ].split( '-' )[ 0 ] )
+      if start >= len( data ):
+         return 416, [ ( 'Content-Range', 'bytes */%d' % len( data ) ) ], ''
+      return 206, [ ( 'Content-Type', 'application/octet-stream' ),
+                    ( 'Content-Range', 'bytes %d-%d/%d' % ( start, len( data ) - 1,
+                                                            len( data ) ) ) ], \
+             data[ start : ]
+
+   def _entityError( self ):
+      return { 'errorCode' : '132801', 'errorMessage' : 'Entity does not exist' }
+
+   # Endpoint handlers, called with the query parameters and the decoded body
+
+   def authenticate( self, query, payload ):
+      sessionId = uuid.uuid4().hex
+      return ( { 'sessionId' : sessionId, 'userName' : payload.get( 'userId' ) },
+               { 'session_id' : sessionId } )
+
+   def success( self, query, payload ):
+      return { 'data' : 'success' }
+
+   def emptyList( self, query, payload ):
+      return { 'data' : [], 'total' : 0 }
+
+   def cvpInfo( self, query, payload ):
+      return { 'version' : '2018.2.0' }
+
+   def inventory( self, query, payload ):
+      return sorted( self.fakeCvp.devices.values(), key=lambda d: d[ 'ipAddress' ] )
+
+   def onboard( self, query, payload ):
+      self.fakeCvp.onboard( payload[ 'hosts' ] )
+      return { 'data' : 'success' }
+
+   def mapToContainer( self, query, payload ):
+      bySerial = dict( ( device[ 'serialNumber' ], device ) for device in
+                       self.fakeCvp.devices.values() )
+      deviceTaskMap = {}
+      for serial, containerKey in payload[ 'deviceToContainerMap' ].items():
+         device = bySerial[ serial ]
+         device[ 'parentContainerKey' ] = containerKey
+         deviceTaskMap[ serial ] = self.fakeCvp.addTasks(
+                                      1, netElementIds=[ device[ 'key' ] ] )[ 0 ]
+      return { 'result' : 'success', 'deviceTaskMap' : deviceTaskMap }
+
+   def searchContainer( self, query, payload ):
+      name = query.get( 'name', '' ).lower()
+      return [ { 'Key' : c[ 'key' ], 'Name' : c[ 'name' ] }
+               for c in self.fakeCvp.containers.values()
+               if c[ 'name' ].lower() == name ]
+
+   def filterTopology( self, query, payload ):
+      return { 'topology' : self.fakeCvp.topology( query.get( 'nodeId', 'root' ) ) }
+
+   def searchTopology( self, query, payload ):
+      name = query.get( 'queryParam', '' ).lower()
+      containers = [ { 'key' : c[ 'key' ], 'name' : c[ 'name' ] }
+                     for c in self.fakeCvp.containers.values()
+                     if name in c[ 'name' ].lower() ]
+      devices = [ d for d in self.fakeCvp.devices.values()
+                  if name in d[ 'fqdn' ].lower() or name in d[ 'ipAddress' ] ]
+      return { 'containerList' : containers, 'netElementList' : devices,
+               'total' : len( containers ) + len( devices ) }
+
+   def netElement( self, query, payload ):
+      return self.fakeCvp.devices.get( query.get( 'netElementId' ) ) or \
+             self._entityError()
+
+   def containerInfo( self, query, payload ):
+      containerInfo = self.fakeCvp.containers.get( query.get( 'containerId' ) )
+      if containerInfo is None:
+         return self._entityError()
+      parent = self.fakeCvp.containers.get( containerInfo[ 'parentKey' ] )
+      return { 'key' : containerInfo[ 'key' ], 'name' : containerInfo[ 'name' ],
+               'parentName' : parent[ 'name' ] if parent else None }
+
+   def containerConfiglets( self, query, payload ):
+      configlets = self.fakeCvp.configletsOf( query.get( 'containerId' ) )
+      return { 'configletList' : configlets, 'total' : len( configlets ) }
+
+   def deviceConfiglets( self, query, payload ):
+      configlets = self.fakeCvp.configletsOf( query.get( 'netElementId' ) )
+      return { 'configletList' : configlets, 'total' : len( configlets ) }
+
+   def deviceImageBundle( self, query, payload ):
+      device = self.fakeCvp.devices.get( query.get( 'netElementId' ) )
+      if device is None:
+         return self._entityError()
+      return self._imageBundleMappers( device[ 'key' ], 'netelement',
+                                       'appliedDevices', device[ 'ipAddress' ],
+                                       device[ 'parentContainerKey' ] )
+
+   def containerImageBundle( self, query, payload ):
+      containerInfo = self.fakeCvp.containers.get( query.get( 'containerId' ) )
+      if containerInfo is None:
+         return self._entityError()
+      return self._imageBundleMappers( containerInfo[ 'key' ], 'container',
+                                       'appliedContainers', containerInfo[ 'name' ],
+                                       containerInfo[ 'parentKey' ] )
+
+   def _imageBundleMappers( self, objectId, objectType, appliedKey, appliedName,
+                            parentKey ):
+      # the bundle applied to the object itself, or else the one it inherits
+      # from the closest container above it
+      owners = [ ( objectId, objectType, appliedKey, appliedName ) ]
+      while parentKey:
+         containerInfo = self.fakeCvp.containers[ parentKey ]
+         owners.append( ( parentKey, 'container', 'appliedContainers',
+                          containerInfo[ 'name' ] ) )
+         parentKey = containerInfo[ 'parentKey' ]
+      for ownerId, ownerType, ownerAppliedKey, ownerName in owners:
+         for bundle in sorted( self.fakeCvp.imageBundles.values(),
+                               key=lambda b: b[ 'name' ] ):
+            if ownerName in bundle[ ownerAppliedKey ]:
+               return { 'imageBundleMapper' : { bundle[ 'key' ] : [ {
+                                 'imageBundleId' : bundle[ 'key' ],
+                                 'objectId' : ownerId,
+                                 'type' : ownerType } ] },
+                        'imageBundleList' : [ { 'key' : bundle[ 'key' ],
+                                                'name' : bundle[ 'name' ] } ] }
+      return { 'imageBundleMapper' : {}, 'imageBundleList' : [] }
+
+   def configletList( self, query, payload ):
+      configlets = sorted( self.fakeCvp.configlets.values(),
+                           key=lambda c: c[ 'name' ] )
+      return { 'data' : self._page( configlets, query ),
+               'total' : len( configlets ) }
+
+   def configletByName( self, query, payload ):
+      name = query.get( 'name', '' ).lower()
+      for configlet in self.fakeCvp.configlets.values():
+         if configlet[ 'name' ].lower() == name:
+            return configlet
+      return self._entityError()
+
+   def configletMappers( self, query, payload ):
+      return { 'data' : { 'configlets' : self.fakeCvp.configlets.values(),
+                          'configletMappers' : self.fakeCvp.configletMappers,
+                          'generatedConfigletMappers' : [],
+                          'configletBuilders' : [] } }
+
+   def configletBuilder( self, query, payload ):
+      configlet = self.fakeCvp.configlets.get( query.get( 'id' ) )
+      if configlet is None:
+         return self._entityError()
+      return { 'data' : { 'name' : configlet[ 'name' ], 'formList' : [],
+                          'main_script' : { 'data' : '' } } }
+
+   def _configletByName( self, name ):
+      for configlet in self.fakeCvp.configlets.values():
+         if configlet[ 'name' ] == name:
+            return configlet
+
+   def configletContainers( self, query, payload ):
+      configlet = self._configletByName( query.get( 'configletName' ) )
+      if configlet is None:
+         return { 'data' : [], 'total' : 0 }
+      containers = [ { 'containerName' :
+                          self.fakeCvp.containers[ m[ 'objectId' ] ][ 'name' ] }
+                     for m in self.fakeCvp.configletMappers
+                     if m[ 'configletId' ] == configlet[ 'key' ] and
+                        m[ 'type' ] == 'container' ]
+      return { 'data' : containers, 'total' : len( containers ) }
+
+   def configletDevices( self, query, payload ):
+      configlet = self._configletByName( query.get( 'configletName' ) )
+      if configlet is None:
+         return { 'data' : [], 'total' : 0 }
+      devices = [ self.fakeCvp.devices[ m[ 'objectId' ] ]
+                  for m in self.fakeCvp.configletMappers
+                  if m[ 'configletId' ] == configlet[ 'key' ] and
+                     m[ 'type' ] == 'netelement' ]
+      return { 'data' : devices, 'total' : len( devices ) }
+
+   def images( self, query, payload ):
+      images = [ image for bundle in self.fakeCvp.imageBundles.values()
+                 for image in bundle[ 'images' ] ]
+      return { 'data' : images, 'total' : len( images ) }
+
+   def imageBundleList( self, query, payload ):
+      bundles = [ { 'key' : bundle[ 'key' ], 'name' : bundle[ 'name' ] }
+                  for bundle in self.fakeCvp.imageBundles.values() ]
+      return { 'data' : bundles, 'total' : len( bundles ) }
+
+   def imageBundle( self, query, payload ):
+      bundle = self.fakeCvp.imageBundles.get( query.get( 'name' ) )
+      if bundle is None:
+         return self._entityError()
+      return dict( ( key, value ) for key, value in bundle.items()
+                   if not key.startswith( 'applied' ) )
+
+   def _appliedBundleKey( self, objectId, objectType, appliedKey, appliedName,
+                          parentKey ):
+      imageBundleList = self._imageBundleMappers( objectId, objectType, appliedKey,
+                                                  appliedName, parentKey )[
+                                                  'imageBundleList' ]
+      return imageBundleList[ 0 ][ 'key' ] if imageBundleList else None
+
+   def imageBundleDevices( self, query, payload ):
+      # devices the bundle applies to, directly or through their containers
+      bundle = self.fakeCvp.imageBundles.get( query.get( 'imageName' ) )
+      devices = [ { 'ipAddress' : device[ 'ipAddress' ] } for device in
+                  sorted( self.fakeCvp.devices.values(),
+                          key=lambda d: d[ 'ipAddress' ] )
+                  if bundle and self._appliedBundleKey( device[ 'key' ],
+                        'netelement', 'appliedDevices', device[ 'ipAddress' ],
+                        device[ 'parentContainerKey' ] ) == bundle[ 'key' ] ]
+      return { 'data' : devices, 'total' : len( devices ) }
+
+   def imageBundleContainers( self, query, payload ):
+      # containers the bundle applies to, directly or through their parents
+      bundle = self.fakeCvp.imageBundles.get( query.get( 'imageName' ) )
+      containers = [ { 'containerName' : containerInfo[ 'name' ] }
+                     for containerInfo in sorted( self.fakeCvp.containers.values(),
+                                                  key=lambda c: c[ 'name' ] )
+                     if bundle and self._appliedBundleKey( containerInfo[ 'key' ],
+                           'container', 'appliedContainers', containerInfo[ 'name' ],
+                           containerInfo[ 'parentKey' ] ) == bundle[ 'key' ] ]
+      return { 'data' : containers, 'total' : len( containers ) }
+
+   def hierarchicalBuilders( self, query, payload ):
+      return { 'buildMapperList' : [], 'total' : 0 }
+
+   def generateConfiglets( self, query, payload ):
+      generated = []
+      with self.fakeCvp.lock:
+         for netElementId in payload[ 'netElementIds' ]:
+            configletKey = self.fakeCvp._addConfiglet(
+                  'gen_%s_%s' % ( payload[ 'configletBuilderId' ], netElementId ),
+                  'Generated' )
+            generated.append( { 'netElementId' : netElementId,
+                                'configlet' :
+                                   self.fakeCvp.configlets[ configletKey ] } )
+      return { 'data' : generated }
+
+   def tempConfiglets( self, query, payload ):
+      # the configlets of the container the device is being moved to
+      netElementId = query.get( 'netElementId' )
+      with self.fakeCvp.lock:
+         containerKeys = [ action[ 'toId' ] for action in self.tempActions
+                           if action.get( 'nodeType' ) == 'netelement' and
+                              action.get( 'nodeId' ) == netElementId ]
+         configlets = self.fakeCvp.configletsOf( containerKeys[ -1 ] ) \
+                      if containerKeys else []
+      return { 'proposedConfiglets' : configlets }
+
+   def addTempAction( self, query, payload ):
+      with self.fakeCvp.lock:
+         self.tempActions.extend( payload[ 'data' ] )
+      return { 'data' : 'success' }
+
+   def deleteTempActions( self, query, payload ):
+      with self.fakeCvp.lock:
+         del self.tempActions[ : ]
+      return { 'data' : 'success' }
+
+   def saveTopology( self, query, payload ):
+      # containers are added, under parents known by their temp ids until now,
+      # and one pending task is created for every device with a change
+      with self.fakeCvp.lock:
+         netElementIds = []
+         tempKeys = {}
+         for action in self.tempActions:
+            if action.get( 'nodeType' ) == 'container' and \
+               action.get( 'action' ) == 'add':
+               containerKey = 'container_%s' % uuid.uuid4().hex[ : 12 ]
+               tempKeys[ action[ 'nodeId' ] ] = containerKey
+               self.fakeCvp._addContainer( containerKey, action[ 'nodeName' ],
+                     tempKeys.get( action[ 'toId' ], action[ 'toId' ] ) )
+            elif ( action.get( 'toIdType' ) == 'netelement' and
+                   action[ 'toId' ] not in netElementIds ):
+               netElementIds.append( action[ 'toId' ] )
+         del self.tempActions[ : ]
+         taskIds = self.fakeCvp.addTasks( len( netElementIds ),
+                                          netElementIds=netElementIds )
+      return { 'data' : { 'taskIds' : taskIds } }
+
+   def themeList( self, query, payload ):
+      themeType = query.get( 'type' )
+      themes = self.fakeCvp.themes.get( themeType, [] )
+      return { 'data' : { themeType : { 'data' : themes,
+                                        'total' : len( themes ) } } }
+
+   def taskList( self, query, payload ):
+      status = query.get( 'queryparam', '' )
+      tasks = [ self.fakeCvp.task( taskId ) for taskId in
+                sorted( self.fakeCvp.tasks, key=int ) ]
+      if status:
+         tasks = [ task for task in tasks if
+                   task[ 'workOrderUserDefinedStatus' ] == status ]
+      return { 'data' : self._page( tasks, query ), 'total' : len( tasks ) }
+
+   def executeTasks( self, query, payload ):
+      self.fakeCvp.execute( payload[ 'data' ] )
+      return { 'data' : 'success' }
+
+   def taskById( self, query, payload ):
+      return self.fakeCvp.task( query.get( 'taskId' ) ) or self._entityError()
+
+   def event( self, query, payload ):
+      return { 'data' : { 'key' : query.get( 'eventId' ), 'status' : 'COMPLETED',
+                          'total' : 0 } }
+
+   def childEvents( self, query, payload ):
+      return { 'data' : [], 'total' : 0 }
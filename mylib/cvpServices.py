@@ -8,9 +8,26 @@ CvpServices script is used for making request to the Cvp web-serves.
 These requests comprise of  addition, modification, deletion and retrieval of
 Cvp instance.
 
-It contains 2 classes
+It contains 11 classes
    CvpError -- Handles exceptions
+   ContainerIndex -- Resolves container keys and names without extra requests
+   ConfigletCatalog -- Resolves configlet keys by name without extra requests
+   FanOutExecutor -- Runs independent requests concurrently
+   Poller -- Waits for a state with exponential backoff
+   ResponseCache -- Caches responses of read-only requests
+   MultipartFileStream -- Streams a file upload from disk
+   BandwidthLimiter -- Caps the transfer rate shared by several downloads
+   RequestStats -- Collects request statistics by calling Cvp method
+   CvpTransaction -- Commits many topology changes with one save
    CvpService -- Handles requests
+
+All requests of a CvpService instance go through one pooled keep-alive HTTP
+session, so consecutive calls reuse the TCP/TLS connections to the server.
+
+Request and response bodies are handled by ujson or simplejson when installed,
+json otherwise ( see setJsonCodec ). With the C parser of ijson installed,
+CvpService.iterItems parses the items of large list responses while they are
+received.
 '''
 try:
    import requests_2_6_0 as requests
@@ -21,11 +38,35 @@ import uuid
 import os
 import errorCodes
 import base64
+import binascii
 import time
+import random
+import hashlib
+import cookielib
+import sys
+import threading
+import urlparse
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 try:
    from requests_2_6_0.utils import quote
 except ImportError:
    from requests.utils import quote
+# Requests and responses are encoded with the fastest available JSON codec
+try:
+   import ujson as jsonCodec
+except ImportError:
+   try:
+      import simplejson as jsonCodec
+   except ImportError:
+      jsonCodec = json
+# Items of list responses are parsed while received with the C parser of
+# ijson; its pure Python parser is slower than decoding the whole response
+try:
+   import ijson.common
+   from ijson.backends import yajl2_c as ijsonBackend
+except ImportError:
+   ijson = ijsonBackend = None
 
 try:
    # squelch annoying warnings
@@ -37,7 +78,158 @@ DEFAULT_USER = "cvpadmin"
 DEFAULT_PASSWORD = "cvpadmin"
 UNDEF_CONTAINER_KEY = 'undefined_container'
 ROOT_CONTAINER_KEY = 'root'
+DEFAULT_POOL_CONNECTIONS = 10   # number of per-host connection pools to cache
+DEFAULT_POOL_MAXSIZE = 10       # connections kept alive per host
+DEFAULT_MAX_IN_FLIGHT = 8       # concurrent requests of a FanOutExecutor
+DEFAULT_POLL_INTERVAL = 0.25    # seconds before the first retry of a Poller
+DEFAULT_POLL_MAX_INTERVAL = 5   # upper bound of the Poller backoff in seconds
+INVENTORY_SEARCH_THRESHOLD = 8  # missing devices looked up by name, not listed
+INVENTORY_FULL_SWEEP_ROUNDS = 4
+DEFAULT_CACHE_SIZE = 256        # responses kept by a ResponseCache
+CONFIGLET_CATALOG_CHECK_INTERVAL = 10  # seconds between catalog version checks
+UPLOAD_BUFFER_SIZE = 1024 * 1024       # bytes read from disk at a time
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024      # bytes written to disk at a time
+BASE64_CHUNK_SIZE = 4 * 64 * 1024      # base64 characters decoded at a time
+THEME_MANIFEST = '.themes.json'        # checksums of the synced theme files
+STREAM_HEAD_SIZE = 64 * 1024           # bytes kept of streamed responses
+DEFAULT_PAGE_SIZE = 500                # items per request of the iter* methods
+TEMP_ACTION_BATCH_SIZE = 200           # temp actions per addTempAction request
+CALLER_MODULE = 'cvp'                  # module whose methods group request stats
+# upper bounds of the RequestStats latency histogram buckets, in seconds
+REQUEST_LATENCY_BUCKETS = ( 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                            10 )
+
+# Read-only endpoints whose responses may be cached, by the group of CVP state
+# they reflect. Endpoints polled by the wait loops are deliberately absent
+CACHE_GROUPS = {
+   '/web/configlet/getConfiglets.do' : 'configlets',
+   '/web/configlet/getConfigletByName.do' : 'configlets',
+   '/web/configlet/getConfigletsAndAssociatedMappers.do' : 'configlets',
+   '/web/configlet/getConfigletBuilder.do' : 'configlets',
+   '/web/configlet/getAppliedContainers.do' : 'configlets',
+   '/web/configlet/getAppliedDevices.do' : 'configlets',
+   '/web/image/getImages.do' : 'images',
+   '/web/image/v2/getImageBundles.do' : 'images',
+   '/web/image/v2/getImageBundleByName.do' : 'images',
+   '/web/image/getImageBundleAppliedContainers.do' : 'images',
+   '/web/image/getImageBundleAppliedDevices.do' : 'images',
+   '/cvpservice/provisioning/filterTopology.do' : 'topology',
+   '/cvpservice/inventory/containers' : 'topology',
+   '/web/provisioning/getContainerInfoById.do' : 'topology',
+   '/web/provisioning/getConfigletsByContainerId.do' : 'topology',
+   '/web/provisioning/getConfigletsByNetElementId.do' : 'topology',
+   '/web/provisioning/getImageBundleByNetElementId.do' : 'topology',
+   '/web/provisioning/getImageBundleByContainerId.do' : 'topology',
+   '/web/role/getRoles.do' : 'roles',
+   '/web/role/getRole.do' : 'roles',
+   '/web/cvpInfo/getCvpInfo.do' : 'version',
+}
+
+# Seconds a cached response of each group stays valid
+CACHE_TTLS = {
+   'configlets' : 30,
+   'images' : 60,
+   'topology' : 30,
+   'roles' : 300,
+   'version' : 3600,
+}
+
+# Groups made stale by each mutating endpoint. Any other request that is not a
+# GET flushes the whole cache, unless it is listed in CACHE_READ_ONLY_POSTS
+CACHE_INVALIDATIONS = {
+   '/web/configlet/addConfiglet.do' : ( 'configlets', 'topology' ),
+   '/web/configlet/addConfigletsAndAssociatedMappers.do' : ( 'configlets',
+                                                             'topology' ),
+   '/web/configlet/addConfigletBuilder.do' : ( 'configlets', ),
+   '/web/configlet/updateConfigletBuilder.do' : ( 'configlets', ),
+   '/web/configlet/cancelConfigletBuilder.do' : ( 'configlets', 'topology' ),
+   '/web/configlet/updateConfiglet.do' : ( 'configlets', 'topology' ),
+   '/web/provisioning/updateReconcileConfiglet.do' : ( 'configlets', 'topology' ),
+   '/web/configlet/deleteConfiglet.do' : ( 'configlets', 'topology' ),
+   '/web/configlet/autoConfigletGenerator.do' : ( 'configlets', ),
+   '/web/image/addImage.do' : ( 'images', ),
+   '/web/image/saveImageBundle.do' : ( 'images', ),
+   '/web/image/updateImageBundle.do' : ( 'images', ),
+   '/web/image/deleteImageBundles.do' : ( 'images', 'topology' ),
+   '/web/ztp/addTempAction.do' : ( 'topology', ),
+   '/web/ztp/v2/saveTopology.do' : ( 'topology', 'configlets', 'images' ),
+   '/web/ztp/deleteAllTempAction.do' : ( 'topology', ),
+   '/cvpservice/inventory/devices' : ( 'topology', ),
+   '/cvpservice/inventory/devices/mapToContainer' : ( 'topology', ),
+   '/cvpservice/inventory/deleteDevices.do' : ( 'topology', 'configlets',
+                                                'images' ),
+   '/web/inventory/importInventoryData.do' : ( 'topology', ),
+   '/web/workflow/executeTask.do' : ( 'topology', 'configlets', 'images' ),
+   '/web/role/createRole.do' : ( 'roles', ),
+   '/web/role/updateRole.do' : ( 'roles', ),
+   '/web/role/deleteRoles.do' : ( 'roles', ),
+}
+
+CACHE_READ_ONLY_POSTS = frozenset( [
+   '/web/provisioning/v2/validateAndCompareConfiglets.do',
+   '/web/configlet/configletBuilderPreview.do',
+   '/web/configlet/getManagementIp.do',
+   '/web/changeControl/getCCProgress.do',
+   '/cvpservice/snapshot/templates/info',
+   '/web/aaa/testServerConnectivity.do',
+   '/cvpservice/ssl/exportCertificate.do',
+   '/cvpservice/trustedCertificates/export.do',
+] )
 trace = ( 'cvpServices' in os.getenv( 'TRACE', '' ).split( ',' ) )
+DEFAULT_JSON_CODEC = jsonCodec
+
+def setJsonCodec( codec=None ):
+   '''Chooses the JSON codec of all requests and responses
+   Arguments:
+      codec -- module or object with loads( text ) and dumps( obj ), e.g. json,
+               or None for the fastest one installed ( DEFAULT_JSON_CODEC )
+   '''
+   global jsonCodec
+   jsonCodec = codec or DEFAULT_JSON_CODEC
+# caller and open transactions inherited by the worker threads of a
+# FanOutExecutor
+_requestContext = threading.local()
+
+def openTransactions():
+   '''Returns the CvpTransactions open on this thread, or inherited from the
+   thread that fanned the call out, by CvpService ( type : Dict )'''
+   transactions = getattr( _requestContext, 'transactions', None )
+   if transactions is None:
+      transactions = _requestContext.transactions = {}
+   return transactions
+
+def _topologyChange( method ):
+   '''Wraps a CvpService method sending temp actions and saving the topology.
+   The temp actions of Cvp belong to the session, and a save commits all of
+   them, so these methods are run one at a time per CvpService. In an open
+   transaction, which holds the lock until it is closed, they only collect
+   temp actions and are not serialized.'''
+   def serialized( self, *args, **kwargs ):
+      if self.transaction is not None:
+         return method( self, *args, **kwargs )
+      with self.topologyLock_:
+         return method( self, *args, **kwargs )
+   serialized.__name__ = method.__name__
+   serialized.__doc__ = method.__doc__
+   return serialized
+
+def requestCaller():
+   '''Returns the name of the outermost public method of CALLER_MODULE on the
+   call stack, or the one inherited from the thread that fanned the call out.
+   None if the request was not made on behalf of a Cvp method.'''
+   caller = getattr( _requestContext, 'caller', None )
+   if caller:
+      return caller
+   frame = sys._getframe( 1 )
+   while frame is not None:
+      code = frame.f_code
+      if ( not code.co_name.startswith( '_' ) and
+           code.co_varnames[ : 1 ] == ( 'self', ) and
+           frame.f_globals.get( '__name__', '' ).rsplit( '.', 1 )[ -1 ] ==
+           CALLER_MODULE ):
+         caller = code.co_name
+      frame = frame.f_back
+   return caller
 
 class CvpError( Exception ):
    '''CvpError is a class for containing the exception information and passing that
@@ -74,6 +266,769 @@ class CvpError( Exception ):
       '''returns string value of the object'''
       return "{} : {}".format( self.errorCode, self.errorMessage if self.errorMessage else '' )
 
+class ContainerIndex( object ):
+   '''ContainerIndex holds the container hierarchy downloaded with a single
+   filterTopology request, so that container names, keys and parents can be
+   resolved without a request per lookup. Container names are not case
+   sensitive, names are looked up case folded.
+
+   Public methods:
+      name( containerKey )
+      key( containerName )
+      parent( containerKey )
+      add( containerKey, containerName, parentKey )
+      rename( containerKey, containerName )
+      remove( containerKey )
+
+   Instance variables:
+      nameByKey -- container key to container name map
+      keyByName -- case folded container name to container key map
+      parentByKey -- container key to parent container key map
+   '''
+   def __init__( self, topology ):
+      self.nameByKey = {}
+      self.keyByName = {}
+      self.parentByKey = {}
+      pending = [ ( topology, '' ) ]
+      while pending:
+         containerInfo, parentKey = pending.pop()
+         self.add( containerInfo[ 'key' ], containerInfo[ 'name' ], parentKey )
+         for childInfo in containerInfo.get( 'childContainerList' ) or []:
+            pending.append( ( childInfo, containerInfo[ 'key' ] ) )
+
+   def add( self, containerKey, containerName, parentKey ):
+      '''Adds a container to the index'''
+      self.remove( containerKey )
+      self.nameByKey[ containerKey ] = containerName
+      self.keyByName[ containerName.lower() ] = containerKey
+      self.parentByKey[ containerKey ] = parentKey
+
+   def rename( self, containerKey, containerName ):
+      '''Renames a container of the index'''
+      if containerKey in self.nameByKey:
+         self.add( containerKey, containerName, self.parentByKey[ containerKey ] )
+
+   def remove( self, containerKey ):
+      '''Removes a container from the index'''
+      containerName = self.nameByKey.pop( containerKey, None )
+      if containerName is not None:
+         self.keyByName.pop( containerName.lower(), None )
+         self.parentByKey.pop( containerKey, None )
+
+   def name( self, containerKey ):
+      '''Returns the name of the container, None if the key is unknown'''
+      return self.nameByKey.get( containerKey )
+
+   def key( self, containerName ):
+      '''Returns the key of the container, None if the name is unknown'''
+      return self.keyByName.get( containerName.lower() )
+
+   def parent( self, containerKey ):
+      '''Returns the key of the parent container, None if the key is unknown'''
+      return self.parentByKey.get( containerKey )
+
+class ConfigletCatalog( object ):
+   '''ConfigletCatalog maps the names of all configlets to their key and type,
+   from a single configlet listing. Names are matched case-insensitively, as
+   CVP does. total is the number of configlets CVP reported when the catalog
+   was loaded, kept in step with the additions and deletions made through
+   CvpService, and compared with the current count to detect outside changes.
+
+   Public methods:
+      lookup( configletName )
+      add( configletName, configletKey, configletType )
+      remove( configletName )
+      removeKey( configletKey )
+      rename( configletKey, configletName )
+
+   Instance variables:
+      total -- expected number of configlets in Cvp
+      checked -- time of the last version check
+   '''
+   def __init__( self, configletsInfo ):
+      self.entries_ = {}
+      self.lock_ = threading.Lock()
+      self.total = len( configletsInfo )
+      self.checked = time.time()
+      for configletInfo in configletsInfo:
+         self.add( configletInfo[ 'name' ], configletInfo[ 'key' ],
+                   configletInfo.get( 'type' ) )
+
+   def lookup( self, configletName ):
+      '''Returns { 'name', 'key', 'type' } of the configlet, None if unknown'''
+      return self.entries_.get( configletName.lower() )
+
+   def add( self, configletName, configletKey, configletType ):
+      '''Adds or replaces the entry of a configlet'''
+      with self.lock_:
+         self.entries_[ configletName.lower() ] = { 'name' : configletName,
+                                                    'key' : configletKey,
+                                                    'type' : configletType }
+
+   def remove( self, configletName ):
+      '''Removes the entry of a configlet, if present'''
+      with self.lock_:
+         self.entries_.pop( configletName.lower(), None )
+
+   def removeKey( self, configletKey ):
+      '''Removes the entry of the configlet with the given key, if present'''
+      with self.lock_:
+         for name, entry in self.entries_.items():
+            if entry[ 'key' ] == configletKey:
+               del self.entries_[ name ]
+
+   def rename( self, configletKey, configletName ):
+      '''Files the configlet with the given key under a new name, keeping its
+      type. Unknown configlets are added as static configlets.'''
+      with self.lock_:
+         configletType = 'Static'
+         for name, entry in self.entries_.items():
+            if entry[ 'key' ] == configletKey:
+               configletType = entry[ 'type' ]
+               del self.entries_[ name ]
+         self.entries_[ configletName.lower() ] = { 'name' : configletName,
+                                                    'key' : configletKey,
+                                                    'type' : configletType }
+
+class FanOutExecutor( object ):
+   '''FanOutExecutor runs independent calls, typically one GET request per
+   object, on a bounded pool of worker threads. Results are returned in the
+   order of the inputs. Calls made from inside a worker run inline, so nested
+   fan-outs cannot exhaust the pool.
+
+   Public methods:
+      map( func, items )
+      submit( func, *args, **kwargs )
+      close()
+
+   Instance variables:
+      maxInFlight -- maximum number of concurrent calls
+   '''
+   def __init__( self, maxInFlight=DEFAULT_MAX_IN_FLIGHT ):
+      self.maxInFlight = maxInFlight
+      self.pool_ = None
+      self.lock_ = threading.Lock()
+      self.local_ = threading.local()
+
+   def _pool( self ):
+      '''Creates the worker threads on first use'''
+      with self.lock_:
+         if self.pool_ is None:
+            self.pool_ = ThreadPool( self.maxInFlight )
+         return self.pool_
+
+   def _inWorker( self ):
+      return getattr( self.local_, 'inWorker', False )
+
+   def _call( self, func, args, kwargs, caller=None, transactions=None ):
+      '''Runs func in a worker thread, on behalf of caller and in its open
+      transactions'''
+      self.local_.inWorker = True
+      _requestContext.caller = caller
+      _requestContext.transactions = dict( transactions or {} )
+      try:
+         return func( *args, **kwargs )
+      finally:
+         self.local_.inWorker = False
+         _requestContext.caller = None
+         _requestContext.transactions = None
+
+   def map( self, func, items ):
+      '''Calls func for every item and returns the results in order
+      Arguments:
+         func -- function taking a single item
+         items -- iterable of items
+      Raises:
+         CvpError -- the first error raised by any of the calls. Errors other
+                     than CvpError are reported as UNKNOWN_ERROR_CODE
+      Returns:
+         results -- func( item ) for every item ( type : List )
+      '''
+      items = list( items )
+      try:
+         if self.maxInFlight <= 1 or len( items ) <= 1 or self._inWorker():
+            return [ func( item ) for item in items ]
+         caller = requestCaller()
+         transactions = openTransactions()
+         return self._pool().map(
+                     lambda item: self._call( func, ( item, ), {}, caller,
+                                              transactions ),
+                     items, chunksize=1 )
+      except CvpError:
+         raise
+      except Exception as e:
+         raise CvpError( errorCodes.UNKNOWN_ERROR_CODE, str( e ) )
+
+   def submit( self, func, *args, **kwargs ):
+      '''Schedules func( *args, **kwargs ) and returns immediately
+      Returns:
+         result -- multiprocessing.pool.AsyncResult, whose get() returns the
+                   value of the call or raises its error
+      '''
+      return self._pool().apply_async( self._call, ( func, args, kwargs,
+                                                     requestCaller(),
+                                                     openTransactions() ) )
+
+   def close( self ):
+      '''Waits for the scheduled calls and stops the worker threads'''
+      with self.lock_:
+         pool, self.pool_ = self.pool_, None
+      if pool is not None:
+         pool.close()
+         pool.join()
+
+class Poller( object ):
+   '''Poller calls a probe until a predicate accepts its result. The delay
+   between calls starts at interval, is multiplied by multiplier after every
+   call up to maxInterval, and is randomly spread by +/- jitter ( a fraction )
+   so that concurrent pollers do not hit the server in lockstep.
+
+   Public methods:
+      wait( probe, predicate, failure, progress )
+
+   Instance variables:
+      timeout -- seconds to wait for, or indefinitely if 0 or None
+      interval -- initial delay between calls in seconds
+      multiplier -- growth factor of the delay
+      maxInterval -- upper bound of the delay in seconds
+      jitter -- random spread of the delay, as a fraction of it
+   '''
+   def __init__( self, timeout=600, interval=DEFAULT_POLL_INTERVAL, multiplier=2,
+                 maxInterval=DEFAULT_POLL_MAX_INTERVAL, jitter=0.1 ):
+      self.timeout = timeout
+      self.interval = interval
+      self.multiplier = multiplier
+      self.maxInterval = maxInterval
+      self.jitter = jitter
+
+   def wait( self, probe, predicate=bool, failure=None, progress=None ):
+      '''Calls probe until predicate( result ) is True
+      Arguments:
+         probe -- function without arguments returning the current state
+         predicate -- function of the probe result, True when the wait is over
+         failure -- function of the probe result, returning the CvpError to
+                    raise when the state is terminal without being the one
+                    waited for, None otherwise ( optional )
+         progress -- function of the probe result, True when the state moved
+                     forward, which resets the delay to interval ( optional )
+      Raises:
+         CvpError -- TIMEOUT if the predicate is not met in time, or the error
+                     returned by failure
+      Returns:
+         result -- the accepted probe result
+      '''
+      end = time.time() + self.timeout if self.timeout else None
+      delay = self.interval
+      while True:
+         result = probe()
+         if failure:
+            error = failure( result )
+            if error:
+               raise error
+         if predicate( result ):
+            return result
+         if progress and progress( result ):
+            delay = self.interval
+         now = time.time()
+         if end is not None and now >= end:
+            raise CvpError( errorCodes.TIMEOUT )
+         sleep = delay * random.uniform( 1 - self.jitter, 1 + self.jitter )
+         if end is not None:
+            sleep = min( sleep, end - now )
+         time.sleep( sleep )
+         delay = min( delay * self.multiplier, self.maxInterval )
+
+class ResponseCache( object ):
+   '''ResponseCache keeps the raw responses of the read-only requests listed
+   in CACHE_GROUPS, keyed by their URL, for the TTL of their group. The least
+   recently used response is dropped when maxEntries is reached. Responses are
+   stored as text and decoded on every hit, so callers may modify what they
+   get back.
+
+   Public methods:
+      lookup( url )
+      store( url, text )
+      invalidateFor( url )
+      invalidate( groups )
+
+   Instance variables:
+      maxEntries -- maximum number of cached responses
+      ttls -- seconds a response stays valid, by group
+      hits -- number of requests served from the cache
+      misses -- number of cacheable requests sent to the server
+   '''
+   def __init__( self, maxEntries=DEFAULT_CACHE_SIZE, ttls=None ):
+      self.maxEntries = maxEntries
+      self.ttls = dict( CACHE_TTLS )
+      self.ttls.update( ttls or {} )
+      self.hits = 0
+      self.misses = 0
+      self.entries_ = OrderedDict()   # url to ( group, expiry, text )
+      self.lock_ = threading.Lock()
+
+   def _group( self, url ):
+      return CACHE_GROUPS.get( urlparse.urlparse( url ).path )
+
+   def lookup( self, url ):
+      '''Returns the cached response text of a GET request, None on a miss'''
+      if not self._group( url ):
+         return None
+      with self.lock_:
+         entry = self.entries_.pop( url, None )
+         if entry is None or entry[ 1 ] < time.time():
+            self.misses += 1
+            return None
+         # re-inserting marks the entry as most recently used
+         self.entries_[ url ] = entry
+         self.hits += 1
+         return entry[ 2 ]
+
+   def store( self, url, text ):
+      '''Caches the response text of a GET request, if its endpoint is cacheable'''
+      group = self._group( url )
+      if not group:
+         return
+      with self.lock_:
+         self.entries_.pop( url, None )
+         self.entries_[ url ] = ( group, time.time() + self.ttls[ group ], text )
+         while len( self.entries_ ) > self.maxEntries:
+            self.entries_.popitem( last=False )
+
+   def invalidateFor( self, url ):
+      '''Drops the responses made stale by a request that is not a GET'''
+      path = urlparse.urlparse( url ).path
+      if path in CACHE_READ_ONLY_POSTS:
+         return
+      self.invalidate( CACHE_INVALIDATIONS.get( path ) )
+
+   def invalidate( self, groups=None ):
+      '''Drops the responses of the given groups, or all of them if None'''
+      with self.lock_:
+         if groups is None:
+            self.entries_.clear()
+            return
+         for url, entry in self.entries_.items():
+            if entry[ 0 ] in groups:
+               del self.entries_[ url ]
+
+class MultipartFileStream( object ):
+   '''MultipartFileStream is a multipart/form-data request body holding one
+   file. The file is read from disk in binary mode, at most bufferSize bytes at
+   a time, while the request is sent, so memory use does not depend on the
+   file size. Its MD5 and SHA-512 are computed on the way.
+
+   Public methods:
+      read( size )
+      close()
+
+   Instance variables:
+      contentType -- value of the Content-Type header of the request
+      len -- total size of the body in bytes
+      md5 -- hashlib MD5 of the file bytes read so far
+      sha512 -- hashlib SHA-512 of the file bytes read so far
+   '''
+   def __init__( self, fieldName, filePath, fileName=None,
+                 fileType='application/octet-stream',
+                 bufferSize=UPLOAD_BUFFER_SIZE, progress=None ):
+      boundary = uuid.uuid4().hex
+      fileName = fileName or os.path.basename( filePath )
+      self.contentType = 'multipart/form-data; boundary=%s' % boundary
+      self.parts_ = [ '--%s\r\nContent-Disposition: form-data; name="%s"; '
+                      'filename="%s"\r\nContent-Type: %s\r\n\r\n' % (
+                      boundary, fieldName, fileName, fileType ),
+                      None,
+                      '\r\n--%s--\r\n' % boundary ]
+      self.len = ( len( self.parts_[ 0 ] ) + os.path.getsize( filePath ) +
+                   len( self.parts_[ 2 ] ) )
+      self.fileName = fileName
+      self.bufferSize = bufferSize
+      self.progress = progress
+      self.md5 = hashlib.md5()
+      self.sha512 = hashlib.sha512()
+      self.sent = 0
+      self.part_ = 0
+      self.offset_ = 0
+      self.file_ = open( filePath, 'rb' )
+
+   def __len__( self ):
+      return self.len
+
+   def read( self, size=-1 ):
+      '''Returns the next size bytes of the body, all the rest if size < 0'''
+      if size is None or size < 0:
+         size = self.len - self.sent
+      chunks = []
+      while size > 0 and self.part_ < len( self.parts_ ):
+         if self.parts_[ self.part_ ] is None:
+            data = self.file_.read( min( size, self.bufferSize ) )
+            if not data:
+               self.file_.close()
+               self.part_ += 1
+               continue
+            self.md5.update( data )
+            self.sha512.update( data )
+         else:
+            text = self.parts_[ self.part_ ]
+            data = text[ self.offset_ : self.offset_ + size ]
+            self.offset_ += len( data )
+            if self.offset_ >= len( text ):
+               self.part_ += 1
+               self.offset_ = 0
+         chunks.append( data )
+         size -= len( data )
+         self.sent += len( data )
+         if self.progress:
+            self.progress( self.fileName, self.sent, self.len )
+      return ''.join( chunks )
+
+   def close( self ):
+      '''Closes the file'''
+      self.file_.close()
+
+class BandwidthLimiter( object ):
+   '''BandwidthLimiter is a token bucket shared by concurrent transfers, which
+   together move at most bytesPerSecond bytes per second on average, with
+   bursts of up to one second worth of data.
+
+   Public methods:
+      consume( byteCount )
+
+   Instance variables:
+      bytesPerSecond -- transfer rate cap
+   '''
+   def __init__( self, bytesPerSecond ):
+      self.bytesPerSecond = float( bytesPerSecond )
+      self.tokens_ = self.bytesPerSecond
+      self.updated_ = time.time()
+      self.lock_ = threading.Lock()
+
+   def consume( self, byteCount ):
+      '''Accounts for byteCount transferred bytes, sleeping as long as needed
+      to stay under the cap'''
+      with self.lock_:
+         now = time.time()
+         self.tokens_ = min( self.bytesPerSecond, self.tokens_ +
+                             ( now - self.updated_ ) * self.bytesPerSecond )
+         self.updated_ = now
+         self.tokens_ -= byteCount
+         wait = -self.tokens_ / self.bytesPerSecond
+      if wait > 0:
+         time.sleep( wait )
+
+class RequestStats( object ):
+   '''RequestStats is an instrument of CvpService collecting, for every calling
+   Cvp method and endpoint, a latency histogram, the bytes sent and received,
+   the HTTP status codes, the CvpError codes, the retries and the cache hits.
+   A request is counted as a retry when it reissues a request that failed, as
+   downloadImage does when Cvp refuses to resume a partial download.
+
+      stats = RequestStats()
+      cvpInstance = cvp.Cvp( host, instruments=[ stats ] )
+      ...
+      print stats.prometheus()
+
+   Public methods:
+      record( sample )
+      asDict()
+      prometheus( prefix )
+      reset()
+
+   Instance variables:
+      buckets -- upper bounds of the latency histogram buckets, in seconds
+   '''
+   def __init__( self, buckets=REQUEST_LATENCY_BUCKETS ):
+      self.buckets = tuple( sorted( buckets ) )
+      self.stats_ = {}   # ( caller, method, endpoint ) to counters
+      self.lock_ = threading.Lock()
+
+   def _newEntry( self ):
+      return { 'count' : 0,
+               'seconds' : 0.0,
+               'buckets' : [ 0 ] * ( len( self.buckets ) + 1 ),
+               'bytesSent' : 0,
+               'bytesReceived' : 0,
+               'statusCodes' : {},
+               'errorCodes' : {},
+               'retries' : 0,
+               'cacheHits' : 0 }
+
+   def record( self, sample ):
+      '''Accounts for one request
+      Arguments:
+         sample -- request description built by CvpService.doRequest, with the
+                   keys caller, method, endpoint, seconds, bytesSent,
+                   bytesReceived, status, errorCode, retry and cached
+      '''
+      key = ( sample[ 'caller' ] or '', sample[ 'method' ], sample[ 'endpoint' ] )
+      bucket = len( self.buckets )
+      for index, bound in enumerate( self.buckets ):
+         if sample[ 'seconds' ] <= bound:
+            bucket = index
+            break
+      with self.lock_:
+         entry = self.stats_.get( key )
+         if entry is None:
+            entry = self.stats_[ key ] = self._newEntry()
+         entry[ 'count' ] += 1
+         entry[ 'seconds' ] += sample[ 'seconds' ]
+         entry[ 'buckets' ][ bucket ] += 1
+         entry[ 'bytesSent' ] += sample[ 'bytesSent' ]
+         entry[ 'bytesReceived' ] += sample[ 'bytesReceived' ]
+         if sample[ 'status' ] is not None:
+            status = str( sample[ 'status' ] )
+            entry[ 'statusCodes' ][ status ] = \
+                  entry[ 'statusCodes' ].get( status, 0 ) + 1
+         if sample[ 'errorCode' ] is not None:
+            errorCode = str( sample[ 'errorCode' ] )
+            entry[ 'errorCodes' ][ errorCode ] = \
+                  entry[ 'errorCodes' ].get( errorCode, 0 ) + 1
+         entry[ 'retries' ] += 1 if sample[ 'retry' ] else 0
+         entry[ 'cacheHits' ] += 1 if sample[ 'cached' ] else 0
+
+   def asDict( self ):
+      '''Returns the statistics keyed by caller, then by 'METHOD endpoint'.
+      Requests not made by a Cvp method have the caller ''. The histogram is
+      cumulative and keyed by bucket upper bound, '+Inf' for the last one.
+      Returns:
+         stats -- ( type : Dict of Dict of Dict )
+      '''
+      bounds = [ repr( bound ) for bound in self.buckets ] + [ '+Inf' ]
+      stats = {}
+      with self.lock_:
+         for ( caller, method, endpoint ), entry in self.stats_.iteritems():
+            entry = dict( entry, statusCodes=dict( entry[ 'statusCodes' ] ),
+                          errorCodes=dict( entry[ 'errorCodes' ] ) )
+            cumulative = 0
+            histogram = OrderedDict()
+            for bound, count in zip( bounds, entry[ 'buckets' ] ):
+               cumulative += count
+               histogram[ bound ] = cumulative
+            entry[ 'buckets' ] = histogram
+            stats.setdefault( caller, {} )[ '%s %s' % ( method, endpoint ) ] = entry
+      return stats
+
+   def prometheus( self, prefix='cvp_client' ):
+      '''Returns the statistics in the Prometheus text exposition format'''
+      def escape( value ):
+         return value.replace( '\\', '\\\\' ).replace( '"', '\\"' ).replace(
+                                                                     '\n', '\\n' )
+      def labels( key, **extra ):
+         pairs = zip( ( 'caller', 'method', 'endpoint' ), key ) + \
+                 sorted( extra.items() )
+         return ','.join( '%s="%s"' % ( name, escape( str( value ) ) )
+                          for name, value in pairs )
+      with self.lock_:
+         entries = sorted( ( key, dict( entry,
+                                        statusCodes=dict( entry[ 'statusCodes' ] ),
+                                        errorCodes=dict( entry[ 'errorCodes' ] ),
+                                        buckets=list( entry[ 'buckets' ] ) ) )
+                           for key, entry in self.stats_.iteritems() )
+      lines = []
+      def metric( name, metricType, helpText ):
+         lines.append( '# HELP %s_%s %s' % ( prefix, name, helpText ) )
+         lines.append( '# TYPE %s_%s %s' % ( prefix, name, metricType ) )
+
+      metric( 'request_duration_seconds', 'histogram', 'Duration of Cvp requests' )
+      for key, entry in entries:
+         cumulative = 0
+         bounds = [ repr( bound ) for bound in self.buckets ] + [ '+Inf' ]
+         for bound, count in zip( bounds, entry[ 'buckets' ] ):
+            cumulative += count
+            lines.append( '%s_request_duration_seconds_bucket{%s} %d' % (
+                          prefix, labels( key, le=bound ), cumulative ) )
+         lines.append( '%s_request_duration_seconds_sum{%s} %r' % (
+                       prefix, labels( key ), entry[ 'seconds' ] ) )
+         lines.append( '%s_request_duration_seconds_count{%s} %d' % (
+                       prefix, labels( key ), entry[ 'count' ] ) )
+      for name, field, helpText in (
+            ( 'request_bytes_sent_total', 'bytesSent', 'Bytes of request bodies' ),
+            ( 'request_bytes_received_total', 'bytesReceived',
+              'Bytes of response bodies' ),
+            ( 'request_retries_total', 'retries',
+              'Requests reissuing a failed request' ),
+            ( 'request_cache_hits_total', 'cacheHits',
+              'Requests served from the response cache' ) ):
+         metric( name, 'counter', helpText )
+         for key, entry in entries:
+            lines.append( '%s_%s{%s} %d' % ( prefix, name, labels( key ),
+                                             entry[ field ] ) )
+      for name, field, label, helpText in (
+            ( 'responses_total', 'statusCodes', 'status',
+              'Responses by HTTP status code' ),
+            ( 'request_errors_total', 'errorCodes', 'errorCode',
+              'Requests failed with a CvpError, by error code' ) ):
+         metric( name, 'counter', helpText )
+         for key, entry in entries:
+            for code, count in sorted( entry[ field ].items() ):
+               lines.append( '%s_%s{%s} %d' % ( prefix, name,
+                             labels( key, **{ label : code } ), count ) )
+      return '\n'.join( lines ) + '\n'
+
+   def reset( self ):
+      '''Drops all the statistics'''
+      with self.lock_:
+         self.stats_.clear()
+
+def fileDigest( filePath, algorithm, bufferSize=UPLOAD_BUFFER_SIZE ):
+   '''Returns the hex digest of a file, reading it bufferSize bytes at a time
+   Arguments:
+      filePath -- path of the file ( type : String )
+      algorithm -- hashlib algorithm name, e.g. 'md5' or 'sha512'
+   '''
+   digest = hashlib.new( algorithm )
+   with open( filePath, 'rb' ) as f:
+      for data in iter( lambda: f.read( bufferSize ), '' ):
+         digest.update( data )
+   return digest.hexdigest()
+
+class CvpTransaction( object ):
+   '''CvpTransaction collects the temp actions of the topology changes made
+   through a CvpService while it is open ( container additions, renames and
+   deletions, configlet and image bundle associations, device moves, ... ) and
+   commits them with a single topology save:
+
+      with CvpTransaction( cvpService ) as transaction:
+         cvpService.addContainer( ... )
+         cvpService.applyConfigletToDevice( ... )
+      print transaction.taskIds
+
+   On commit the collected actions are sent batchSize at a time, followed by
+   one saveTopology. If the block raises, or on abort, nothing is saved and the
+   temp actions already sent are deleted. The operations called while the
+   transaction is open return no task ids, the tasks created by the save are in
+   taskIds. The transaction is open on the thread that entered it; calls
+   fanned out from that thread by a FanOutExecutor join it as well. Other
+   threads wait for the transaction to close before changing the topology of
+   the same CvpService, since Cvp keeps the temp actions per session.
+
+   Public methods:
+      add( actions, nodeId )
+      deferSave()
+      flush()
+      commit()
+      abort()
+
+   Instance variables:
+      cvpService -- CvpService whose temp actions are collected
+      batchSize -- temp actions per addTempAction request
+      taskIds -- ids of the tasks created by the save, once committed
+   '''
+   def __init__( self, cvpService, batchSize=TEMP_ACTION_BATCH_SIZE ):
+      self.cvpService = cvpService
+      self.batchSize = batchSize
+      self.taskIds = []
+      self.actions_ = []     # ( nodeId, action ) not sent yet
+      self.changed_ = False  # temp actions were sent or a save was deferred
+      self.lock_ = threading.Lock()
+      self.holdsTopology_ = False  # topologyLock_ of cvpService is held
+
+   def __enter__( self ):
+      if self.cvpService.transaction is not None:
+         raise CvpError( errorCodes.INVALID_ARGUMENT,
+                         'A transaction is already open on %s' %
+                         self.cvpService.url() )
+      self.cvpService.topologyLock_.acquire()
+      self.holdsTopology_ = True
+      openTransactions()[ self.cvpService ] = self
+      return self
+
+   def __exit__( self, excType, excValue, traceback ):
+      if excType is None:
+         self.commit()
+      else:
+         self.abort()
+      return False
+
+   def _close( self ):
+      transactions = openTransactions()
+      if transactions.get( self.cvpService ) is self:
+         del transactions[ self.cvpService ]
+
+   def _release( self ):
+      '''Lets other threads change the topology, once the temp actions of the
+      transaction are saved or deleted'''
+      if self.holdsTopology_:
+         self.holdsTopology_ = False
+         self.cvpService.topologyLock_.release()
+
+   def add( self, actions, nodeId='root' ):
+      '''Collects temp actions, to be sent on flush or commit'''
+      with self.lock_:
+         self.actions_.extend( ( nodeId, action ) for action in actions )
+         self.changed_ = True
+
+   def deferSave( self ):
+      '''Notes a topology save left to the commit'''
+      with self.lock_:
+         self.changed_ = True
+
+   def flush( self ):
+      '''Sends the collected temp actions, so that Cvp can be queried about the
+      resulting topology before the commit'''
+      with self.lock_:
+         actions, self.actions_ = self.actions_, []
+      start = 0
+      while start < len( actions ):
+         # consecutive actions of one node are sent together
+         nodeId = actions[ start ][ 0 ]
+         end = start
+         while ( end < len( actions ) and end - start < self.batchSize and
+                 actions[ end ][ 0 ] == nodeId ):
+            end += 1
+         self.cvpService._postTempAction(
+               { "data" : [ action for _, action in actions[ start : end ] ] },
+               nodeId )
+         start = end
+
+   def commit( self ):
+      '''Sends the collected temp actions and saves the topology once. The temp
+      actions are deleted if any of the requests fails.
+      Returns:
+         taskIds -- ids of the tasks created by the save ( type : List )
+      '''
+      self._close()
+      try:
+         self.flush()
+         if self.changed_:
+            self.taskIds = self.cvpService._saveTopology( [] )[ 'taskIds' ]
+            # containers added or renamed in the transaction exist from now on
+            self.cvpService.invalidateContainerIndex()
+      except:
+         self.cvpService._deleteTempActions()
+         raise
+      finally:
+         self._release()
+      return self.taskIds
+
+   def abort( self ):
+      '''Drops the collected temp actions and deletes those already sent'''
+      self._close()
+      with self.lock_:
+         self.actions_ = []
+      try:
+         if self.changed_:
+            # the index may hold renames and deletions that are not saved
+            self.cvpService.invalidateContainerIndex()
+            self.cvpService._deleteTempActions()
+      finally:
+         self._release()
+
+class _ResponseReader( object ):
+   '''File-like view of a streamed response body for ijson. It keeps the first
+   STREAM_HEAD_SIZE bytes, which hold the whole of an error response, and
+   counts the bytes read.'''
+   def __init__( self, raw ):
+      self.raw = raw
+      self.head = ''
+      self.size = 0
+
+   def read( self, size=-1 ):
+      data = self.raw.read( size if size >= 0 else None )
+      self.size += len( data )
+      if len( self.head ) < STREAM_HEAD_SIZE:
+         self.head += data[ : STREAM_HEAD_SIZE - len( self.head ) ]
+      return data
+
 class CvpService( object ):
    '''CvpService class is responsible for hitting endpoints of the Cvp web-server
    for retrieving, updating, adding and deleting state of Cvp
@@ -124,6 +1079,7 @@ class CvpService( object ):
       removeConfigFromContainer( containerName, containerKey, configNameList,
          configKeyList )
       addContainer( containerName, containerParentName, parentContainerId )
+      addContainers( containerList, batchSize )
       applyImageBundleToDevice( deviceKey, deviceFqdn, imageBundleName,
          imageBundleKey )
       applyImageBundleToContainer( containerName, containerKey,imageBundleName,
@@ -135,6 +1091,8 @@ class CvpService( object ):
       generateFormConfiglet( deviceKeyList, configletBuilderKey,
                      configletBuilderName, containerKey, formValues, pageType )
       deployDevice( self, device, targetContainer, info, configletList, image )
+      deployDevices( deploymentList, containerKey, containerName, batchSize,
+                     executor )
       cvpVersionInfo()
       getRoles()
       addRole( roleName, roleModuleList )
@@ -164,6 +1122,18 @@ class CvpService( object ):
                              imageRollbackInfo )
       addNetworkRollbackTempActions( containerId, rollbackTime, rollbackType )
       addNetworkRollbackChangeControl()
+      connectionStats()
+      close()
+      containerIndex( refresh )
+      invalidateContainerIndex()
+      containerName( containerKey )
+      containerKey( containerName, download )
+      invalidateCache( groups )
+      addInstrument( instrument )
+      removeInstrument( instrument )
+      getConfigletsCount()
+      configletCatalog( refresh )
+      lookupConfiglet( configletName )
 
    Instance variables:
       port -- Port where Http/Https request made to web server
@@ -172,9 +1142,22 @@ class CvpService( object ):
       hostname -- name of the host
       cookies -- cookies of the session establised
       tmpDir -- temporary directory enclosing file operations
+      session -- pooled keep-alive HTTP session used for all the requests
+      containerIndex_ -- cached ContainerIndex, None until first needed
+      configletCatalog_ -- cached ConfigletCatalog, None until first needed
+      cache -- ResponseCache of read-only requests, None when disabled
+      instruments -- objects whose record( sample ) method is called after
+                     every request, e.g. RequestStats
+      transaction -- CvpTransaction open on the calling thread and collecting
+                     the temp actions, or None
+      topologyLock_ -- held while temp actions are sent and saved, by a method
+                       or by an open transaction
    '''
 
-   def __init__( self, host, ssl, port, tmpDir='' ):
+   def __init__( self, host, ssl, port, tmpDir='',
+                 poolConnections=DEFAULT_POOL_CONNECTIONS,
+                 poolMaxSize=DEFAULT_POOL_MAXSIZE, poolBlock=False,
+                 keepAlive=True, cacheSize=0, cacheTtls=None, instruments=None ):
       self.host = host
       self.ssl = ssl
       self.port = port
@@ -183,10 +1166,94 @@ class CvpService( object ):
       self.url_ = self.url()
       self.headers = { 'Accept' : 'application/json',
                        'Content-Type' : 'application/json' }
+      self.session = self._newSession( poolConnections, poolMaxSize, poolBlock,
+                                       keepAlive )
+      self.containerIndex_ = None
+      self.configletCatalog_ = None
+      # responses are only cached when asked for, with cacheSize > 0
+      self.cache = ResponseCache( cacheSize, cacheTtls ) if cacheSize else None
+      self.instruments = list( instruments or [] )
+      self.topologyLock_ = threading.RLock()
+
+   @property
+   def transaction( self ):
+      '''CvpTransaction open on the calling thread, or None'''
+      return openTransactions().get( self )
+
+   def _newSession( self, poolConnections, poolMaxSize, poolBlock, keepAlive ):
+      '''Creates the HTTP session shared by all requests of this instance
+      Arguments:
+         poolConnections -- number of per-host connection pools to cache
+         poolMaxSize -- maximum number of connections kept alive per host
+         poolBlock -- if True, never open more than poolMaxSize connections
+                      to a host; requests wait for a free connection instead
+         keepAlive -- if False, connections are closed after every request
+      Returns:
+         session -- pooled HTTP session ( type : requests.Session )
+      '''
+      session = requests.Session()
+      adapter = requests.adapters.HTTPAdapter( pool_connections=poolConnections,
+                                               pool_maxsize=poolMaxSize,
+                                               pool_block=poolBlock )
+      session.mount( 'http://', adapter )
+      session.mount( 'https://', adapter )
+      # The session cookies are owned by self.cookies and passed explicitly with
+      # every request. Keep the session's own jar empty so that it holds no
+      # shared state between threads and never resends a stale session_id.
+      session.cookies.set_policy( cookielib.DefaultCookiePolicy(
+                                                         allowed_domains=[] ) )
+      if not keepAlive:
+         session.headers[ 'Connection' ] = 'close'
+      return session
+
+   def _sessionMethod( self, method ):
+      '''Maps a requests module function ( requests.get, requests.post, ... )
+      onto the corresponding method of the pooled session'''
+      return getattr( self.session, method.__name__, method )
+
+   def connectionStats( self ):
+      '''Reports how many requests were served over a new connection and how
+      many reused an already established one. Counters are summed over the
+      connection pools currently held by the session.
+      Returns:
+         stats -- counters keyed by 'requests', 'newConnections' and
+                  'reusedConnections' ( type : Dict )
+      '''
+      requestCount = 0
+      newConnections = 0
+      for adapter in set( self.session.adapters.values() ):
+         pools = adapter.poolmanager.pools
+         for poolKey in pools.keys():
+            pool = pools.get( poolKey )
+            if pool is None:
+               continue
+            requestCount += pool.num_requests
+            newConnections += pool.num_connections
+      return { 'requests' : requestCount,
+               'newConnections' : newConnections,
+               'reusedConnections' : max( requestCount - newConnections, 0 ) }
+
+   def close( self ):
+      '''Closes all the pooled connections'''
+      self.session.close()
+
+   def invalidateCache( self, groups=None ):
+      '''Drops cached responses of the given CACHE_TTLS groups, or all of them'''
+      if self.cache:
+         self.cache.invalidate( groups )
+
+   def addInstrument( self, instrument ):
+      '''Starts reporting every request to instrument.record( sample )'''
+      self.instruments.append( instrument )
+
+   def removeInstrument( self, instrument ):
+      '''Stops reporting requests to instrument'''
+      self.instruments.remove( instrument )
 
    def hostIs( self, host ):
       self.host = host
       self.url_ = self.url()
+      self.invalidateCache()
 
    def url( self ):
       self.url_ = '%s://%s:%d' % ( 'https' if self.ssl else 'http',
@@ -206,22 +1273,173 @@ class CvpService( object ):
          CvpError -- If response is not json or response contains error code
                      If parameter data structures are incorrect
       '''
+      if not self.instruments:
+         return self._doRequest( method, url, None, *args, **kwargs )
+      sample = self._newSample( method, url, kwargs )
+      try:
+         return self._doRequest( method, url, sample, *args, **kwargs )
+      except CvpError as e:
+         sample[ 'errorCode' ] = e.errorCode
+         raise
+      finally:
+         self._recordSample( sample )
+
+   def _newSample( self, method, url, kwargs, retry=False ):
+      '''Starts describing a request for the instruments; retry tells that the
+      request reissues one that failed'''
+      body = kwargs.get( 'data' )
+      sample = { 'caller' : requestCaller(),
+                 'method' : method.__name__.upper(),
+                 'endpoint' : urlparse.urlparse( url ).path,
+                 'seconds' : time.time(),
+                 'bytesSent' : len( body ) if body is not None else 0,
+                 'bytesReceived' : 0,
+                 'status' : None,
+                 'errorCode' : None,
+                 'retry' : retry,
+                 'cached' : False }
+      return sample
+
+   def _recordSample( self, sample ):
+      '''Reports a finished request to the instruments'''
+      sample[ 'seconds' ] = time.time() - sample[ 'seconds' ]
+      for instrument in list( self.instruments ):
+         instrument.record( sample )
+
+   def _doRequest( self, method, url, sample, *args, **kwargs ):
+      '''Issues an Http request for doRequest, filling in the status, size and
+      caching of the response in sample unless it is None'''
       if not 'cookies' in kwargs:
          kwargs[ 'cookies' ] = self.cookies
       kwargs[ 'verify' ] = False
+      isGet = method.__name__ == 'get'
+      if self.cache and isGet:
+         cached = self.cache.lookup( url )
+         if cached is not None:
+            if sample is not None:
+               sample[ 'cached' ] = True
+            return jsonCodec.loads( cached )
       if trace:
          print url
-      response = method( url, *args, **kwargs )
+      try:
+         response = self._sessionMethod( method )( url, *args, **kwargs )
+      finally:
+         if self.cache and not isGet:
+            self.cache.invalidateFor( url )
+      if sample is not None:
+         sample[ 'status' ] = response.status_code
+         sample[ 'bytesReceived' ] = len( response.content )
       response.raise_for_status()
-      responseJson = response.json()
+      responseJson = jsonCodec.loads( response.content )
       if 'errorCode' in responseJson:
          if trace:
             print responseJson
          errorCode = responseJson.get( 'errorCode', 0 )
          errorMessage = responseJson.get( 'errorMessage', '' )
          raise CvpError( errorCode, errorMessage, response=responseJson )
+      if self.cache and isGet:
+         self.cache.store( url, response.content )
       return responseJson
 
+   def iterItems( self, url, itemPrefix='data.item' ):
+      '''Issues a GET request and yields the items of a list in its response.
+      With the C parser of ijson installed the items are parsed while the
+      response is received, so the whole document is never held in memory;
+      otherwise, or when the endpoint is cached, the response is decoded with
+      doRequest.
+      The request is only sent once iteration starts, and the duration reported
+      to the instruments includes the time spent by the caller between items.
+      Arguments:
+         url -- endpoint of the request
+         itemPrefix -- location of the items, in ijson notation: 'item' for a
+                       top level list, 'data.item' for the list under 'data'
+      Raises:
+         CvpError -- If response is not json or response contains error code
+      '''
+      if ijsonBackend is None or ( self.cache and
+                                   CACHE_GROUPS.get( urlparse.urlparse( url ).path ) ):
+         items = self.doRequest( requests.get, url )
+         for key in itemPrefix.split( '.' )[ : -1 ]:
+            items = items[ key ]
+         for item in items:
+            yield item
+         return
+      sample = self._newSample( requests.get, url, {} ) if self.instruments \
+               else None
+      if trace:
+         print url
+      try:
+         response = self._sessionMethod( requests.get )( url, cookies=self.cookies,
+                                                        verify=False, stream=True )
+         try:
+            if sample is not None:
+               sample[ 'status' ] = response.status_code
+            response.raise_for_status()
+            response.raw.decode_content = True
+            reader = _ResponseReader( response.raw )
+            found = False
+            for item in ijsonBackend.items( reader, itemPrefix ):
+               found = True
+               yield item
+            if sample is not None:
+               sample[ 'bytesReceived' ] = reader.size
+            if not found and reader.size <= len( reader.head ):
+               # error responses carry no items and are small enough to be
+               # kept whole in the head of the reader
+               responseJson = jsonCodec.loads( reader.head )
+               if isinstance( responseJson, dict ) and 'errorCode' in responseJson:
+                  raise CvpError( responseJson.get( 'errorCode', 0 ),
+                                  responseJson.get( 'errorMessage', '' ),
+                                  response=responseJson )
+         finally:
+            response.close()
+      except CvpError as e:
+         if sample is not None:
+            sample[ 'errorCode' ] = e.errorCode
+         raise
+      except ijson.common.JSONError as e:
+         raise CvpError( errorCodes.UNKNOWN_ERROR_CODE, str( e ) )
+      finally:
+         if sample is not None:
+            self._recordSample( sample )
+
+   def _pageUrl( self, url, startIndex, endIndex ):
+      return '%s%sstartIndex=%d&endIndex=%d' % ( url, '&' if '?' in url else '?',
+                                                startIndex, endIndex )
+
+   def _iterPages( self, url, pageSize, itemsKey='data' ):
+      '''Yields the responses of a list endpoint, requesting pageSize items at
+      a time, or the single response listing all the items if pageSize is 0.
+      Items added or removed while paging may be missed or seen twice.
+      Arguments:
+         url -- endpoint of the request, without startIndex and endIndex
+         pageSize -- number of items per request ( type : Int )
+         itemsKey -- key of the list of items in a response
+      Raises:
+         CvpError -- If response is not json or response contains error code
+      '''
+      assert pageSize >= 0
+      startIndex = 0
+      while True:
+         page = self.doRequest( requests.get, self._pageUrl( url, startIndex,
+                                        startIndex + pageSize if pageSize else 0 ) )
+         yield page
+         count = len( page[ itemsKey ] )
+         total = page.get( 'total' )
+         if ( not pageSize or count < pageSize or
+              ( total is not None and startIndex + count >= total ) ):
+            return
+         startIndex += count
+
+   def _iterPagedItems( self, url, pageSize, itemsKey='data' ):
+      '''Yields the items of a list endpoint, requesting pageSize items at a
+      time. If pageSize is 0 all the items are requested at once and parsed
+      while received, see iterItems.'''
+      if not pageSize:
+         return self.iterItems( self._pageUrl( url, 0, 0 ), '%s.item' % itemsKey )
+      return ( item for page in self._iterPages( url, pageSize, itemsKey )
+               for item in page[ itemsKey ] )
+
    def _authenticationRequest( self, method, url, *args, **kwargs ):
       '''Issues an Http request for authentication
       Arguments:
@@ -237,12 +1455,12 @@ class CvpService( object ):
                      If parameter data structures are incorrect
       '''
       kwargs[ 'verify' ] = False
-      response = method( url, *args, **kwargs )
+      response = self._sessionMethod( method )( url, *args, **kwargs )
       response.raise_for_status()
-      responseJson = response.json()
-      if 'errorCode' in response.text:
+      responseJson = jsonCodec.loads( response.content )
+      if 'errorCode' in responseJson:
          errorCode = responseJson.get( 'errorCode', 0 )
-         errorMessage = response.json().get( 'errorMessage', '' )
+         errorMessage = responseJson.get( 'errorMessage', '' )
          raise CvpError( errorCode, errorMessage, response=responseJson )
       return response
 
@@ -257,6 +1475,18 @@ class CvpService( object ):
                         % ( self.url_, 0, 0 ) )
       return configlets[ 'data' ]
 
+   def iterConfigletsInfo( self, pageSize=DEFAULT_PAGE_SIZE ):
+      '''Yields the information of every configlet, requesting pageSize
+      configlets at a time
+      Arguments:
+         pageSize -- configlets per request, 0 for a single streamed request
+      Returns:
+         configlets -- iterator of configlets with details
+                       ( type : Iterator of Dict )
+      '''
+      return self._iterPagedItems( '%s/web/configlet/getConfiglets.do' % self.url_,
+                                   pageSize )
+
    def getConfigletBuilder( self, configletBuilderKey ):
       ''' Retrieves information about a particular Configlet Builder
       Arguments:
@@ -284,7 +1514,7 @@ class CvpService( object ):
       validateResponse = self.doRequest( requests.post,
                            '%s/web/provisioning/v2/validateAndCompareConfiglets.do'
                            % self.url_,
-                           data=json.dumps( requestPayload ) )
+                           data=jsonCodec.dumps( requestPayload ) )
       return validateResponse
 
    def reconcileContainer( self, containerId ):
@@ -329,7 +1559,7 @@ class CvpService( object ):
              }
       result = self.doRequest( requests.post,
                  '%s/web/ztp/checkCompliance.do'
-                 % self.url_, data=json.dumps( data ) )
+                 % self.url_, data=jsonCodec.dumps( data ) )
       return result
 
    def authenticate( self, username, password ):
@@ -341,9 +1571,10 @@ class CvpService( object ):
          CvpError -- If username and password combination is invalid
                      If parameter data structures are incorrect
       '''
+      self.invalidateCache()
       authData = { 'userId' : username, 'password' : password }
       authentication =  self._authenticationRequest( requests.post,
-            '%s/web/login/authenticate.do' % self.url_, data=json.dumps( authData ),
+            '%s/web/login/authenticate.do' % self.url_, data=jsonCodec.dumps( authData ),
             headers=self.headers )
       self.cookies[ 'session_id' ] = authentication.cookies[ 'session_id' ]
       # 'role' cookie is mandatory for older releases of CVP i.e. 2015.*
@@ -376,6 +1607,7 @@ class CvpService( object ):
                              % ( self.url_, name, 0, 0 ) )
       return containers[ 'data' ]
 
+   @_topologyChange
    def changeContainerName( self, oldName, newName, containerKey ):
       '''Changes the container name from old container name to
       the new name
@@ -402,10 +1634,11 @@ class CvpService( object ):
                         "toIdType" : "container",
                         "oldNodeName" : oldName
                       } ] }
-      self.doRequest( requests.post,
-                '%s/web/ztp/addTempAction.do?format=topology&queryParam=&nodeId=%s' %
-                ( self.url_, containerKey ), data=json.dumps( data ) )
-      return self._saveTopology( [] )[ 'taskIds' ]
+      self._addTempAction( data, containerKey )
+      taskIds = self._saveTopology( [] )[ 'taskIds' ]
+      if self.containerIndex_ is not None:
+         self.containerIndex_.rename( containerKey, newName )
+      return taskIds
 
    def searchContainer( self, containerName ):
       '''Retrieves information about a container
@@ -422,6 +1655,134 @@ class CvpService( object ):
                                    (self.url_, quote(containerName)) )
       return containers
 
+   def containerIndex( self, refresh=False ):
+      '''Returns the container index, downloading the container hierarchy the
+      first time, after invalidation or when refresh is True
+      Returns:
+         containerIndex -- index of all containers ( type : ContainerIndex )
+      '''
+      if refresh or self.containerIndex_ is None:
+         self.containerIndex_ = ContainerIndex( self.filterTopology() )
+      return self.containerIndex_
+
+   def invalidateContainerIndex( self ):
+      '''Drops the container index; it is rebuilt on next use'''
+      self.containerIndex_ = None
+
+   def containerName( self, containerKey ):
+      '''Resolves the name of a container from the container index. Containers
+      unknown to the index are looked up with getContainerInfoByKey and added.
+      Arguments:
+         containerKey -- unique key of the container ( type : String )
+      Returns:
+         containerName -- name of the container ( type : String )
+      '''
+      index = self.containerIndex()
+      containerName = index.name( containerKey )
+      if containerName is None:
+         containerInfo = self.getContainerInfoByKey( containerKey )
+         containerName = containerInfo[ 'name' ]
+         index.add( containerKey, containerName, None )
+      return containerName
+
+   def containerKey( self, containerName, download=True ):
+      '''Resolves the key of a container from the container index, case
+      insensitively. Containers unknown to the index, e.g. added since it was
+      downloaded, are looked up by name with searchContainer and added.
+      Arguments:
+         containerName -- name of the container ( type : String )
+         download -- download the index if it is not there yet, otherwise the
+                     container is looked up with searchContainer
+                     ( type : Boolean )
+      Returns:
+         containerKey -- unique key of the container, None if there is no such
+                         container ( type : String )
+      '''
+      index = self.containerIndex() if download else self.containerIndex_
+      containerKey = index.key( containerName ) if index else None
+      if containerKey is None:
+         for containerInfo in self.searchContainer( containerName ):
+            if containerInfo[ 'Name' ].lower() == containerName.lower():
+               containerKey = containerInfo[ 'Key' ]
+               if index:
+                  index.add( containerKey, containerInfo[ 'Name' ], None )
+               break
+      return containerKey
+
+   def getConfigletsCount( self ):
+      '''Retrieves the number of configlets, without their details
+      Returns:
+         total -- number of configlets in Cvp ( type : Int )
+      '''
+      configlets = self.doRequest( requests.get,
+                        '%s/web/configlet/getConfiglets.do?startIndex=%d&endIndex=%d'
+                        % ( self.url_, 0, 1 ) )
+      return configlets[ 'total' ]
+
+   def configletCatalog( self, refresh=False ):
+      '''Returns the configlet catalog, downloading the configlet list the first
+      time or when refresh is True. Every CONFIGLET_CATALOG_CHECK_INTERVAL
+      seconds the catalog is checked against the configlet count in Cvp and
+      reloaded if they differ.
+      Returns:
+         configletCatalog -- catalog of all configlets ( type : ConfigletCatalog )
+      '''
+      catalog = self.configletCatalog_
+      if not refresh and catalog is not None:
+         now = time.time()
+         if now - catalog.checked < CONFIGLET_CATALOG_CHECK_INTERVAL:
+            return catalog
+         catalog.checked = now
+         refresh = self.getConfigletsCount() != catalog.total
+      if refresh or catalog is None:
+         catalog = ConfigletCatalog( self.getConfigletsInfo() )
+         self.configletCatalog_ = catalog
+      return catalog
+
+   def lookupConfiglet( self, configletName ):
+      '''Resolves a configlet from the configlet catalog. Configlets unknown to
+      the catalog are looked up with getConfigletByName and added.
+      Arguments:
+         configletName -- name of the configlet, in any case ( type : String )
+      Returns:
+         configletInfo -- { 'name', 'key', 'type' } of the configlet, None if
+                          there is no such configlet ( type : Dict )
+      '''
+      catalog = self.configletCatalog()
+      configletInfo = catalog.lookup( configletName )
+      if configletInfo is None:
+         try:
+            configletInfo = self.getConfigletByName( configletName )
+         except CvpError:
+            return None
+         if not configletInfo.get( 'key' ):
+            return None
+         catalog.add( configletInfo[ 'name' ], configletInfo[ 'key' ],
+                      configletInfo.get( 'type' ) )
+         configletInfo = catalog.lookup( configletName )
+      return configletInfo
+
+   def _configletAdded( self, configletName, configletKey=None,
+                        configletType=None ):
+      '''Accounts for a configlet added through this instance in the catalog'''
+      catalog = self.configletCatalog_
+      if catalog is None:
+         return
+      catalog.total += 1
+      if configletKey:
+         catalog.add( configletName, configletKey, configletType )
+
+   def _configletDeleted( self, configletName=None, configletKey=None ):
+      '''Accounts for a configlet deleted through this instance in the catalog'''
+      catalog = self.configletCatalog_
+      if catalog is None:
+         return
+      catalog.total -= 1
+      if configletName:
+         catalog.remove( configletName )
+      if configletKey:
+         catalog.removeKey( configletKey )
+
    def getDevicesInContainer( self, containerId, containerName ):
       '''Retrieves the set of devices under the container
       Arguments:
@@ -491,13 +1852,22 @@ class CvpService( object ):
                              % ( self.url_, name, 0, 0 ) )
       return devices[ 'data' ]
 
-   def addImage( self, imageName, strDirPath='' ):
-      '''Add image to Cvp instance
+   def addImage( self, imageName, strDirPath='', progress=None,
+                 imagesInfo=None ):
+      '''Add image to Cvp instance. The image is streamed from disk, and not
+      uploaded at all if Cvp already has an image with the same name and
+      checksum.
       Warning -- image file with imageName as file should exist
       Argument:
          imageName -- name of the image ( type : String )
+         strDirPath -- directory of the image file ( type : String )
+         progress -- called as progress( imageName, bytesSent, totalBytes )
+                     while the image is uploaded ( optional )
+         imagesInfo -- result of getImagesInfo(), fetched if not given
       Raises:
-         CvpError -- If image already exists in Cvp instance
+         CvpError -- If a different image with the same name already exists in
+                     Cvp instance, or if the uploaded image checksum does not
+                     match the file
       Returns:
          imageInfo -- information of image added to the cvp instance
       '''
@@ -511,11 +1881,34 @@ class CvpService( object ):
          filePath = imageName
       else:
          raise CvpError( errorCodes.INVALID_IMAGE_ADDITION )
-      with open( filePath, 'r' ) as f:
+      if imagesInfo is None:
+         imagesInfo = self.getImagesInfo()
+      for imageInfo in imagesInfo:
+         if imageInfo[ 'name' ] == os.path.basename( imageName ):
+            if self._sameImage( imageInfo, filePath ):
+               return imageInfo
+            raise CvpError( errorCodes.IMAGE_ALREADY_EXISTS )
+      stream = MultipartFileStream( 'file', filePath, progress=progress )
+      try:
          imageInfo = self.doRequest( requests.post,
-                   '%s/web/image/addImage.do' % self.url_, files={ 'file' : f } )
+                   '%s/web/image/addImage.do' % self.url_, data=stream,
+                   headers={ 'Content-Type' : stream.contentType } )
+      finally:
+         stream.close()
+      if imageInfo.get( 'md5' ) and imageInfo[ 'md5' ] != stream.md5.hexdigest():
+         raise CvpError( errorCodes.IMAGE_CHECKSUM_MISMATCH, response=imageInfo )
+      imageInfo[ 'sha512' ] = stream.sha512.hexdigest()
       return imageInfo
 
+   def _sameImage( self, imageInfo, filePath ):
+      '''Checks whether an image in Cvp holds the content of a local file, by
+      the strongest checksum Cvp reports, or by size if it reports none'''
+      for algorithm in ( 'sha512', 'md5' ):
+         if imageInfo.get( algorithm ):
+            return imageInfo[ algorithm ] == fileDigest( filePath, algorithm )
+      return str( imageInfo.get( 'imageSize' ) ) == str(
+                                                   os.path.getsize( filePath ) )
+
    def addTheme( self, themeFilename, themeType, strDirPath='' ):
       '''Add a theme to Cvp instance
       Warning -- theme file with theme name as file should exist
@@ -550,14 +1943,15 @@ class CvpService( object ):
       '''
       data = { themeType : key }
       self.doRequest( requests.post, '%s/web/cvpTheme/applyCvpthemes.do'
-                        % self.url_, data=json.dumps( data ) )
+                        % self.url_, data=jsonCodec.dumps( data ) )
 
-   def getThemes( self, storagePath='' ):
+   def getThemes( self, storagePath='', activeOnly=False ):
       '''
       Download all themes
       Arguments:
          themeTypes -- list of types ( backgroundImage, logo )
          storagePath -- path to store the theme files
+         activeOnly -- only save the active theme of each type
       Returns:
          List of theme names by type with first theme name being active theme
          ( type :  map of themeTypes => list of theme names )
@@ -565,10 +1959,11 @@ class CvpService( object ):
       themeTypes = [ 'logo', 'backgroundImage' ]
       themeFilenames = {} # map type => filenames
       for themeType in themeTypes:
-         themeFilenames[ themeType ] = self.getThemesByType( themeType, storagePath )
+         themeFilenames[ themeType ] = self.getThemesByType( themeType, storagePath,
+                                                             activeOnly )
       return themeFilenames
 
-   def getThemesByType( self, themeType, storagePath ):
+   def getThemesByType( self, themeType, storagePath, activeOnly=False ):
       '''
       Download all themes of specific theme type and get a list of
       the files. The first file is the active theme file.
@@ -576,54 +1971,172 @@ class CvpService( object ):
          theme_<type>_<startingIndex>.png
          theme_<type>_<startingIndex + 1>.png
          ...
+      The themes are parsed one at a time while the response is received, see
+      iterItems. Files whose content has not changed since the previous sync
+      into storagePath, as recorded in its THEME_MANIFEST, are not rewritten,
+      and the manifest entries of themes no longer in Cvp are dropped.
+      If activeOnly is set, only the active theme is saved and listed; the
+      other themes are still received but not decoded.
       '''
       url = '%s/web/cvpTheme/getAllCvpThemes.do?type=%s&startIndex=0&endIndex=0' % \
             ( self.url_, themeType )
-      themesInfo = self.doRequest( requests.get, url )[
-                   'data' ][ themeType ][ 'data' ]
+      manifestPath = os.path.join( storagePath, THEME_MANIFEST )
+      manifest = {}
+      if os.path.isfile( manifestPath ):
+         with open( manifestPath ) as f:
+            manifest = json.load( f )
       themeFilenames = []
+      filenames = set()
       index = 0
-      for themeInfo in themesInfo:
+      for themeInfo in self.iterItems( url, 'data.%s.data.item' % themeType ):
          filepath = os.path.join( storagePath, 'theme_%s_%d.png' % (
             themeType, index ) )
-         with open( filepath, 'wb' ) as f:
-            f.write( themeInfo[ 'data' ].decode( 'base64' ) )
          filename = os.path.basename( filepath )
+         filenames.add( filename )
+         index += 1
+         if activeOnly and not themeInfo[ 'isActive' ]:
+            continue
+         encoded = themeInfo[ 'data' ]
+         checksum = hashlib.sha1( encoded ).hexdigest()
+         synced = manifest.get( filename )
+         if not ( synced and synced[ 'sha1' ] == checksum and
+                  os.path.isfile( filepath ) and
+                  os.path.getsize( filepath ) == synced[ 'size' ] ):
+            manifest[ filename ] = { 'sha1' : checksum,
+                                     'size' : self._writeBase64( encoded,
+                                                                 filepath ) }
          if themeInfo[ 'isActive' ]:
             themeFilenames.append( filename )
          else:
             themeFilenames = [ filename ] + themeFilenames
-         index += 1
+      # the manifest is shared by the theme types
+      prefix = 'theme_%s_' % themeType
+      for filename in manifest.keys():
+         if filename.startswith( prefix ) and filename not in filenames:
+            del manifest[ filename ]
+      with open( manifestPath, 'w' ) as f:
+         json.dump( manifest, f )
       return themeFilenames
 
-   def downloadImage( self, imageName, imageId, filePath='' ):
+   def _writeBase64( self, encoded, filepath ):
+      '''Decodes base64 text to a file a chunk at a time
+      Returns:
+         size -- number of bytes written ( type : Int )
+      '''
+      if '\n' in encoded or '\r' in encoded:
+         encoded = ''.join( encoded.split() )
+      size = 0
+      with open( filepath, 'wb' ) as f:
+         for start in xrange( 0, len( encoded ), BASE64_CHUNK_SIZE ):
+            data = binascii.a2b_base64(
+                      str( encoded[ start : start + BASE64_CHUNK_SIZE ] ) )
+            f.write( data )
+            size += len( data )
+      return size
+
+   def downloadImage( self, imageName, imageId, filePath='', md5=None,
+                      limiter=None, progress=None ):
       '''Download the image file from Cvp Instance and stores at corresponding
-      file path or current directory
+      file path or current directory. The image is written to a '.part' file
+      that is renamed once complete. When md5 is given, a '.part' file left by
+      an interrupted download is resumed with an HTTP Range request; without a
+      checksum to verify it against, the download starts over.
       Arguments:
          imageName -- name of image (type : string )
          imageId -- unique Id assigned to the image ( type : string )
          filePath -- storage path in the local system (optional)( type : string )
+         md5 -- expected MD5 of the image; an existing file with this checksum
+                is not downloaded again ( optional )( type : string )
+         limiter -- BandwidthLimiter shared with other downloads ( optional )
+         progress -- called as progress( imageName, bytesReceived, totalBytes )
+                     ( optional )
+      Raises:
+         CvpError -- If the download fails, or if the size or MD5 of the
+                     downloaded file is wrong
       '''
       fileName = os.path.join( filePath, imageName )
+      if md5 and os.path.isfile( fileName ) and fileDigest( fileName,
+                                                            'md5' ) == md5:
+         return
+      partName = fileName + '.part'
+      received = os.path.getsize( partName ) if md5 and os.path.isfile(
+                                                         partName ) else 0
 
       # Note that we're not calling doRequest() here since it will return the
       # swi file as a json encoded string which caches the file in memory and
       # bloats it. Instead we're streaming the binary file to disk which keeps
       # things sane.
+      url = '%s/web/services/image/getImagebyId/%s' % ( self.url_, imageId )
       kwargs = {}
       kwargs[ 'cookies' ] = self.cookies
       kwargs[ 'verify' ] = False
-      resp = requests.get( '%s/web/services/image/getImagebyId/%s' %
-                                              ( self.url_, imageId ),
-                                              stream=True, **kwargs )
-      if resp.status_code == 200:
-         with open( fileName, 'wb' ) as f:
-            for chunk in resp:
+      retry = False
+      while True:
+         kwargs[ 'headers' ] = { 'Range' : 'bytes=%d-' % received } if received \
+                               else {}
+         sample = self._newSample( requests.get, url, {}, retry ) \
+                  if self.instruments else None
+         resp = self.session.get( url, stream=True, **kwargs )
+         if sample is not None:
+            sample[ 'status' ] = resp.status_code
+         if resp.status_code != 416 or not received:
+            break
+         # the partial file is not a prefix of the image, start over once
+         resp.close()
+         if sample is not None:
+            self._recordSample( sample )
+         os.remove( partName )
+         received = 0
+         retry = True
+      streamed = 0
+      # A streamed response holds on to its pooled connection until it is
+      # closed, so always hand it back
+      try:
+         if resp.status_code not in ( 200, 206 ):
+            raise CvpError( errorCodes.FILE_DOWNLOAD_ERROR,
+                              'Error %d downloading %s to %s' %
+                                ( resp.status_code, imageName, fileName ) )
+         digest = hashlib.md5()
+         if resp.status_code == 206:
+            # the server honoured the range, append to the partial file
+            with open( partName, 'rb' ) as f:
+               for data in iter( lambda: f.read( DOWNLOAD_CHUNK_SIZE ), '' ):
+                  digest.update( data )
+            mode = 'ab'
+            total = int( resp.headers.get( 'Content-Range',
+                                           '*/-1' ).rsplit( '/', 1 )[ -1 ] )
+         else:
+            received = 0
+            mode = 'wb'
+            total = int( resp.headers.get( 'Content-Length', -1 ) )
+         with open( partName, mode ) as f:
+            for chunk in resp.iter_content( DOWNLOAD_CHUNK_SIZE ):
                f.write( chunk )
-      else:
+               digest.update( chunk )
+               received += len( chunk )
+               streamed += len( chunk )
+               if limiter:
+                  limiter.consume( len( chunk ) )
+               if progress:
+                  progress( imageName, received, total )
+      finally:
+         resp.close()
+         if sample is not None:
+            sample[ 'bytesReceived' ] = streamed
+            self._recordSample( sample )
+      if total >= 0 and received != total:
+         # keep the partial file, the next attempt resumes from it
          raise CvpError( errorCodes.FILE_DOWNLOAD_ERROR,
-                           'Error %d downloading %s to %s' %
-                             ( resp.status_code, imageName, fileName ) )
+                         'Downloaded %d of %d bytes of %s' %
+                         ( received, total, imageName ) )
+      if md5 and digest.hexdigest() != md5:
+         os.remove( partName )
+         raise CvpError( errorCodes.IMAGE_CHECKSUM_MISMATCH,
+                         'MD5 of downloaded image %s is %s, expected %s' %
+                         ( imageName, digest.hexdigest(), md5 ) )
+      if os.name == 'nt' and os.path.exists( fileName ):
+         os.remove( fileName )
+      os.rename( partName, fileName )
 
    def firstLoginDefaultPasswordReset( self,  newPassword, emailId ):
       '''Reset the password for the first login into the Cvp Web-UI
@@ -640,7 +2153,7 @@ class CvpService( object ):
                "email" : emailId
              }
       self.doRequest( requests.post, '%s/web/login/changePassword.do'
-                        % self.url_, data=json.dumps( data ) )
+                        % self.url_, data=jsonCodec.dumps( data ) )
 
    def getInventory( self, populateParentContainerKeyMap=True, provisioned=True ):
       '''Retrieve information about devices provisioned by the Cvp instance
@@ -662,10 +2175,22 @@ class CvpService( object ):
          containerKey = device["parentContainerKey"]
          if containerKey == "":
             continue
-         containerName = self.getContainerInfoByKey( containerKey )['name']
+         containerName = self.containerName( containerKey )
          parentContainerKeyMap[device["systemMacAddress"]] = containerName
       return ( devices, parentContainerKeyMap )
 
+   def iterInventory( self, provisioned=True ):
+      '''Yields the information of every device while it is received, see
+      iterItems
+      Arguments:
+         provisioned -- False would get all onboarded devices, True would get
+                        only the provisioned ones
+      Returns:
+         devices -- iterator of information of devices ( type : Iterator of Dict )
+      '''
+      return self.iterItems( '%s/cvpservice/inventory/devices?provisioned=%s'
+                             % ( self.url_, provisioned ), itemPrefix='item' )
+
    def configletAppliedContainers( self, configletName ):
       '''Retrieves containers to which the configlet is applied to.
       Warning -- Method deosn't check existence of the configlet
@@ -721,6 +2246,17 @@ class CvpService( object ):
                     % ( self.url_, 0, 0 ) )
       return images[ 'data' ]
 
+   def iterImagesInfo( self, pageSize=DEFAULT_PAGE_SIZE ):
+      '''Yields information about the images, requesting pageSize images at a
+      time
+      Arguments:
+         pageSize -- images per request, 0 for a single streamed request
+      Returns:
+         images -- iterator of details of images ( type : Iterator of Dict )
+      '''
+      return self._iterPagedItems( '%s/web/image/getImages.do?queryparam='
+                                   % self.url_, pageSize )
+
    def addConfiglet( self, configletName, configletContent ):
       '''Add configlet to Cvp inventory
       Arguments:
@@ -733,9 +2269,14 @@ class CvpService( object ):
       configlet = { 'config' : configletContent,
                     'name' : configletName
                   }
-      self.doRequest( requests.post,
+      response = self.doRequest( requests.post,
                         '%s/web/configlet/addConfiglet.do' % self.url_,
-                        data=json.dumps( configlet ) )
+                        data=jsonCodec.dumps( configlet ) )
+      configletInfo = response.get( 'data' )
+      if isinstance( configletInfo, dict ) and configletInfo.get( 'key' ):
+         self._configletAdded( configletName, configletInfo[ 'key' ], 'Static' )
+      else:
+         self._configletAdded( configletName )
 
    def addGeneratedConfiglet( self, configletName, config, containerId, deviceMac,
                            builderId ):
@@ -748,10 +2289,11 @@ class CvpService( object ):
                      } }
       self.doRequest( requests.post,
                       '%s/web/configlet/addConfigletsAndAssociatedMappers.do'
-                      % self.url_, data=json.dumps( data ) )
+                      % self.url_, data=jsonCodec.dumps( data ) )
 
       configletInfo = self.getConfigletByName( configletName )
       configletId = configletInfo[ 'key' ]
+      self._configletAdded( configletName, configletId, 'Generated' )
       data = { "data" : {
                   "generatedConfigletMappers" : [ {
                      "containerId" : containerId,
@@ -773,7 +2315,7 @@ class CvpService( object ):
                      } ] } }
       self.doRequest( requests.post,
                         '%s/web/configlet/addConfigletsAndAssociatedMappers.do'
-                        % self.url_, data=json.dumps( data ) )
+                        % self.url_, data=jsonCodec.dumps( data ) )
 
    def addReconciledConfiglet( self, configletName, config, deviceMac ):
       '''Adds the mapping between the generated configlets, containers and devices'''
@@ -786,10 +2328,11 @@ class CvpService( object ):
                      } ] } }
       self.doRequest( requests.post,
                       '%s/web/configlet/addConfigletsAndAssociatedMappers.do'
-                      % self.url_, data=json.dumps( data ) )
+                      % self.url_, data=jsonCodec.dumps( data ) )
 
       configletInfo = self.getConfigletByName( configletName )
       configletId = configletInfo[ 'key' ]
+      self._configletAdded( configletName, configletId, 'Static' )
       data = { "data" : {
                   "configletMappers" : [ {
                      "objectId" : deviceMac,
@@ -800,7 +2343,7 @@ class CvpService( object ):
                      } ] } }
       self.doRequest( requests.post,
                         '%s/web/configlet/addConfigletsAndAssociatedMappers.do'
-                        % self.url_, data=json.dumps( data ) )
+                        % self.url_, data=jsonCodec.dumps( data ) )
 
    def addConfigletBuilder( self, configBuilderName, formList, mainScript ):
       '''Add configlet Builder to Cvp inventory
@@ -818,12 +2361,13 @@ class CvpService( object ):
              }
       response = self.doRequest( requests.post,
                         '%s/web/configlet/addConfigletBuilder.do?isDraft=false'
-                        % self.url_, data=json.dumps( data ) )
+                        % self.url_, data=jsonCodec.dumps( data ) )
       pythonError = response.get( 'pythonError' )
       if pythonError:
          raise CvpError( errorCodes.CONFIGLET_BUILDER_PYTHON_ERROR,
                          pythonError[ 'errorMessage' ],
                          response=response )
+      self._configletAdded( configBuilderName )
 
    def deleteConfigletBuilder( self, configletBuilderKey ):
       '''Remove a configlet from the Cvp instance
@@ -836,6 +2380,7 @@ class CvpService( object ):
       self.doRequest( requests.post,
                         '%s/web/configlet/cancelConfigletBuilder.do?id=%s'
                         % ( self.url_, configletBuilderKey ) )
+      self._configletDeleted( configletKey=configletBuilderKey )
 
    def getConfigletByName( self, configletName ):
       '''Get information about configlet
@@ -885,7 +2430,9 @@ class CvpService( object ):
                   }
       tasks = self.doRequest( requests.post,
                         '%s/web/configlet/updateConfiglet.do' % ( self.url_ ),
-                        data=json.dumps( configlet ) )
+                        data=jsonCodec.dumps( configlet ) )
+      if self.configletCatalog_ is not None:
+         self.configletCatalog_.rename( configletKey, configletName )
       return tasks.get( 'taskIds' )
 
    def updateReconciledConfiglet( self, configletName, configletContent,
@@ -907,7 +2454,7 @@ class CvpService( object ):
       self.doRequest( requests.post,
                 '%s/web/provisioning/updateReconcileConfiglet.do?netElementId=%s'
                 % ( self.url_, mac ),
-                data=json.dumps( data ) )
+                data=jsonCodec.dumps( data ) )
 
    def deleteConfiglet( self, configletName, configletKey ):
       '''Removes the configlet from Cvp instance
@@ -923,7 +2470,8 @@ class CvpService( object ):
                     } ]
       self.doRequest( requests.post,
                         '%s/web/configlet/deleteConfiglet.do' % self.url_,
-                        data=json.dumps( configlet ) )
+                        data=jsonCodec.dumps( configlet ) )
+      self._configletDeleted( configletName, configletKey )
 
    def saveImageBundle( self, imageBundleName, imageBundleCertified,
          imageInfoList ):
@@ -944,7 +2492,7 @@ class CvpService( object ):
              }
       self.doRequest( requests.post,
                         '%s/web/image/saveImageBundle.do' % self.url_,
-                        data=json.dumps( data ) )
+                        data=jsonCodec.dumps( data ) )
 
    def getImageBundleByName( self, imageBundleName ):
       '''Returns image bundle informations
@@ -983,30 +2531,59 @@ class CvpService( object ):
              }
       self.doRequest( requests.post,
                         '%s/web/image/updateImageBundle.do' % ( self.url_ ),
-                        data=json.dumps( data ) )
+                        data=jsonCodec.dumps( data ) )
+
+   def waitForDevicesToBeInInventory( self, ipAddressOrNameList, timeout=360,
+                                      onFound=None ):
+      '''Waits for devices to appear in the inventory. While many devices are
+      missing the inventory is listed once per round; once at most
+      INVENTORY_SEARCH_THRESHOLD devices are missing they are looked up by name
+      instead, with a full listing every INVENTORY_FULL_SWEEP_ROUNDS rounds.
+      Arguments:
+         ipAddressOrNameList -- IP addresses or host names of the devices
+                                ( type : List of String )
+         timeout -- seconds to wait for ( type : Int )
+         onFound -- called as onFound( ipAddressOrName, serialNumber ) when a
+                    device shows up ( optional )
+      Raises:
+         CvpError -- on timeout
+      Returns:
+         found -- IP address or host name to serial number of every device
+                  ( type : Dict )
+      '''
+      remaining = set( ipAddressOrNameList )
+      found = {}
+      rounds = [ 0 ]
+
+      def addFound( deviceInfo ):
+         for field in ( 'ipAddress', 'hostname', 'fqdn' ):
+            ipAddressOrName = deviceInfo.get( field )
+            if ipAddressOrName in remaining:
+               if not deviceInfo.get( 'serialNumber' ):
+                  return
+               remaining.discard( ipAddressOrName )
+               found[ ipAddressOrName ] = deviceInfo[ 'serialNumber' ]
+               if onFound:
+                  onFound( ipAddressOrName, deviceInfo[ 'serialNumber' ] )
+               return
+
+      def findDevices():
+         rounds[ 0 ] += 1
+         if ( len( remaining ) <= INVENTORY_SEARCH_THRESHOLD and
+              rounds[ 0 ] % INVENTORY_FULL_SWEEP_ROUNDS ):
+            for ipAddressOrName in list( remaining ):
+               topology = self.searchTopology( ipAddressOrName )
+               for deviceInfo in topology.get( 'netElementList' ) or []:
+                  addFound( deviceInfo )
+         else:
+            for deviceInfo in self.iterInventory():
+               addFound( deviceInfo )
+               if not remaining:
+                  break
+         return remaining
 
-   def waitForDevicesToBeInInventory( self, ipAddressOrNameList, timeout=360 ):
-      endTime = time.time() + timeout
-      ipAddressOrNameList = set( ipAddressOrNameList )
-      while True:
-         devicesInfo, _ = self.getInventory(populateParentContainerKeyMap=False)
-         if len(devicesInfo) < len(ipAddressOrNameList):
-            time.sleep(0.5)
-            continue
-         found = {}
-         for device in devicesInfo:
-            if device['ipAddress'] in ipAddressOrNameList:
-               found[ device['ipAddress'] ] = device['serialNumber']
-            elif device['hostname'] in ipAddressOrNameList:
-               found[ device['hostname'] ] = device['serialNumber']
-            elif device['fqdn'] in ipAddressOrNameList:
-               found[ device['fqdn'] ] = device['serialNumber']
-         if set(found.keys()) == ipAddressOrNameList:
-            return found
-         if time.time() > endTime:
-            break
-         time.sleep(0.5)
-      raise CvpError( errorCodes.TIMEOUT )
+      Poller( timeout ).wait( findDevices, lambda remaining: not remaining )
+      return found
 
    def addToInventory( self, deviceIpAddress, parentContainerId ):
       '''Add device to the Cvp inventory. Warning -- Method doesn't check the
@@ -1046,7 +2623,7 @@ class CvpService( object ):
       data = { 'deviceToContainerMap': deviceIdToContainerIdMap }
       return self.doRequest( requests.put,
                              '%s/cvpservice/inventory/devices/mapToContainer' %
-                             self.url_, data=json.dumps( data ) )
+                             self.url_, data=jsonCodec.dumps( data ) )
 
    def onboardDevices( self, deviceIpAddressesOrHostnames ):
       '''Onboard devices
@@ -1059,7 +2636,7 @@ class CvpService( object ):
       data = { 'hosts': deviceIpAddressesOrHostnames }
       return self.doRequest( requests.post,
                              '%s/cvpservice/inventory/devices' % self.url_,
-                             data=json.dumps( data ) )
+                             data=jsonCodec.dumps( data ) )
 
    def bulkAddToInventory( self, deviceToContainerIdMap ):
       '''Add devices in bulk to the Cvp inventory. Warning -- Method doesn't check the
@@ -1119,9 +2696,13 @@ class CvpService( object ):
       deletion of device. Return a list of taskIds created in response to saving
       the topology.
       '''
+      if self.transaction is not None:
+         # the topology is saved once, when the transaction is committed
+         self.transaction.deferSave()
+         return { 'taskIds' : [] }
       tasks = self.doRequest( requests.post,
                              '%s/web/ztp/v2/saveTopology.do' % ( self.url_ ),
-                             data=json.dumps( data ) )
+                             data=jsonCodec.dumps( data ) )
       return tasks[ 'data' ]
 
    def captureDeviceSnapshot( self, templateId, deviceId, generatedBy ):
@@ -1145,7 +2726,7 @@ class CvpService( object ):
 
       self.doRequest( requests.post,
                '%s/cvpservice/snapshot/templates/%s/capture' % ( self.url_,
-               templateId ), data = json.dumps( data ) )
+               templateId ), data = jsonCodec.dumps( data ) )
 
    def getRollbackDeviceConfigs( self, deviceId, current, timestamp ):
       ''' Get the image and running config for the device
@@ -1185,7 +2766,7 @@ class CvpService( object ):
 
       templateInfo = self.doRequest( requests.post,
                '%s/cvpservice/snapshot/templates/schedule' % (self.url_ ),
-               data = json.dumps( data ) )
+               data = jsonCodec.dumps( data ) )
       return templateInfo[ "templateKey" ]
 
    def getSnapshotTemplates( self, searchString, startIndex, endIndex ):
@@ -1226,7 +2807,7 @@ class CvpService( object ):
              }
       templatesInfoResp = self.doRequest( requests.post,
                              '%s/cvpservice/snapshot/templates/info' %(
-                              self.url_), data=json.dumps( data ) )
+                              self.url_), data=jsonCodec.dumps( data ) )
       return templatesInfoResp[ 'templateInfo' ]
 
    def getTasksForChangeControl( self ):
@@ -1278,7 +2859,7 @@ class CvpService( object ):
 
       ccResponse = self.doRequest( requests.post,
             '%s/web/changeControl/addOrUpdateChangeControl.do' % ( self.url_),
-             data = json.dumps( data ) )
+             data = jsonCodec.dumps( data ) )
       return ccResponse[ 'ccId' ]
 
    def deleteChangeControls( self, ccIds ):
@@ -1291,7 +2872,7 @@ class CvpService( object ):
 
       self.doRequest( requests.post,
                       '%s/web/changeControl/deleteChangeControls.do' % ( self.url_ ),
-                      data=json.dumps( data ) )
+                      data=jsonCodec.dumps( data ) )
 
    def executeChangeControl( self, ccIds ):
       ''' Executes the list of Change Control Managements
@@ -1304,7 +2885,7 @@ class CvpService( object ):
 
       self.doRequest( requests.post,
                      '%s/web/changeControl/executeCC.do' % ( self.url_ ),
-                     data = json.dumps( data ) )
+                     data = jsonCodec.dumps( data ) )
 
    def cancelChangeControl( self, ccIds ):
       ''' Cancels scheduled or pending CCMs
@@ -1316,7 +2897,7 @@ class CvpService( object ):
 
       self.doRequest( requests.post,
             '%s/web/changeControl/cancelChangeControl.do' % ( self.url_ ),
-            data = json.dumps( data ) )
+            data = jsonCodec.dumps( data ) )
 
    def cloneChangeControl( self, ccId ):
       ''' Clones a Change Control. Only Failed Change Control can be cloned.
@@ -1330,7 +2911,7 @@ class CvpService( object ):
       data = { 'ccIds' : [ str( ccId ) ] }
       clone = self.doRequest( requests.post,
                '%s/web/changeControl/cloneChangeControl.do' % ( self.url_ ),
-                     data = json.dumps( data ) )
+                     data = jsonCodec.dumps( data ) )
       return clone
 
    def getChangeControlStatus( self, ccId, ccTaskList ):
@@ -1348,7 +2929,7 @@ class CvpService( object ):
       }
       ccStatus = self.doRequest( requests.post,
             '%s/web/changeControl/getCCProgress.do' % ( self.url_ ),
-             data = json.dumps( data ) )
+             data = jsonCodec.dumps( data ) )
       return ccStatus[ 'status' ]
 
    def getChangeControl( self, ccId ):
@@ -1371,6 +2952,18 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                              queryparam=&startIndex=%d&endIndex=%d'
                              % ( self.url_, 0, 0 ) )
 
+   def iterChangeControls( self, pageSize=DEFAULT_PAGE_SIZE ):
+      '''Yields the change controls from cvp, requesting pageSize change
+      controls at a time
+      Arguments:
+         pageSize -- change controls per request, 0 for a single streamed request
+      Returns:
+         changeControls -- iterator of change controls ( type : Iterator of Dict )
+      '''
+      return self._iterPagedItems(
+                  '%s/web/changeControl/getChangeControls.do?queryparam='
+                  % self.url_, pageSize )
+
    def _getConfigAndImageRollbackInfo( self, rollbackJsonString, rollbackInfo ):
       ''' Helper function that populates the config and image rollback dicts to
       pass back as API json body to create rollback tasks
@@ -1388,6 +2981,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                   rollbackInfo[ rollbackJsonString ][ 'taskInfo' ][ 'taskID' ]
       return dataRollbackInfo
 
+   @_topologyChange
    def addTempRollbackAction( self, rollbackTimestamp, netElementId,
                              rollbackType, targetIp, configRollbackInfo,
                              imageRollbackInfo ):
@@ -1420,9 +3014,10 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                 "configRollbackInput": configRollbackInfo,
                 "imageRollbackInput": imageRollbackInfo,
              }
+      self._flushTempActions()
       rollback = self.doRequest( requests.post,
             '%s/web/rollback/addTempRollbackAction.do' % ( self.url_ ),
-                     data = json.dumps( data ) )
+                     data = jsonCodec.dumps( data ) )
       if rollback[ 'data' ] != "success":
          raise CvpError( errorCodes.ROLLBACK_TASK_CREATION_FAILED,
                         rollback[ 'data' ],
@@ -1430,6 +3025,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       else:
          return self._saveTopology( [] )[ 'taskIds' ]
 
+   @_topologyChange
    def addNetworkRollbackTempActions( self, containerId, rollbackTime,
                                      rollbackType ):
       ''' Adds rollback tasks for the specified containerId.
@@ -1445,9 +3041,10 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                'rollbackTimestamp' : rollbackTime,
                'targetManagementIPList':[]
       }
+      self._flushTempActions()
       self.doRequest( requests.post,
             '%s/web/rollback/addNetworkRollbackTempActions.do' % ( self.url_ ),
-               data = json.dumps( data ) )
+               data = jsonCodec.dumps( data ) )
 
    def addNetworkRollbackChangeControl( self ):
       ''' Adds a change control for network rollback. The
@@ -1480,7 +3077,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       data = { 'data' : taskIds }
       self.doRequest( requests.post,
                         '%s/web/workflow/executeTask.do' % ( self.url_ ),
-                        data=json.dumps( data ) )
+                        data=jsonCodec.dumps( data ) )
 
    def getAllEvents( self, isCompleted ):
       '''Get all the events from CVP
@@ -1494,6 +3091,18 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                      '&isCompletedRequired=%r' % ( self.url_, 0, 0, isCompleted ) )
       return events[ 'data' ]
 
+   def iterAllEvents( self, isCompleted, pageSize=DEFAULT_PAGE_SIZE ):
+      '''Yields the events from CVP, requesting pageSize events at a time
+      Argument:
+         isCompleted -- Flag to check for completed/pending events
+         pageSize -- events per request, 0 for a single streamed request
+      Returns:
+         events -- iterator of events ( type : Iterator of Dict )
+      '''
+      return self._iterPagedItems(
+                  '%s/cvpservice/event/getAllEvents.do?isCompletedRequired=%r'
+                  % ( self.url_, isCompleted ), pageSize )
+
    def getTasks( self, status=None ):
       '''Retrieve information about all the tasks in Cvp Instance
       Arguments:
@@ -1507,6 +3116,17 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                 % ( self.url_, status, 0, 0 ) )
       return tasks[ 'data' ]
 
+   def iterTasks( self, status=None, pageSize=DEFAULT_PAGE_SIZE ):
+      '''Yields the tasks in Cvp Instance, requesting pageSize tasks at a time
+      Arguments:
+         status -- Filter the results by status
+         pageSize -- tasks per request, 0 for a single streamed request
+      Returns:
+         tasks -- iterator of details of tasks ( type : Iterator of Dict )
+      '''
+      return self._iterPagedItems( '%s/web/workflow/getTasks.do?queryparam=%s'
+                                   % ( self.url_, status or '' ), pageSize )
+
    def getImageBundles( self ):
       '''Get all details of all image bundles from Cvp instance
       Returns:
@@ -1534,7 +3154,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                     } ] }
       self.doRequest( requests.post,
                         '%s/web/image/deleteImageBundles.do' % self.url_,
-                        data=json.dumps( data ) )
+                        data=jsonCodec.dumps( data ) )
 
    def deleteImageBundles( self, imageBundleInfos ):
       '''Delete image bundles from Cvp instance
@@ -1550,7 +3170,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       payload = { 'data': data }
       self.doRequest( requests.post,
                         '%s/web/image/deleteImageBundles.do' % self.url_,
-                        data=json.dumps( payload ) )
+                        data=jsonCodec.dumps( payload ) )
 
    def deleteTempDevice( self, tempDeviceId ):
       '''
@@ -1558,6 +3178,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       '''
       return
 
+   @_topologyChange
    def deleteContainer( self, containerName, containerKey, parentContainerName,
                         parentKey ):
       '''Delete container from Cvp inventory. Warning -- doesn't check
@@ -1588,7 +3209,10 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                  "toIdType" : "container"
                } ] }
       self._addTempAction( data )
-      return self._saveTopology( [] )[ 'taskIds' ]
+      taskIds = self._saveTopology( [] )[ 'taskIds' ]
+      if self.containerIndex_ is not None:
+         self.containerIndex_.remove( containerKey )
+      return taskIds
 
    def getContainerInfoByKey( self, containerKey ):
       '''Retrieves information about the container'''
@@ -1618,8 +3242,37 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       data = { "data" : deviceMacs }
       return self.doRequest( requests.post,
                              '%s/cvpservice/inventory/deleteDevices.do' % self.url_,
-                             data=json.dumps( data ) )
+                             data=jsonCodec.dumps( data ) )
+
+   def _configletToDeviceAction( self, deviceIpAddress, deviceFqdn, deviceMac,
+                                 cnl, ckl, cbnl, cbkl ):
+      '''Returns the temp action applying the configlets to a device'''
+      return { "info" : "Configlet Assign: to Device" + deviceFqdn +
+                  " \nCurrent ManagementIP:" + deviceIpAddress +
+                  "  \nTarget ManagementIP",
+               "infoPreview" : "<b>Configlet Assign:</b> to Device" + deviceFqdn,
+               "action" : "associate",
+               "nodeType" : "configlet",
+               "nodeId" : "",
+               "toId" : deviceMac,
+               "toIdType" : "netelement",
+               "fromId" : "",
+               "nodeName" : "",
+               "fromName" : "",
+               "toName" : deviceFqdn,
+               "nodeIpAddress" : deviceIpAddress,
+               "nodeTargetIpAddress" : deviceIpAddress,
+               "configletList" : ckl,
+               "configletNamesList" : cnl,
+               "ignoreConfigletList" : [],
+               "ignoreConfigletNamesList" : [],
+               "configletBuilderList" : cbkl,
+               "configletBuilderNamesList" : cbnl,
+               "ignoreConfigletBuilderList" : [],
+               "ignoreConfigletBuilderNamesList": []
+             }
 
+   @_topologyChange
    def applyConfigletToDevice( self, deviceIpAddress, deviceFqdn, deviceMac,
                                cnl, ckl, cbnl, cbkl, createPendingTask=True ):
       '''Applies configlets to device. Warning -- Method doesn't check existence of
@@ -1636,35 +3289,39 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
          CvpError -- If device ip key is invalid
                      If parameter data structures are incorrect
       '''
-      data = { "data" : [ {
-                 "info" : "Configlet Assign: to Device" + deviceFqdn +
-                    " \nCurrent ManagementIP:" + deviceIpAddress +
-                    "  \nTarget ManagementIP",
-                 "infoPreview" : "<b>Configlet Assign:</b> to Device" + deviceFqdn,
-                 "action" : "associate",
-                 "nodeType" : "configlet",
-                 "nodeId" : "",
-                 "toId" : deviceMac,
-                 "toIdType" : "netelement",
-                 "fromId" : "",
-                 "nodeName" : "",
-                 "fromName" : "",
-                 "toName" : deviceFqdn,
-                 "nodeIpAddress" : deviceIpAddress,
-                 "nodeTargetIpAddress" : deviceIpAddress,
-                 "configletList" : ckl,
-                 "configletNamesList" : cnl,
-                 "ignoreConfigletList" : [],
-                 "ignoreConfigletNamesList" : [],
-                 "configletBuilderList" : cbkl,
-                 "configletBuilderNamesList" : cbnl,
-                 "ignoreConfigletBuilderList" : [],
-                 "ignoreConfigletBuilderNamesList": []
-               } ] }
+      data = { "data" : [ self._configletToDeviceAction( deviceIpAddress,
+                                                         deviceFqdn, deviceMac,
+                                                         cnl, ckl, cbnl, cbkl ) ] }
       self._addTempAction( data )
       if createPendingTask:
          return self._saveTopology( [] )[ 'taskIds' ]
 
+   @_topologyChange
+   def applyConfigletsToDevices( self, deviceConfigletList,
+                                 batchSize=TEMP_ACTION_BATCH_SIZE ):
+      '''Applies configlets to many devices with a single topology save. The temp
+      actions are sent batchSize devices at a time. Warning -- Method doesn't check
+      existence of configlets
+
+      Arguments:
+         deviceConfigletList -- ( deviceIpAddress, deviceFqdn, deviceMac, cnl,
+               ckl, cbnl, cbkl ) of every device, as passed to
+               applyConfigletToDevice ( type : List of Tuples )
+         batchSize -- temp actions per addTempAction request ( type : Int )
+      Raises:
+         CvpError -- If device ip key is invalid
+                     If parameter data structures are incorrect
+      Returns:
+         taskIds -- ids of the tasks created for the devices ( type : List )
+      '''
+      actions = [ self._configletToDeviceAction( *deviceConfiglets )
+                  for deviceConfiglets in deviceConfigletList ]
+      if not actions:
+         return []
+      self._addTempActions( actions, batchSize )
+      return self._saveTopology( [] )[ 'taskIds' ]
+
+   @_topologyChange
    def applyConfigletToContainer( self, containerName, containerKey, cnl, ckl, cbnl,
                                   cbkl ):
       '''Applies configlets to container. Warning -- Method doesn't check existence
@@ -1707,12 +3364,37 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       self._addTempAction( data )
       return self._saveTopology( [] )[ 'taskIds' ]
 
-   def _addTempAction( self, data ):
-      '''Add temporary action to the cvp instance'''
+   def _addTempAction( self, data, nodeId='root' ):
+      '''Add temporary action to the cvp instance, or to the open transaction'''
+      if self.transaction is not None:
+         self.transaction.add( data[ "data" ], nodeId )
+      else:
+         self._postTempAction( data, nodeId )
+
+   def _postTempAction( self, data, nodeId='root' ):
+      '''Sends temporary actions to the cvp instance'''
       self.doRequest( requests.post,
                       '%s/web/ztp/addTempAction.do?format=topology&queryParam=&'
-                      'nodeId=root' % self.url_, data=json.dumps( data ) )
-
+                      'nodeId=%s' % ( self.url_, nodeId ),
+                      data=jsonCodec.dumps( data ) )
+
+   def _flushTempActions( self ):
+      '''Sends the temp actions collected by the open transaction, before
+      requests depending on them'''
+      if self.transaction is not None:
+         self.transaction.flush()
+
+   def _deleteTempActions( self ):
+      '''Deletes all the temp actions not saved yet'''
+      self.doRequest( requests.delete,
+                      '%s/web/ztp/deleteAllTempAction.do' % self.url_ )
+
+   def _addTempActions( self, actions, batchSize ):
+      '''Adds the temporary actions to the cvp instance, batchSize at a time'''
+      for start in range( 0, len( actions ), batchSize ):
+         self._addTempAction( { "data" : actions[ start : start + batchSize ] } )
+
+   @_topologyChange
    def removeConfigletFromContainer( self, containerName, containerKey,
                                      cnl, ckl, cbnl, cbkl, rmCnl, rmCkl, rmCbnl,
                                      rmCbkl ):
@@ -1760,6 +3442,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       return self._saveTopology( [] )[ 'taskIds' ]
 
 
+   @_topologyChange
    def removeConfigletFromDevice( self, deviceFqdn, deviceIp, deviceMac, cnl, ckl,
                                   cbnl, cbkl, rmCnl, rmCkl, rmCbnl, rmCbkl ):
       '''Remove configlets assigned to device. Warning -- Method doesn't check
@@ -1807,6 +3490,24 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       self._addTempAction( data )
       return self._saveTopology( [] )[ 'taskIds' ]
 
+   def _addContainerAction( self, containerName, containerParentName,
+                            parentContainerId, nodeId ):
+      '''Returns the temp action adding a container, known as nodeId to the
+      following temp actions until the topology is saved'''
+      return {
+                 "info" : "Container " + containerName + " created",
+                 "infoPreview" : "Container " + containerName + " created",
+                 "action" : "add",
+                 "nodeType" : "container",
+                 "nodeId" : nodeId,
+                 "toId" : parentContainerId,
+                 "fromId" : "",
+                 "nodeName" : containerName,
+                 "fromName" : "",
+                 "toName" : containerParentName,
+             }
+
+   @_topologyChange
    def addContainer( self, containerName, containerParentName,
                      parentContainerId ):
       '''Adds container to Cvp inventory
@@ -1821,21 +3522,46 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       '''
 
 
-      data = { 'data' : [  {
-                 "info" : "Container " + containerName + " created",
-                 "infoPreview" : "Container " + containerName + " created",
-                 "action" : "add",
-                 "nodeType" : "container",
-                 "nodeId" : "New_container1",
-                 "toId" : parentContainerId,
-                 "fromId" : "",
-                 "nodeName" : containerName,
-                 "fromName" : "",
-                 "toName" : containerParentName,
-                 } ] }
+      data = { 'data' : [ self._addContainerAction( containerName,
+                                                    containerParentName,
+                                                    parentContainerId,
+                                                    "New_container1" ) ] }
       self._addTempAction( data )
+      self.invalidateContainerIndex()
       return self._saveTopology( [] )[ 'taskIds' ]
 
+   @_topologyChange
+   def addContainers( self, containerList, batchSize=TEMP_ACTION_BATCH_SIZE ):
+      '''Adds many containers to Cvp inventory with a single topology save. A
+      container may be added under a container added before it in the list, by
+      giving the nodeId of the new parent as parentContainerId. The temp actions
+      are deleted if any of the requests fails.
+      Arguments:
+         containerList -- ( containerName, containerParentName,
+               parentContainerId, nodeId ) of every container, parents first.
+               nodeId is a temporary id unique to the list, e.g.
+               "New_container1" ( type : List of Tuples )
+         batchSize -- temp actions per addTempAction request ( type : Int )
+      Raises:
+         CvpError -- If a container with same name already exists,
+                     If a parent Id is invalid
+                     If parameter data structures are incorrect
+      Returns:
+         taskIds -- ids of the tasks created by the save ( type : List )
+      '''
+      if not containerList:
+         return []
+      actions = [ self._addContainerAction( *container )
+                  for container in containerList ]
+      try:
+         self._addTempActions( actions, batchSize )
+         self.invalidateContainerIndex()
+         return self._saveTopology( [] )[ 'taskIds' ]
+      except:
+         self._deleteTempActions()
+         raise
+
+   @_topologyChange
    def applyImageBundleToDevice( self, deviceKey, deviceFqdn, imageBundleName,
                                  imageBundleKey ):
       '''Applies image bundle to devices. Warning -- Method doesn't check existence
@@ -1871,12 +3597,10 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                  "parentTask" : ""
                } ]
              }
-      self.doRequest( requests.post,
-                   '%s/web/ztp/addTempAction.do?'
-                   'format=topology&queryParam=&nodeId=root'
-                   % ( self.url_ ), data=json.dumps( data ) )
+      self._addTempAction( data )
       return self._saveTopology( data=[] )[ 'taskIds' ]
 
+   @_topologyChange
    def applyImageBundleToContainer( self, containerName, containerKey,
                                     imageBundleName, imageBundleKey ):
       '''Applies image bundle to a container. Warning -- Method doesn't check
@@ -1909,12 +3633,10 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                  "parentTask" : ""
                } ]
              }
-      self.doRequest( requests.post,
-                   '%s/web/ztp/addTempAction.do?'
-                   'format=topology&queryParam=&nodeId=root'
-                   % ( self.url_ ), data=json.dumps( data ) )
+      self._addTempAction( data )
       return self._saveTopology( data=[] )[ 'taskIds' ]
 
+   @_topologyChange
    def removeImageBundleAppliedToContainer( self, containerName, containerKey,
                                             imageBundleName, imageBundleKey ):
       '''Removes image bundles applied to the container.
@@ -1971,7 +3693,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
              }
       cInfo = self.doRequest( requests.post,
                             '%s/web/configlet/autoConfigletGenerator.do' % self.url_,
-                            data=json.dumps( data )
+                            data=jsonCodec.dumps( data )
                              )
       for configletInfo in cInfo[ 'data' ]:
          if 'pythonError' in configletInfo:
@@ -2008,7 +3730,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
              }
       cInfo = self.doRequest( requests.post,
                               '%s/web/configlet/configletBuilderPreview.do' % self.url_,
-                              data=json.dumps( data)
+                              data=jsonCodec.dumps( data)
                               )
       # configletBuilderPreview returns error in a differnt format than expected,
       # to handle it before the fix, look for 'errors' in cInfo instead of 'data'
@@ -2024,6 +3746,144 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                                response=cInfo )
       return cInfo[ 'data' ]
 
+   def _deployMoveAction( self, transId, devKey, devFqdn, containerKey,
+                          containerName ):
+      '''Returns the temp action moving a device out of the undefined container'''
+      return { "info" : transId,
+               "infoPreview" : transId,
+               "action" : "update",
+               "nodeType" : "netelement",
+               "nodeId" : devKey,
+               "toId" : containerKey,
+               "fromId" : "undefined_container",
+               "nodeName" : devFqdn,
+               "toName" : containerName,
+               "toIdType" : "container" }
+
+   def _deployContainerAction( self, transId, containerKey, containerName,
+                               ckl, cnl, cbkl, cbnl ):
+      '''Returns the temp action applying the configlets of the target container
+      to a device being deployed'''
+      return { "info" : transId,
+               "infoPreview" : transId,
+               "action" : "associate",
+               "nodeType" : "configlet",
+               "nodeId" : "",
+               "toId" : containerKey,
+               "fromId" : None,
+               "nodeName" : None,
+               "fromName" : None,
+               "toName" : containerName,
+               "toIdType" : "container",
+               "configletList" : ckl,
+               "configletNamesList": cnl,
+               "ignoreConfigletList":[],
+               "ignoreConfigletNamesList":[],
+               "configletBuilderList" : cbkl,
+               "configletBuilderNamesList": cbnl,
+               "ignoreConfigletBuilderList":[],
+               "ignoreConfigletBuilderNamesList":[],
+               "pageType":"netelementManagement"
+             }
+
+   def _deployDeviceAction( self, transId, devKey, devFqdn, devIp, devTargetIp,
+                            ckl, cnl, cbkl, cbnl ):
+      '''Returns the temp action applying all the configlets to a device being
+      deployed'''
+      return { "info" : transId,
+               "infoPreview" : transId,
+               "action" : "associate",
+               "nodeType" : "configlet",
+               "nodeId" : "",
+               "toId" : devKey,
+               "fromId" : None,
+               "nodeName" : None,
+               "fromName" : None,
+               "toName" : devFqdn,
+               "toIdType" : "netelement",
+               "configletList": ckl,
+               "configletNamesList" : cnl,
+               "ignoreConfigletList":[],
+               "ignoreConfigletNamesList":[],
+               "configletBuilderList": cbkl,
+               "configletBuilderNamesList" : cbnl,
+               "ignoreConfigletBuilderList":[],
+               "ignoreConfigletBuilderNamesList":[],
+               "nodeIpAddress" : devIp,
+               "nodeTargetIpAddress" : devTargetIp,
+             }
+
+   def _deployImageAction( self, transId, devKey, devFqdn, imageBundleKey,
+                           imageBundleName ):
+      '''Returns the temp action applying an image bundle to a device being
+      deployed'''
+      return { "info" : transId,
+               "infoPreview" : transId,
+               "action" : "associate",
+               "nodeType" : "imagebundle",
+               "nodeId" : imageBundleKey,
+               "toId" : devKey,
+               "fromId" : None,
+               "nodeName" : imageBundleName,
+               "fromName" : None,
+               "toName" : devFqdn,
+               "toIdType" : "netelement",
+               "ignoreNodeId" : None,
+               "ignoreNodeName" : None,
+             }
+
+   def _getDeployBuilders( self, containerKey ):
+      '''Returns the keys and names of the hierarchical configlet builders of the
+      container, and those of them generating configlets without user input'''
+      cblInfoList = self.doRequest( requests.get,
+            '%s/web/configlet/getHierarchicalConfigletBuilders.do?containerId=%s'
+            '&queryParam=&startIndex=%d&endIndex=%d' % ( self.url_, containerKey,
+            0, 0 ) )
+      cbkl = []
+      cbnl = []
+      autoBuilders = []
+      for cb in cblInfoList[ 'buildMapperList' ]:
+         cbkl.append( cb[ 'builderId' ] )
+         cbnl.append( cb[ 'builderName' ] )
+         #skip the manual configlet builders as well as SSL configbuilder
+         configBuilder = self.getConfigletBuilder( cb[ 'builderId' ] )
+         if configBuilder[ 'formList' ] or configBuilder[ 'sslConfig' ] :
+            continue
+         autoBuilders.append( ( cb[ 'builderId' ], cb[ 'builderName' ] ) )
+      return cbkl, cbnl, autoBuilders
+
+   def _getDeployContainerConfiglets( self, containerKey, cbkl, cbnl ):
+      '''Returns the keys and names of the static configlets applied to the
+      container, adding the keys and names of its configlet builders to cbkl and
+      cbnl'''
+      ckl = []
+      cnl = []
+      for configlet in self.getContainerConfiglets( containerKey ):
+         if configlet[ 'type' ] == 'static':
+            ckl.append( configlet[ 'key' ] )
+            cnl.append( configlet[ 'name' ] )
+         elif configlet[ 'type' ] == 'Builder':
+            if configlet[ 'key' ] not in cbkl:
+               cbkl.append( configlet[ 'key' ] )
+               cbnl.append( configlet[ 'name' ] )
+      return ckl, cnl
+
+   def _getProposedConfiglets( self, devKey ):
+      '''Returns the keys and names of the static and generated configlets
+      proposed for a device by the temp actions'''
+      self._flushTempActions()
+      configlets = self.doRequest( requests.get,
+                   '%s/web/ztp/getTempConfigsByNetElementId.do?netElementId=%s' %
+                   ( self.url_, devKey ) )
+      ckl = []
+      cnl = []
+      for p in configlets[ 'proposedConfiglets' ]:
+         if p[ 'type' ] == 'Static' or p[ 'type' ] == 'Generated':
+            ckl.append( p[ 'key' ] )
+            cnl.append( p[ 'name' ] )
+      return ckl, cnl
+
+   @_topologyChange
    def deployDevice( self, devKey, devFqdn, devIp, devTargetIp,
                      containerKey, containerName, configletKeyList=None,
                      configletNameList=None, configletBuilderKeys=None,
@@ -2055,107 +3915,45 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       transId = 'Automated Task ID: %s' % str( uuid.uuid1() )
       try:
          # move the device to target container
-         data = { "data":
-               [ { "info" : transId,
-                   "infoPreview" : transId,
-                   "action" : "update",
-                   "nodeType" : "netelement",
-                   "nodeId" : devKey,
-                   "toId" : containerKey,
-                   "fromId" : "undefined_container",
-                   "nodeName" : devFqdn,
-                   "toName" : containerName,
-                   "toIdType" : "container" } ] }
-         self.doRequest( requests.post,
-               '%s/web/ztp/addTempAction.do?format=topology&queryParam=&nodeId=%s' %
-               ( self.url_, 'root' ), data=json.dumps( data ) )
+         self._addTempAction( { "data" : [ self._deployMoveAction( transId,
+                              devKey, devFqdn, containerKey, containerName ) ] } )
 
          # get hierarchial configlet builders list
-         cblInfoList = self.doRequest( requests.get,
-               '%s/web/configlet/getHierarchicalConfigletBuilders.do?containerId=%s'
-               '&queryParam=&startIndex=%d&endIndex=%d' % ( self.url_, containerKey,
-               0, 0 ) )
+         cbkl, cbnl, autoBuilders = self._getDeployBuilders( containerKey )
 
          # generate configlets for the device using these configlet builders
          ckl = []
          cnl = []
-         cbkl = []
-         cbnl = []
-
-         for cb in cblInfoList[ 'buildMapperList' ]:
-            cbkl.append( cb[ 'builderId' ] )
-            cbnl.append( cb[ 'builderName' ] )
-            #skip the manual configlet builders as well as SSL configbuilder
-            configBuilder = self.getConfigletBuilder( cb[ 'builderId' ] )
-            if configBuilder[ 'formList' ] or configBuilder[ 'sslConfig' ] :
-               continue
-            cbInfo = self.generateAutoConfiglet( [ devKey ], cb[ 'builderId' ],
-                                                  cb[ 'builderName' ], containerKey )
+         for builderKey, builderName in autoBuilders:
+            cbInfo = self.generateAutoConfiglet( [ devKey ], builderKey,
+                                                  builderName, containerKey )
             ckl.append( cbInfo[ 0 ][ 'configlet' ][ 'key' ] )
             cnl.append( cbInfo[ 0 ][ 'configlet' ][ 'name' ] )
 
          # get configlets applied to the parent container
-         cinfoList = self.getContainerConfiglets( containerKey )
-
-         for configlet in cinfoList:
-            if configlet[ 'type' ] == 'static':
-               ckl.append( configlet[ 'key' ] )
-               cnl.append( configlet[ 'name' ] )
-            elif configlet[ 'type' ] == 'Builder':
-               if configlet[ 'key' ] not in cbkl:
-                  cbkl.append( configlet[ 'key' ] )
-                  cbkl.append( configlet[ 'name' ] )
+         containerCkl, containerCnl = self._getDeployContainerConfiglets(
+                                                         containerKey, cbkl, cbnl )
+         ckl.extend( containerCkl )
+         cnl.extend( containerCnl )
 
          #apply the configlets to the device through container on netelement
          # management page
-         data = { "data" :
-                  [ { "info" : transId,
-                      "infoPreview" : transId,
-                      "action" : "associate",
-                      "nodeType" : "configlet",
-                      "nodeId" : "",
-                      "toId" : containerKey,
-                      "fromId" : None,
-                      "nodeName" : None,
-                      "fromName" : None,
-                      "toName" : containerName,
-                      "toIdType" : "container",
-                      "configletList" : ckl,
-                      "configletNamesList": cnl,
-                      "ignoreConfigletList":[],
-                      "ignoreConfigletNamesList":[],
-                      "configletBuilderList" : cbkl,
-                      "configletBuilderNamesList": cbnl,
-                      "ignoreConfigletBuilderList":[],
-                      "ignoreConfigletBuilderNamesList":[],
-                      "pageType":"netelementManagement"
-                    } ] }
-         self.doRequest( requests.post,
-               '%s/web/ztp/addTempAction.do?format=topology&queryParam=&nodeId=%s' %
-               ( self.url_, 'root' ), data=json.dumps( data ) )
+         self._addTempAction( { "data" : [ self._deployContainerAction( transId,
+                              containerKey, containerName, ckl, cnl, cbkl,
+                              cbnl ) ] } )
 
          #get the proposed list of configlet for the device at the target container
-         configlets = self.doRequest( requests.get,
-                      '%s/web/ztp/getTempConfigsByNetElementId.do?netElementId=%s' %
-                      ( self.url_, devKey ) )
-         ckl = []
-         cnl = []
-         for p in configlets[ 'proposedConfiglets' ]:
-            if p[ 'type' ] == 'Static' or p[ 'type' ] == 'Generated':
-               ckl.append( p[ 'key' ] )
-               cnl.append( p[ 'name' ] )
+         ckl, cnl = self._getProposedConfiglets( devKey )
 
          # Generate device specific configlet using the provided non hierarchal
          # configlet builders
-         cbNum = 0
          if configletBuilderKeys and configletBuilderNames:
-            for key in configletBuilderKeys:
+            for key, name in zip( configletBuilderKeys, configletBuilderNames ):
                if key not in cbkl:
-                  cbInfo = self.generateAutoConfiglet( [ devKey ], key,
-                              configletBuilderNames[ cbNum ],containerKey )
+                  cbInfo = self.generateAutoConfiglet( [ devKey ], key, name,
+                                                       containerKey )
                   ckl.append( cbInfo[ 0 ][ 'configlet' ][ 'key' ] )
                   cnl.append( cbInfo[ 0 ][ 'configlet' ][ 'name' ] )
-                  cbNum += 1
 
          # add the provided device specific configlets
          if configletKeyList and configletNameList:
@@ -2163,60 +3961,145 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
             cnl.extend( configletNameList )
 
          # apply all these configlets to device
-         data = { "data" : [ {
-                     "info" : transId,
-                     "infoPreview" : transId,
-                     "action" : "associate",
-                     "nodeType" : "configlet",
-                     "nodeId" : "",
-                     "toId" : devKey,
-                     "fromId" : None,
-                     "nodeName" : None,
-                     "fromName" : None,
-                     "toName" : devFqdn,
-                     "toIdType" : "netelement",
-                     "configletList": ckl,
-                     "configletNamesList" : cnl,
-                     "ignoreConfigletList":[],
-                     "ignoreConfigletNamesList":[],
-                     "configletBuilderList": cbkl,
-                     "configletBuilderNamesList" : cbkl,
-                     "ignoreConfigletBuilderList":[],
-                     "ignoreConfigletBuilderNamesList":[],
-                     "nodeIpAddress" : devIp,
-                     "nodeTargetIpAddress" : devTargetIp,
-                     } ] }
-         self.doRequest( requests.post,
-               '%s/web/ztp/addTempAction.do?format=topology&queryParam=&nodeId=%s' %
-               ( self.url_, 'root' ), data=json.dumps( data ) )
+         self._addTempAction( { "data" : [ self._deployDeviceAction( transId,
+                              devKey, devFqdn, devIp, devTargetIp, ckl, cnl, cbkl,
+                              cbnl ) ] } )
 
          # apply image to the device
          if imageBundleKey:
-            data = { "data":
-                  [ { "info" : transId,
-                     "infoPreview" : transId,
-                     "action" : "associate",
-                     "nodeType" : "imagebundle",
-                     "nodeId" : imageBundleKey,
-                     "toId" : devKey,
-                     "fromId" : None,
-                     "nodeName" : imageBundleName,
-                     "fromName" : None,
-                     "toName" : devFqdn,
-                     "toIdType" : "netelement",
-                     "ignoreNodeId" : None,
-                     "ignoreNodeName" : None,
-                    } ] }
-            self.doRequest( requests.post,
-               '%s/web/ztp/addTempAction.do?format=topology&queryParam=&nodeId=%s' %
-               ( self.url_, 'root' ), data=json.dumps( data ) )
+            self._addTempAction( { "data" : [ self._deployImageAction( transId,
+                                 devKey, devFqdn, imageBundleKey,
+                                 imageBundleName ) ] } )
 
          # save all changes to the device and return the task list
          return self._saveTopology( [] )
 
       except:
-         self.doRequest( requests.delete,
-                          '%s/web/ztp/deleteAllTempAction.do' % self.url_ )
+         self._deleteTempActions()
+         # try and clean up the transaction before passing the exception back to
+         # the caller
+         raise
+
+   def _generateAutoConfiglets( self, devKeyList, cbKey, cbName, conKey,
+                                batchSize ):
+      '''Generates configlets for many devices using the builder, batchSize
+      devices per request. Returns the generated configlet of every device, keyed
+      by device key. Raises CvpError naming the devices left out of the
+      response'''
+      generated = {}
+      for start in range( 0, len( devKeyList ), batchSize ):
+         batch = devKeyList[ start : start + batchSize ]
+         for cbInfo in self.generateAutoConfiglet( batch, cbKey, cbName, conKey ):
+            # a single device response may not name the device
+            devKey = cbInfo.get( 'netElementId',
+                                 batch[ 0 ] if len( batch ) == 1 else None )
+            if devKey in batch:
+               generated[ devKey ] = cbInfo[ 'configlet' ]
+         missing = [ devKey for devKey in batch if devKey not in generated ]
+         if missing:
+            raise CvpError( errorCodes.CONFIGLET_GENERATION_ERROR,
+                            'Configlet builder %s generated no configlet for '
+                            'device %s' % ( cbName, ', '.join( missing ) ) )
+      return generated
+
+   @_topologyChange
+   def deployDevices( self, deploymentList, containerKey, containerName,
+                      batchSize=TEMP_ACTION_BATCH_SIZE, executor=None ):
+      ''' Move many devices from the undefined container to a target container,
+      with a single topology save. The configlet builders and configlets of the
+      container are fetched once, the configlets of every builder are generated
+      for all the devices at once and the temp actions are sent batchSize at a
+      time. The temp actions are deleted if any of the requests fails.
+
+      Arguments:
+         deploymentList -- ( devKey, devFqdn, devIp, devTargetIp,
+               configletKeyList, configletNameList, configletBuilderKeys,
+               configletBuilderNames, imageBundleKey, imageBundleName ) of every
+               device, as passed to deployDevice ( type : List of Tuples )
+         containerKey -- unique key for the target container
+         containerName -- name of the target container
+         batchSize -- devices per addTempAction and autoConfigletGenerator
+                      request ( type : Int )
+         executor -- optional FanOutExecutor doing the per device requests
+                     concurrently
+
+      Returns:
+         ( taskId, description ) of the saved topology
+      Raises:
+         CvpError -- if a configlet builder generates no configlet for a device
+      '''
+      mapper = executor.map if executor else map
+      # one transaction ID per device, as deployDevice would use
+      transIds = [ 'Automated Task ID: %s' % str( uuid.uuid1() )
+                   for _ in deploymentList ]
+      devKeys = [ deployment[ 0 ] for deployment in deploymentList ]
+      try:
+         # move the devices to the target container
+         self._addTempActions( [ self._deployMoveAction( transId, deployment[ 0 ],
+                                       deployment[ 1 ], containerKey,
+                                       containerName )
+                                 for deployment, transId in
+                                 zip( deploymentList, transIds ) ], batchSize )
+
+         # builders and configlets of the target container, for all the devices
+         cbkl, cbnl, autoBuilders = self._getDeployBuilders( containerKey )
+         generated = [ self._generateAutoConfiglets( devKeys, builderKey,
+                                                     builderName, containerKey,
+                                                     batchSize )
+                       for builderKey, builderName in autoBuilders ]
+         containerCkl, containerCnl = self._getDeployContainerConfiglets(
+                                                         containerKey, cbkl, cbnl )
+
+         # apply the configlets to the devices through the container
+         actions = []
+         for devKey, transId in zip( devKeys, transIds ):
+            ckl = [ configlets[ devKey ][ 'key' ] for configlets in generated ]
+            cnl = [ configlets[ devKey ][ 'name' ] for configlets in generated ]
+            actions.append( self._deployContainerAction( transId, containerKey,
+                                  containerName, ckl + containerCkl,
+                                  cnl + containerCnl, cbkl, cbnl ) )
+         self._addTempActions( actions, batchSize )
+
+         # proposed configlets of every device at the target container
+         proposed = mapper( self._getProposedConfiglets, devKeys )
+
+         # device specific configlets of the non hierarchal configlet builders
+         builderDevKeys = OrderedDict()
+         for deployment in deploymentList:
+            for key, name in zip( deployment[ 6 ] or [], deployment[ 7 ] or [] ):
+               if key not in cbkl:
+                  builderDevKeys.setdefault( ( key, name ), [] ).append(
+                                                                  deployment[ 0 ] )
+         deviceGenerated = [ ( key, self._generateAutoConfiglets( devKeyList, key,
+                                          name, containerKey, batchSize ) )
+                             for ( key, name ), devKeyList in
+                             builderDevKeys.iteritems() ]
+
+         actions = []
+         for deployment, transId, ( ckl, cnl ) in zip( deploymentList, transIds,
+                                                       proposed ):
+            ( devKey, devFqdn, devIp, devTargetIp, configletKeyList,
+              configletNameList, configletBuilderKeys, _, imageBundleKey,
+              imageBundleName ) = deployment
+            for key, configlets in deviceGenerated:
+               if key in ( configletBuilderKeys or [] ):
+                  ckl.append( configlets[ devKey ][ 'key' ] )
+                  cnl.append( configlets[ devKey ][ 'name' ] )
+            if configletKeyList and configletNameList:
+               ckl.extend( configletKeyList )
+               cnl.extend( configletNameList )
+            actions.append( self._deployDeviceAction( transId, devKey, devFqdn,
+                                  devIp, devTargetIp, ckl, cnl, cbkl, cbnl ) )
+            if imageBundleKey:
+               actions.append( self._deployImageAction( transId, devKey, devFqdn,
+                                     imageBundleKey, imageBundleName ) )
+         self._addTempActions( actions, batchSize )
+
+         # save all changes to the devices and return the task list
+         return self._saveTopology( [] )
+
+      except:
+         self._deleteTempActions()
          # try and clean up the transaction before passing the exception back to
          # the caller
          raise
@@ -2248,7 +4131,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       dataJson = { 'data': [ str( taskId ) for taskId in taskIdList ] }
       self.doRequest( requests.post,
                        '%s/web/task/cancelTask.do' % self.url_,
-                       data=json.dumps( dataJson ) )
+                       data=jsonCodec.dumps( dataJson ) )
 
    def addNoteToTask( self, taskId, note ):
       ''' Add a note to a task
@@ -2258,7 +4141,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       '''
       self.doRequest( requests.post,
                        '%s/web/task/addNoteToTask.do' % self.url_,
-                       data=json.dumps( { 'workOrderId' : str(taskId),
+                       data=jsonCodec.dumps( { 'workOrderId' : str(taskId),
                                           'note' : note } ) )
    def addTaskLog( self, taskId, message, src ):
       ''' Add a log to the task
@@ -2268,7 +4151,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
          src - the source of the log getting added
       '''
       self.doRequest( requests.post,'%s/web/workflow/addWorkOrderLog.do' % self.url_,
-                      data=json.dumps( {'taskId' : str(taskId),
+                      data=jsonCodec.dumps( {'taskId' : str(taskId),
                                         'message' : message, 'source': src } ) )
 
    def getTaskById( self, tid ):
@@ -2289,6 +4172,20 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                       '%s/web/user/getUsers.do?queryparam=&startIndex=%d&endIndex=%d'
                       % ( self.url_, 0, 0 ) )
 
+   def iterUsers( self, pageSize=DEFAULT_PAGE_SIZE ):
+      '''Yields information about the users, requesting pageSize users at a
+      time
+      Arguments:
+         pageSize -- users per request, 0 for all at once
+      Returns:
+         users -- iterator of ( user information, role list ) of every user
+                  ( type : Iterator of Tuple )
+      '''
+      for page in self._iterPages( '%s/web/user/getUsers.do?queryparam=' %
+                                   self.url_, pageSize, itemsKey='users' ):
+         for userInfo in page[ 'users' ]:
+            yield userInfo, page[ 'roles' ][ userInfo[ 'userId' ] ]
+
    def getUser( self, userName ):
       '''Retrieves infomation about a particular user'''
       name = quote( userName )
@@ -2312,7 +4209,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                "roles" : roleList
              }
       self.doRequest( requests.post, "%s/web/user/addUser.do" % self.url_,
-                      data=json.dumps( data ) )
+                      data=jsonCodec.dumps( data ) )
 
    def updatePassword( self, userId, password ):
       '''Changes the password of a user.'''
@@ -2333,13 +4230,13 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                "roles": user['roles']
             }
       return self.doRequest( requests.post, "%s/web/user/updateUser.do?userId=%s" % (self.url_,
-         userId), data=json.dumps( data ) )
+         userId), data=jsonCodec.dumps( data ) )
 
    def deleteUsers( self, userNames ):
       '''Delete users from the system. 'userNames' is a list of names.'''
 
       return self.doRequest( requests.post, "%s/web/user/deleteUsers.do" % self.url_,
-                      data=json.dumps( userNames ) )
+                      data=jsonCodec.dumps( userNames ) )
 
    def getRoles( self ):
       ''' Retrieves information about all the roles'''
@@ -2363,7 +4260,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                "moduleList" : roleModuleList }
       self.doRequest( requests.post,
                      '%s/web/role/createRole.do' % self.url_,
-                     data=json.dumps( data ) )
+                     data=jsonCodec.dumps( data ) )
 
    def getRole( self, roleId ):
       '''Retrieves information about a particular role with Id as roleId'''
@@ -2379,13 +4276,13 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
              }
       self.doRequest( requests.post,
                      '%s/web/role/updateRole.do' % self.url_,
-                     data=json.dumps( data ) )
+                     data=jsonCodec.dumps( data ) )
 
    def deleteRole( self, roleKey ):
       '''Deletes the roles from the cvp instance'''
       data = [ roleKey ]
       self.doRequest( requests.post, '%s/web/role/deleteRoles.do' % self.url_,
-                      data=json.dumps( data ) )
+                      data=jsonCodec.dumps( data ) )
 
    def updateConfigletBuilder( self, ConfigletBuilderName, formList, mainScript,
                                configletBuilderKey, waitForTaskIds=False ):
@@ -2399,7 +4296,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       response = self.doRequest( requests.post,
                       '%s/web/configlet/updateConfigletBuilder.do?isDraft=false&'
                       'id=%s' % ( self.url_, configletBuilderKey ),
-                      data=json.dumps( data ) )
+                      data=jsonCodec.dumps( data ) )
       pythonError = response.get( 'pythonError' )
       if pythonError:
          raise CvpError( errorCodes.CONFIGLET_BUILDER_PYTHON_ERROR,
@@ -2426,13 +4323,36 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
 
    def getDeviceImageBundleMapper( self, deviceMac ):
       '''retrieves the imagebundle applied to the device'''
+      return self.getDeviceImageBundles( deviceMac )[ 'imageBundleMapper' ]
+
+   def getDeviceImageBundles( self, deviceMac ):
+      '''Retrieves the image bundles applied to the device
+      Arguments:
+         deviceMac -- mac address of the device ( type : String )
+      Returns:
+         imageBundles -- 'imageBundleMapper', the mappings of every image
+                         bundle keyed by image bundle key, and 'imageBundleList',
+                         the information of the image bundles ( type : Dict )
+      '''
       macAddr = quote( deviceMac )
-      resp = self.doRequest( requests.get,
+      return self.doRequest( requests.get,
                              '%s/web/provisioning/getImageBundleByNetElementId.do?'
                              'netElementId=%s&sessionScope=%r&queryParam=&'
                              'startIndex=0&endIndex=0' % ( self.url_, macAddr,
                              True ) )
-      return resp[ 'imageBundleMapper' ]
+
+   def getContainerImageBundles( self, containerKey ):
+      '''Retrieves the image bundles applied to the container
+      Arguments:
+         containerKey -- unique key of the container ( type : String )
+      Returns:
+         imageBundles -- same as for getDeviceImageBundles ( type : Dict )
+      '''
+      return self.doRequest( requests.get,
+                             '%s/web/provisioning/getImageBundleByContainerId.do?'
+                             'containerId=%s&sessionScope=%r&queryParam=&'
+                             'startIndex=0&endIndex=0' % ( self.url_,
+                             quote( containerKey ), True ) )
 
    def getDeviceTempConfiglets( self, deviceMac ):
       '''retireves the set of configlets inherited by the device from the congtainer
@@ -2490,7 +4410,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       resp = self.doRequest( requests.post,
             '%s/web/aaa/createServer.do'
             % ( self.url_ ),
-            data = json.dumps( aaaServer ) )
+            data = jsonCodec.dumps( aaaServer ) )
       return resp
 
    def saveAaaSettings( self, authenticationType, authorizationType ):
@@ -2505,7 +4425,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       resp = self.doRequest( requests.post,
                              '%s/web/aaa/saveAAADetails.do'
                              % self.url_,
-                             data = json.dumps( aaaSettings ) )
+                             data = jsonCodec.dumps( aaaSettings ) )
       return resp
 
    def updateAaaServer( self, serverType, status, authMode,
@@ -2529,7 +4449,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       resp = self.doRequest( requests.post,
             '%s/web/aaa/editServer.do'
             % self.url_,
-            data = json.dumps( aaaServer ) )
+            data = jsonCodec.dumps( aaaServer ) )
       return resp
 
    def deleteAaaServer( self, aaaServerId ):
@@ -2540,7 +4460,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       resp = self.doRequest( requests.post,
             '%s/web/aaa/deleteServer.do'
             % self.url_,
-            data=json.dumps( data ) )
+            data=jsonCodec.dumps( data ) )
       return resp
 
    def getAaaServers( self, serverType, queryParam ):
@@ -2586,7 +4506,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       resp = self.doRequest( requests.post,
             '%s/web/aaa/testServerConnectivity.do'
             %  self.url_,
-            data = json.dumps( serverAndUser ) )
+            data = jsonCodec.dumps( serverAndUser ) )
       return resp
 
    def getAaaSettings( self ):
@@ -2634,6 +4554,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
             % ( self.url_, eventId, 0, 0 ) )
       return resp
 
+   @_topologyChange
    def replaceDevice( self, failedMac, failedName, replaceMac, replaceName ):
       '''
       Replace one device with another. Returns a list of task IDs
@@ -2652,9 +4573,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                        "toName" : replaceName,
                        "toIdType" : "netelement",
                      } ] }
-      self.doRequest( requests.post,
-              '%s/web/ztp/addTempAction.do?format=topology&queryParam=&nodeId=root' %
-              ( self.url_ ), data=json.dumps( data ) )
+      self._addTempAction( data )
       return self._saveTopology( [] )[ 'taskIds' ]
 
    def getManagementIp( self, netElementId, configNames ):
@@ -2670,7 +4589,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                                                           }
       result = self.doRequest( requests.post,
          '%s/web/configlet/getManagementIp.do?queryParam=&startIndex=0&endIndex=0' %
-             ( self.url_ ), data=json.dumps( data ) )
+             ( self.url_ ), data=jsonCodec.dumps( data ) )
       return result
 
    def getCertificate( self, certificateType ):
@@ -2681,27 +4600,27 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
    def generateCertificate( self, certificateInfo ):
       return self.doRequest( requests.post,
                         '%s/cvpservice/ssl/generateCertificate.do'
-                        % self.url_, data=json.dumps( certificateInfo ) )
+                        % self.url_, data=jsonCodec.dumps( certificateInfo ) )
 
    def generateCsr( self, csr ):
       return self.doRequest( requests.post,
                         '%s/cvpservice/ssl/generateCSR.do'
-                        % self.url_, data=json.dumps( csr ) )
+                        % self.url_, data=jsonCodec.dumps( csr ) )
 
    def bindCertWithCsr( self, certificateInfo ):
       return self.doRequest( requests.post,
                         '%s/cvpservice/ssl/bindCertWithCSR.do'
-                        % self.url_, data=json.dumps( certificateInfo ) )
+                        % self.url_, data=jsonCodec.dumps( certificateInfo ) )
 
    def importCertificate( self, certificateInfo ):
       return self.doRequest( requests.post,
                         '%s/cvpservice/ssl/importCertAndPrivateKey.do'
-                        % self.url_, data=json.dumps( certificateInfo ) )
+                        % self.url_, data=jsonCodec.dumps( certificateInfo ) )
 
    def exportCertificate( self, certificateInfo ):
       return self.doRequest( requests.post,
                         '%s/cvpservice/ssl/exportCertificate.do'
-                        % self.url_, data=json.dumps( certificateInfo ) )
+                        % self.url_, data=jsonCodec.dumps( certificateInfo ) )
 
    def deleteCsr( self ):
       return self.doRequest( requests.delete,
@@ -2733,7 +4652,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
                "netElementIds": devMacs }
       return self.doRequest( requests.post,
                         '%s/cvpservice/ssl/installDeviceCertificate.do' % self.url_,
-                         data=json.dumps( data ) )
+                         data=jsonCodec.dumps( data ) )
 
    def reInstallDeviceCertificateOnContainer( self, containerId ):
       self.doRequest( requests.get,
@@ -2756,7 +4675,7 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
          data = { "certificate": base64Content }
          self.doRequest( requests.post,
                              '%s/cvpservice/trustedCertificates/upload.do?'
-                                    % self.url_, data=json.dumps( data ) )
+                                    % self.url_, data=jsonCodec.dumps( data ) )
 
    def getTrustedCertsInfo( self ):
       '''Get all trusted certs from cvp.'''
@@ -2770,16 +4689,17 @@ startIndex=%d&endIndex=%d&ccId=%d' % ( self.url_, 0, 0, ccId ) )
       data = { "data": fingerprints }
       self.doRequest( requests.post,
                      '%s/cvpservice/trustedCertificates/delete.do' % self.url_,
-                      data=json.dumps( data ) )
+                      data=jsonCodec.dumps( data ) )
 
    def exportTrustedCerts( self, fingerprints ):
       '''Export trusted certs from cvp'''
       data = { "data": fingerprints }
       resp = self.doRequest( requests.post,
                       '%s/cvpservice/trustedCertificates/export.do' % self.url_,
-                      data=json.dumps( data ) )
+                      data=jsonCodec.dumps( data ) )
       return resp.values()
 
    def sessionIs( self, sessionId ):
       ''' Choose a user session to authenticate with the cvp'''
+      self.invalidateCache()
       self.cookies = { 'session_id' : sessionId }
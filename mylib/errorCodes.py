@@ -17,6 +17,7 @@ FILE_DOWNLOAD_ERROR = 6
 EVENT_COMPLETION_ERROR = 7
 DCA_INSTALLATION_FAILED = 8
 DCA_INSTALLATION_IN_PROGRESS = 9
+IMAGE_CHECKSUM_MISMATCH = 10
 INVALID_CONFIGLET_NAME = 1002
 INVALID_CONFIGLET_TYPE = 1003
 CONFIGLET_GENERATION_ERROR = 1004
@@ -96,6 +97,7 @@ ERROR_MAPPING = { NO_ERROR_CODE : "No error code provided",
                   INVALID_ARGUMENT : "Unsupported parameter type",
                   TIMEOUT : "Timeout" ,
                   FILE_DOWNLOAD_ERROR: "File download error",
+                  IMAGE_CHECKSUM_MISMATCH : "Image checksum does not match",
                   INVALID_CONFIGLET_NAME : "Invalid Configlet name",
                   INVALID_CONFIGLET_TYPE : "Configlet type is not correct",
                   CONFIGLET_GENERATION_ERROR : "Unable to generate configlet using"
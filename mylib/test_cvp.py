@@ -0,0 +1,142 @@
+# Copyright (c) 2015 Arista Networks, Inc.  All rights reserved.
+# Arista Networks, Inc. Confidential and Proprietary.
+'''
+@Copyright: 2015-2016 Arista Networks, Inc.
+Arista Networks, Inc. Confidential and Proprietary.
+
+Unit tests of cvp, run against the fake Cvp web-server of cvpMock:
+
+   python -m unittest discover -s mylib -p 'test*.py'
+'''
+import unittest
+from collections import OrderedDict
+import cvp
+import cvpServices
+import errorCodes
+from test_cvpServices import MockCvpTestCase
+
+class CvpTestCase( MockCvpTestCase ):
+   '''Runs every test against a new MockCvpServer, with an authenticated Cvp
+   in self.cvp'''
+   def setUp( self ):
+      super( CvpTestCase, self ).setUp()
+      self.cvp = cvp.Cvp( '127.0.0.1', ssl=False, port=self.server.port )
+      self.cvp.authenticate( 'cvpadmin', 'cvpadmin' )
+      self.server.resetCounters()
+
+class TaskTest( CvpTestCase ):
+
+   def _tasks( self, taskIds ):
+      return [ cvp.Task( taskId, cvp.Task.PENDING ) for taskId in taskIds ]
+
+   def testGetTasks( self ):
+      pending = self.fakeCvp.addTasks( 2 )
+      self.fakeCvp.addTasks( 3, status=cvp.Task.COMPLETED )
+      tasks = self.cvp.getTasks( cvp.Task.PENDING )
+      self.assertEqual( [ task.taskId for task in tasks ],
+                        [ int( taskId ) for taskId in pending ] )
+      self.assertEqual( len( self.cvp.getTasks() ), 5 )
+
+   def testMonitorTaskStatus( self ):
+      self.fakeCvp.addTasks( 20, status=cvp.Task.COMPLETED )
+      taskIds = self.fakeCvp.addTasks( 5 )
+      self.fakeCvp.execute( taskIds )
+      tasks = self._tasks( taskIds )
+      results = self.cvp.monitorTaskStatus( tasks, timeout=10 )
+      self.assertEqual( sorted( results ), [ task.taskId for task in tasks ] )
+      self.assertTrue( all( result[ 'status' ] == cvp.Task.COMPLETED
+                            for result in results.values() ) )
+      # only the active listings are read and the finished tasks looked up,
+      # and the tasks are left as they were
+      self.assertEqual( self.requests( '/web/workflow/getTasks.do' ),
+                        len( cvp.Task.ACTIVE_STATES ) )
+      self.assertEqual( self.requests( '/web/task/getTaskById.do' ), 5 )
+      self.assertTrue( all( task.status == cvp.Task.PENDING for task in tasks ) )
+
+   def testMonitorSkipsRunningTasks( self ):
+      self.fakeCvp.taskDuration = 0.3
+      taskIds = self.fakeCvp.addTasks( 3 )
+      self.fakeCvp.execute( taskIds )
+      results = self.cvp.monitorTaskStatus( self._tasks( taskIds ), timeout=10 )
+      self.assertEqual( len( results ), 3 )
+      # running tasks are not looked up, finished ones once each
+      self.assertEqual( self.requests( '/web/task/getTaskById.do' ), 3 )
+
+   def testMonitorFailedTask( self ):
+      taskIds = self.fakeCvp.addTasks( 1 )
+      failed = self.fakeCvp.addTasks( 1, status=cvp.Task.FAILED )
+      self.fakeCvp.execute( taskIds )
+      with self.assertRaises( cvpServices.CvpError ) as context:
+         self.cvp.monitorTaskStatus( self._tasks( taskIds + failed ), timeout=10 )
+      self.assertEqual( context.exception.errorCode,
+                        errorCodes.TASK_EXECUTION_ERROR )
+      self.assertEqual( context.exception.response[ int( failed[ 0 ] ) ][ 'status' ],
+                        cvp.Task.FAILED )
+
+   def testMonitorTimeout( self ):
+      taskIds = self.fakeCvp.addTasks( 1 )
+      with self.assertRaises( cvpServices.CvpError ) as context:
+         self.cvp.monitorTaskStatus( self._tasks( taskIds ), timeout=0.2 )
+      self.assertEqual( context.exception.errorCode, errorCodes.TIMEOUT )
+
+class ContainerTreeTest( CvpTestCase ):
+
+   def testAddContainerTree( self ):
+      tree = { 'dc1' : { 'podB' : [ 'rack2', 'rack1' ], 'podA' : None } }
+      containers = self.cvp.addContainerTree( tree )
+      self.assertEqual( [ ( container.name, container.parentName )
+                          for container in containers ],
+                        [ ( 'dc1', 'Tenant' ), ( 'podA', 'dc1' ),
+                          ( 'podB', 'dc1' ), ( 'rack2', 'podB' ),
+                          ( 'rack1', 'podB' ) ] )
+      self.assertEqual( self.requests( '/web/ztp/v2/saveTopology.do' ), 1 )
+      # the keys of the new containers are known without another request
+      self.server.resetCounters()
+      index = self.cvp.cvpService.containerIndex()
+      self.assertEqual( index.name( index.parent(
+                           self.cvp.cvpService.containerKey( 'rack2' ) ) ), 'podB' )
+      self.assertFalse( self.cvp.cvpService.containerKey( 'podA' ).startswith(
+                                                               'New_container' ) )
+      self.assertEqual( self.server.requestCount(), 0 )
+
+   def testOrderedTreeAndUnicodeNames( self ):
+      tree = OrderedDict( [ ( u'z\xe9', None ), ( 'a', [ 'b' ] ) ] )
+      containers = self.cvp.addContainerTree( tree )
+      self.assertEqual( [ container.name for container in containers ],
+                        [ u'z\xe9', 'a', 'b' ] )
+      self.assertIsNotNone( self.cvp.cvpService.containerKey( u'Z\xc9' ) )
+
+   def testExistingContainerUnderOtherParent( self ):
+      with self.assertRaises( cvpServices.CvpError ) as context:
+         self.cvp.addContainerTree( { 'dc1' : [ 'leaf1' ] } )
+      self.assertEqual( context.exception.errorCode,
+                        errorCodes.INVALID_CONTAINER_NAME )
+      self.assertEqual( self.requests( '/web/ztp/v2/saveTopology.do' ), 0 )
+
+class ImageBundleTest( CvpTestCase ):
+
+   def testInheritedImageBundle( self ):
+      self.fakeCvp.imageBundles[ 'bundle1' ][ 'appliedContainers' ] = [ 'pod0' ]
+      devices = sorted( self.fakeCvp.devices.values(),
+                        key=lambda d: d[ 'ipAddress' ] )
+      # bundle0 is applied to every other device, the others inherit bundle1
+      self.assertEqual( self.cvp.getDevice( devices[ 0 ][ 'key' ] ).imageBundle,
+                        'bundle0' )
+      self.assertEqual( self.cvp.getDevice( devices[ 1 ][ 'key' ] ).imageBundle,
+                        'bundle1' )
+      self.assertEqual( self.cvp.getContainer( 'leaf1' ).imageBundle, 'bundle1' )
+      self.assertEqual( self.cvp.getContainer( 'pod0' ).imageBundle, 'bundle1' )
+      self.assertIsNone( self.cvp.getContainer( 'Tenant' ).imageBundle )
+
+   def testSnapshotRequestsPerBundle( self ):
+      devices = self.cvp.getDevices( snapshot=True )
+      self.assertEqual( len( devices ), len( self.fakeCvp.devices ) )
+      # one request per image bundle on top of the 4 bulk downloads
+      self.assertEqual( self.server.requestCount(),
+                        4 + len( self.fakeCvp.imageBundles ) )
+      self.assertEqual( self.requests(
+                           '/web/image/getImageBundleAppliedDevices.do' ),
+                        len( self.fakeCvp.imageBundles ) )
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,532 @@
+# Copyright (c) 2015 Arista Networks, Inc.  All rights reserved.
+# Arista Networks, Inc. Confidential and Proprietary.
+'''
+@Copyright: 2015-2016 Arista Networks, Inc.
+Arista Networks, Inc. Confidential and Proprietary.
+
+Unit tests of cvpServices, run against the fake Cvp web-server of cvpMock:
+
+   python -m unittest discover -s mylib -p 'test*.py'
+'''
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import cvpMock
+import cvpServices
+import errorCodes
+
+class FakeClock( object ):
+   '''Stands in for the time module of cvpServices: sleeping moves the clock
+   forward at once and is recorded'''
+   def __init__( self, now=1000.0 ):
+      self.now = now
+      self.sleeps = []
+
+   def time( self ):
+      return self.now
+
+   def sleep( self, seconds ):
+      self.sleeps.append( seconds )
+      self.now += seconds
+
+class FakeClockTestCase( unittest.TestCase ):
+   '''Runs every test with a FakeClock as the time module of cvpServices'''
+   def setUp( self ):
+      self.clock = FakeClock()
+      self.time_ = cvpServices.time
+      cvpServices.time = self.clock
+
+   def tearDown( self ):
+      cvpServices.time = self.time_
+
+class MockCvpTestCase( unittest.TestCase ):
+   '''Runs every test against a new MockCvpServer, with an authenticated
+   CvpService in self.service'''
+   deviceCount = 40
+
+   def setUp( self ):
+      self.server = cvpMock.MockCvpServer( cvpMock.FakeCvp( self.deviceCount ) )
+      self.server.start()
+      self.fakeCvp = self.server.fakeCvp
+      self.service = self.newService()
+      self.server.resetCounters()
+
+   def tearDown( self ):
+      self.service.close()
+      self.server.stop()
+
+   def newService( self, **kwargs ):
+      service = cvpServices.CvpService( '127.0.0.1', False, self.server.port,
+                                        **kwargs )
+      service.authenticate( 'cvpadmin', 'cvpadmin' )
+      return service
+
+   def requests( self, path ):
+      '''Returns the number of requests made to an endpoint'''
+      return self.server.requestCounts[ path ]
+
+URL = 'https://cvp'
+CONFIGLETS_URL = URL + '/web/configlet/getConfiglets.do?startIndex=0&endIndex=0'
+IMAGES_URL = URL + '/web/image/getImages.do?startIndex=0&endIndex=0'
+TOPOLOGY_URL = URL + '/cvpservice/provisioning/filterTopology.do?nodeId=root'
+TASKS_URL = URL + '/web/workflow/getTasks.do?queryparam='
+
+class ResponseCacheTest( FakeClockTestCase ):
+
+   def testTtl( self ):
+      cache = cvpServices.ResponseCache( ttls={ 'configlets' : 10 } )
+      cache.store( CONFIGLETS_URL, '{}' )
+      self.clock.now += 9
+      self.assertEqual( cache.lookup( CONFIGLETS_URL ), '{}' )
+      self.clock.now += 2
+      self.assertIsNone( cache.lookup( CONFIGLETS_URL ) )
+      self.assertEqual( ( cache.hits, cache.misses ), ( 1, 1 ) )
+
+   def testUncacheableEndpoint( self ):
+      cache = cvpServices.ResponseCache()
+      cache.store( TASKS_URL, '{}' )
+      self.assertIsNone( cache.lookup( TASKS_URL ) )
+      self.assertEqual( ( cache.hits, cache.misses ), ( 0, 0 ) )
+
+   def testLeastRecentlyUsedIsDropped( self ):
+      cache = cvpServices.ResponseCache( maxEntries=2 )
+      cache.store( CONFIGLETS_URL, 'configlets' )
+      cache.store( IMAGES_URL, 'images' )
+      cache.lookup( CONFIGLETS_URL )
+      cache.store( TOPOLOGY_URL, 'topology' )
+      self.assertEqual( cache.lookup( CONFIGLETS_URL ), 'configlets' )
+      self.assertIsNone( cache.lookup( IMAGES_URL ) )
+      self.assertEqual( cache.lookup( TOPOLOGY_URL ), 'topology' )
+
+   def _filledCache( self ):
+      cache = cvpServices.ResponseCache()
+      for url in ( CONFIGLETS_URL, IMAGES_URL, TOPOLOGY_URL ):
+         cache.store( url, url )
+      return cache
+
+   def _cached( self, cache ):
+      return [ url for url in ( CONFIGLETS_URL, IMAGES_URL, TOPOLOGY_URL )
+               if cache.lookup( url ) ]
+
+   def testInvalidationGroups( self ):
+      cache = self._filledCache()
+      cache.invalidateFor( URL + '/web/configlet/addConfiglet.do' )
+      self.assertEqual( self._cached( cache ), [ IMAGES_URL ] )
+
+   def testReadOnlyPostKeepsEntries( self ):
+      cache = self._filledCache()
+      cache.invalidateFor( URL + '/web/configlet/configletBuilderPreview.do' )
+      self.assertEqual( len( self._cached( cache ) ), 3 )
+
+   def testUnknownPostFlushesEverything( self ):
+      cache = self._filledCache()
+      cache.invalidateFor( URL + '/web/unknown/update.do' )
+      self.assertEqual( self._cached( cache ), [] )
+
+class ServiceCacheTest( MockCvpTestCase ):
+
+   def testMutationInvalidatesItsGroups( self ):
+      service = self.newService( cacheSize=16 )
+      self.server.resetCounters()
+      service.getConfigletsInfo()
+      service.filterTopology()
+      service.getConfigletsInfo()
+      service.filterTopology()
+      self.assertEqual( self.server.requestCount(), 2 )
+      service._postTempAction( { 'data' : [] } )
+      service.getConfigletsInfo()
+      service.filterTopology()
+      self.assertEqual( self.requests( '/web/configlet/getConfiglets.do' ), 1 )
+      self.assertEqual( self.requests(
+                           '/cvpservice/provisioning/filterTopology.do' ), 2 )
+
+class PollerTest( FakeClockTestCase ):
+
+   def testBackoffUntilTimeout( self ):
+      poller = cvpServices.Poller( timeout=20, interval=1, multiplier=2,
+                                   maxInterval=5, jitter=0 )
+      with self.assertRaises( cvpServices.CvpError ) as context:
+         poller.wait( lambda: False )
+      self.assertEqual( context.exception.errorCode, errorCodes.TIMEOUT )
+      # the last delay is cut short by the timeout
+      self.assertEqual( self.clock.sleeps, [ 1, 2, 4, 5, 5, 3 ] )
+
+   def testProgressResetsDelay( self ):
+      results = iter( [ 0, 0, 1, 0, 0, 'done' ] )
+      poller = cvpServices.Poller( timeout=0, interval=1, multiplier=2,
+                                   maxInterval=5, jitter=0 )
+      result = poller.wait( lambda: next( results ), lambda r: r == 'done',
+                            progress=lambda r: r == 1 )
+      self.assertEqual( result, 'done' )
+      self.assertEqual( self.clock.sleeps, [ 1, 2, 1, 2, 4 ] )
+
+   def testFailureIsRaisedAtOnce( self ):
+      error = cvpServices.CvpError( errorCodes.TASK_EXECUTION_ERROR )
+      poller = cvpServices.Poller( timeout=20, jitter=0 )
+      with self.assertRaises( cvpServices.CvpError ) as context:
+         poller.wait( lambda: 'failed', failure=lambda r: error )
+      self.assertIs( context.exception, error )
+      self.assertEqual( self.clock.sleeps, [] )
+
+class ContainerIndexTest( MockCvpTestCase ):
+
+   def testIndexIsDownloadedOnce( self ):
+      index = self.service.containerIndex()
+      self.assertIs( self.service.containerIndex(), index )
+      self.assertEqual( self.service.containerKey( 'LEAF1' ), 'container_leaf1' )
+      self.assertEqual( index.name( index.parent( 'container_leaf1' ) ), 'pod0' )
+      self.assertEqual( self.server.requestCount(), 1 )
+
+   def testRefresh( self ):
+      index = self.service.containerIndex()
+      self.fakeCvp._addContainer( 'container_new', 'new', 'container_pod0' )
+      self.assertIsNone( index.key( 'new' ) )
+      index = self.service.containerIndex( refresh=True )
+      self.assertEqual( index.key( 'new' ), 'container_new' )
+      self.assertEqual( index.parent( 'container_new' ), 'container_pod0' )
+      self.assertEqual( self.requests(
+                           '/cvpservice/provisioning/filterTopology.do' ), 2 )
+
+   def testUnknownNameIsSearched( self ):
+      index = self.service.containerIndex()
+      self.fakeCvp._addContainer( 'container_new', 'new', 'container_pod0' )
+      self.assertEqual( self.service.containerKey( 'New' ), 'container_new' )
+      self.assertEqual( index.key( 'new' ), 'container_new' )
+      self.assertIsNone( self.service.containerKey( 'missing' ) )
+      self.assertEqual( self.requests(
+                           '/cvpservice/provisioning/filterTopology.do' ), 1 )
+
+   def testInvalidate( self ):
+      self.service.containerIndex()
+      self.service.invalidateContainerIndex()
+      self.service.containerIndex()
+      self.assertEqual( self.requests(
+                           '/cvpservice/provisioning/filterTopology.do' ), 2 )
+
+   def testRenameUpdatesIndex( self ):
+      index = self.service.containerIndex()
+      self.service.changeContainerName( 'leaf1', 'leafOne', 'container_leaf1' )
+      self.assertIs( self.service.containerIndex(), index )
+      self.assertIsNone( index.key( 'leaf1' ) )
+      self.assertEqual( index.key( 'leafone' ), 'container_leaf1' )
+      self.assertEqual( index.parent( 'container_leaf1' ), 'container_pod0' )
+
+   def testAddAndRemove( self ):
+      index = cvpServices.ContainerIndex( { 'key' : 'root', 'name' : 'Tenant' } )
+      index.add( 'c1', 'One', 'root' )
+      index.add( 'c1', 'Uno', 'root' )
+      self.assertIsNone( index.key( 'one' ) )
+      self.assertEqual( index.key( 'UNO' ), 'c1' )
+      index.remove( 'c1' )
+      self.assertIsNone( index.key( 'uno' ) )
+      self.assertIsNone( index.parent( 'c1' ) )
+
+class CvpTransactionTest( MockCvpTestCase ):
+
+   def _containerNames( self ):
+      return set( containerInfo[ 'name' ] for containerInfo in
+                  self.fakeCvp.containers.values() )
+
+   def testCommitSavesOnce( self ):
+      with cvpServices.CvpTransaction( self.service ) as transaction:
+         self.service.addContainer( 'dc1', 'Tenant', 'root' )
+         self.service.addContainer( 'dc2', 'Tenant', 'root' )
+         self.assertEqual( self.requests( '/web/ztp/addTempAction.do' ), 0 )
+      self.assertIsNone( self.service.transaction )
+      self.assertEqual( self.requests( '/web/ztp/addTempAction.do' ), 1 )
+      self.assertEqual( self.requests( '/web/ztp/v2/saveTopology.do' ), 1 )
+      self.assertTrue( set( [ 'dc1', 'dc2' ] ) <= self._containerNames() )
+      self.assertEqual( transaction.taskIds, [] )
+
+   def testRollback( self ):
+      with self.assertRaises( ValueError ):
+         with cvpServices.CvpTransaction( self.service ) as transaction:
+            self.service.addContainer( 'dc1', 'Tenant', 'root' )
+            transaction.flush()
+            raise ValueError()
+      self.assertIsNone( self.service.transaction )
+      self.assertEqual( self.requests( '/web/ztp/v2/saveTopology.do' ), 0 )
+      self.assertEqual( self.requests( '/web/ztp/deleteAllTempAction.do' ), 1 )
+      self.assertEqual( self.server.tempActions, [] )
+      self.assertNotIn( 'dc1', self._containerNames() )
+
+   def testAbortWithoutChanges( self ):
+      transaction = cvpServices.CvpTransaction( self.service )
+      with transaction:
+         transaction.abort()
+      self.assertEqual( self.server.requestCount(), 0 )
+
+   def testNestedTransaction( self ):
+      with cvpServices.CvpTransaction( self.service ):
+         with self.assertRaises( cvpServices.CvpError ) as context:
+            cvpServices.CvpTransaction( self.service ).__enter__()
+         self.assertEqual( context.exception.errorCode,
+                           errorCodes.INVALID_ARGUMENT )
+
+   def testBatches( self ):
+      with cvpServices.CvpTransaction( self.service, batchSize=2 ):
+         for index in range( 5 ):
+            self.service.addContainer( 'dc%d' % index, 'Tenant', 'root' )
+      self.assertEqual( self.requests( '/web/ztp/addTempAction.do' ), 3 )
+      self.assertEqual( self.requests( '/web/ztp/v2/saveTopology.do' ), 1 )
+
+   def testTransactionIsPerThread( self ):
+      executor = cvpServices.FanOutExecutor( 2 )
+      try:
+         with cvpServices.CvpTransaction( self.service ) as transaction:
+            seen = []
+            thread = threading.Thread(
+                  target=lambda: seen.append( self.service.transaction ) )
+            thread.start()
+            thread.join()
+            self.assertEqual( seen, [ None ] )
+            # calls fanned out from the thread of the transaction join it
+            self.assertEqual( executor.map( lambda _: self.service.transaction,
+                                            range( 2 ) ),
+                              [ transaction, transaction ] )
+      finally:
+         executor.close()
+
+   def testOtherThreadWaitsForTransaction( self ):
+      with cvpServices.CvpTransaction( self.service ):
+         self.service.addContainer( 'dc1', 'Tenant', 'root' )
+         thread = threading.Thread(
+               target=lambda: self.service.addContainer( 'dc2', 'Tenant',
+                                                         'root' ) )
+         thread.start()
+         thread.join( 0.2 )
+         # the temp actions of the session are the transaction's until it ends
+         self.assertTrue( thread.is_alive() )
+         self.assertEqual( self.requests( '/web/ztp/v2/saveTopology.do' ), 0 )
+      thread.join()
+      self.assertEqual( self.requests( '/web/ztp/v2/saveTopology.do' ), 2 )
+      self.assertTrue( set( [ 'dc1', 'dc2' ] ) <= self._containerNames() )
+
+class PagingTest( MockCvpTestCase ):
+
+   def testPages( self ):
+      taskIds = self.fakeCvp.addTasks( 10 )
+      tasks = list( self.service.iterTasks( pageSize=3 ) )
+      self.assertEqual( [ task[ 'workOrderId' ] for task in tasks ], taskIds )
+      self.assertEqual( self.requests( '/web/workflow/getTasks.do' ), 4 )
+
+   def testLastFullPageEndsWithTotal( self ):
+      self.fakeCvp.addTasks( 9 )
+      self.assertEqual( len( list( self.service.iterTasks( pageSize=3 ) ) ), 9 )
+      self.assertEqual( self.requests( '/web/workflow/getTasks.do' ), 3 )
+
+   def testSingleRequest( self ):
+      self.fakeCvp.addTasks( 10 )
+      self.assertEqual( len( list( self.service.iterTasks( pageSize=0 ) ) ), 10 )
+      self.assertEqual( self.requests( '/web/workflow/getTasks.do' ), 1 )
+
+   def testStatusFilter( self ):
+      self.fakeCvp.addTasks( 4 )
+      completed = self.fakeCvp.addTasks( 3, status='Completed' )
+      tasks = list( self.service.iterTasks( 'Completed', pageSize=2 ) )
+      self.assertEqual( [ task[ 'workOrderId' ] for task in tasks ], completed )
+
+   def testEmpty( self ):
+      self.assertEqual( list( self.service.iterTasks( pageSize=3 ) ), [] )
+      self.assertEqual( self.requests( '/web/workflow/getTasks.do' ), 1 )
+
+class MultipartFileStreamTest( unittest.TestCase ):
+
+   def setUp( self ):
+      self.tmpDir = tempfile.mkdtemp()
+      self.filePath = os.path.join( self.tmpDir, 'EOS.swi' )
+      self.content = ''.join( chr( index % 256 ) for index in range( 10000 ) )
+      with open( self.filePath, 'wb' ) as f:
+         f.write( self.content )
+
+   def tearDown( self ):
+      shutil.rmtree( self.tmpDir )
+
+   def testBody( self ):
+      progress = []
+      stream = cvpServices.MultipartFileStream( 'file', self.filePath,
+                     bufferSize=512,
+                     progress=lambda name, sent, total: progress.append( sent ) )
+      chunks = []
+      while True:
+         chunk = stream.read( 700 )
+         if not chunk:
+            break
+         self.assertLessEqual( len( chunk ), 700 )
+         chunks.append( chunk )
+      body = ''.join( chunks )
+      boundary = stream.contentType.split( 'boundary=' )[ 1 ]
+      self.assertEqual( len( body ), len( stream ) )
+      self.assertTrue( body.startswith( '--%s\r\n' % boundary ) )
+      self.assertIn( 'name="file"; filename="EOS.swi"', body )
+      self.assertTrue( body.endswith( '\r\n--%s--\r\n' % boundary ) )
+      self.assertIn( '\r\n\r\n%s\r\n--%s--' % ( self.content, boundary ), body )
+      self.assertEqual( stream.md5.hexdigest(),
+                        hashlib.md5( self.content ).hexdigest() )
+      self.assertEqual( stream.sha512.hexdigest(),
+                        hashlib.sha512( self.content ).hexdigest() )
+      self.assertEqual( progress[ -1 ], len( stream ) )
+      stream.close()
+
+   def testReadAll( self ):
+      stream = cvpServices.MultipartFileStream( 'file', self.filePath,
+                                                fileName='other.swi' )
+      body = stream.read()
+      self.assertEqual( len( body ), stream.len )
+      self.assertIn( 'filename="other.swi"', body )
+      self.assertEqual( stream.read(), '' )
+
+class DownloadImageTest( MockCvpTestCase ):
+
+   def setUp( self ):
+      super( DownloadImageTest, self ).setUp()
+      self.tmpDir = tempfile.mkdtemp()
+      self.fileName = os.path.join( self.tmpDir, 'EOS.swi' )
+      self.partName = self.fileName + '.part'
+      self.content = self.fakeCvp.imageFiles[ 'image_0' ]
+      self.md5 = hashlib.md5( self.content ).hexdigest()
+
+   def tearDown( self ):
+      shutil.rmtree( self.tmpDir )
+      super( DownloadImageTest, self ).tearDown()
+
+   def _download( self, md5=None ):
+      self.service.downloadImage( 'EOS.swi', 'image_0', self.tmpDir, md5 )
+
+   def _writePart( self, data ):
+      with open( self.partName, 'wb' ) as f:
+         f.write( data )
+
+   def _downloaded( self ):
+      self.assertFalse( os.path.exists( self.partName ) )
+      with open( self.fileName, 'rb' ) as f:
+         return f.read()
+
+   def testDownload( self ):
+      self._download( self.md5 )
+      self.assertEqual( self._downloaded(), self.content )
+
+   def testResume( self ):
+      received = []
+      self._writePart( self.content[ : 1000 ] )
+      self.service.downloadImage( 'EOS.swi', 'image_0', self.tmpDir, self.md5,
+            progress=lambda name, size, total: received.append( ( size, total ) ) )
+      self.assertEqual( self._downloaded(), self.content )
+      self.assertEqual( self.server.requestCount(), 1 )
+      # the progress counts the bytes of the partial file
+      self.assertEqual( received[ -1 ], ( len( self.content ),
+                                          len( self.content ) ) )
+
+   def testNoResumeWithoutChecksum( self ):
+      self._writePart( 'corrupt' * 100 )
+      self._download()
+      self.assertEqual( self._downloaded(), self.content )
+
+   def testPartLongerThanImage( self ):
+      stats = cvpServices.RequestStats()
+      self.service.addInstrument( stats )
+      self._writePart( self.content + 'extra' )
+      self._download( self.md5 )
+      self.assertEqual( self._downloaded(), self.content )
+      self.assertEqual( self.server.requestCount(), 2 )
+      # the download started over is the only retry
+      entry, = stats.asDict()[ '' ].values()
+      self.assertEqual( ( entry[ 'count' ], entry[ 'retries' ] ), ( 2, 1 ) )
+      self.assertEqual( entry[ 'bytesReceived' ], len( self.content ) )
+
+   def testRepeatedRequestIsNotRetry( self ):
+      stats = cvpServices.RequestStats()
+      self.service.addInstrument( stats )
+      for _ in range( 3 ):
+         self.service.getTasks()
+      self.assertTrue( all( entry[ 'retries' ] == 0
+                            for entry in stats.asDict()[ '' ].values() ) )
+
+   def testChecksumMismatch( self ):
+      self._writePart( 'x' * 1000 )
+      with self.assertRaises( cvpServices.CvpError ) as context:
+         self._download( self.md5 )
+      self.assertEqual( context.exception.errorCode,
+                        errorCodes.IMAGE_CHECKSUM_MISMATCH )
+      self.assertFalse( os.path.exists( self.partName ) )
+      self.assertFalse( os.path.exists( self.fileName ) )
+
+   def testExistingImageIsSkipped( self ):
+      with open( self.fileName, 'wb' ) as f:
+         f.write( self.content )
+      self._download( self.md5 )
+      self.assertEqual( self.server.requestCount(), 0 )
+
+   def testUnknownImage( self ):
+      with self.assertRaises( cvpServices.CvpError ) as context:
+         self.service.downloadImage( 'EOS.swi', 'missing', self.tmpDir )
+      self.assertEqual( context.exception.errorCode,
+                        errorCodes.FILE_DOWNLOAD_ERROR )
+
+class ConfigletCatalogTest( MockCvpTestCase ):
+
+   def testLookup( self ):
+      catalog = cvpServices.ConfigletCatalog( [
+            { 'name' : 'Base', 'key' : 'c1', 'type' : 'Static' },
+            { 'name' : 'Gen', 'key' : 'c2', 'type' : 'Generated' } ] )
+      self.assertEqual( catalog.total, 2 )
+      self.assertEqual( catalog.lookup( 'BASE' ),
+                        { 'name' : 'Base', 'key' : 'c1', 'type' : 'Static' } )
+      catalog.rename( 'c2', 'Generated' )
+      self.assertIsNone( catalog.lookup( 'gen' ) )
+      self.assertEqual( catalog.lookup( 'generated' )[ 'type' ], 'Generated' )
+      catalog.removeKey( 'c1' )
+      self.assertIsNone( catalog.lookup( 'base' ) )
+      catalog.remove( 'GENERATED' )
+      self.assertIsNone( catalog.lookup( 'generated' ) )
+
+   def testLookupsShareOneListing( self ):
+      for configletInfo in self.fakeCvp.configlets.values()[ : 10 ]:
+         configletInfo = self.service.lookupConfiglet(
+                                             configletInfo[ 'name' ].upper() )
+         self.assertIsNotNone( configletInfo )
+      self.assertEqual( self.server.requestCount(), 1 )
+
+   def testUnknownNameIsLookedUp( self ):
+      self.service.configletCatalog()
+      configletKey = self.fakeCvp._addConfiglet( 'outside' )
+      self.assertEqual( self.service.lookupConfiglet( 'outside' )[ 'key' ],
+                        configletKey )
+      self.assertIsNone( self.service.lookupConfiglet( 'missing' ) )
+      self.assertEqual( self.requests( '/web/configlet/getConfigletByName.do' ), 2 )
+      self.assertEqual( self.requests( '/web/configlet/getConfiglets.do' ), 1 )
+
+   def testReloadedWhenCountChanges( self ):
+      catalog = self.service.configletCatalog()
+      catalog.checked -= cvpServices.CONFIGLET_CATALOG_CHECK_INTERVAL
+      self.assertIs( self.service.configletCatalog(), catalog )
+      self.fakeCvp._addConfiglet( 'outside' )
+      catalog.checked -= cvpServices.CONFIGLET_CATALOG_CHECK_INTERVAL
+      catalog = self.service.configletCatalog()
+      self.assertIsNotNone( catalog.lookup( 'outside' ) )
+      # one full listing, two counts and a second full listing
+      self.assertEqual( self.requests( '/web/configlet/getConfiglets.do' ), 4 )
+
+class TaskListTest( MockCvpTestCase ):
+
+   def testGetTasks( self ):
+      pending = self.fakeCvp.addTasks( 3 )
+      completed = self.fakeCvp.addTasks( 2, status='Completed' )
+      self.assertEqual( [ task[ 'workOrderId' ] for task in
+                          self.service.getTasks() ], pending + completed )
+      self.assertEqual( [ task[ 'workOrderId' ] for task in
+                          self.service.getTasks( 'Completed' ) ], completed )
+
+   def testListMethodsNextToIterators( self ):
+      # every paged iterator keeps the method returning the whole list
+      for name in dir( cvpServices.CvpService ):
+         if name.startswith( 'iter' ) and name != 'iterItems':
+            self.assertTrue( callable( getattr( cvpServices.CvpService,
+                                                'get' + name[ 4 : ], None ) ),
+                             'get%s is missing' % name[ 4 : ] )
+
+if __name__ == '__main__':
+   unittest.main()